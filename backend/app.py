@@ -1,72 +1,595 @@
-from flask import Flask, jsonify, request
+from flask import Flask, jsonify, request, g, Response
 from flask_cors import CORS
 import os
 from dotenv import load_dotenv
 from models.user_model import create_user, find_by_email, find_by_id, update_user
-import bcrypt
-from utils.jwt_helper import generate_token, verify_token
+from utils.jwt_helper import generate_token, token_required
+from utils.password_hasher import hash_password, check_password, PasswordHasherBusy
+from models.history_model import create_history, create_history_many, get_history_page, get_history_item, get_history_items, history_writer
+from models.stats_model import get_stats, STATS_DEFAULT_DAYS
+from bson.errors import InvalidId
+from utils.batcher import MicroBatcher, bucket_by_length
+from utils.chunking import AGGREGATIONS, window_inputs, aggregate_logits
+from utils.prediction_cache import PredictionCache, model_fingerprint
+from utils.inference_backends import apply_backend
+from utils.serving_artifact import artifact_is_current, load_artifact
+from utils.early_exit import EXIT_HEAD_FILES, apply_early_exit
+from utils.explain import explain_text
+from utils.model_registry import ModelRegistry, RegistryWatcher
+from utils.near_duplicates import NearDuplicateIndex
+from utils.embeddings import capture_pooled, decode_embedding
+from utils.vector_index import VectorIndex, VectorIndexSync
+from utils.db import prediction_cache as prediction_cache_collection, history as history_collection, ensure_indexes
+from utils.ocr import OcrPool, OcrBusy
+from models.job_model import create_job, finish_job, find_job
+from utils.admission import AdmissionController, Overloaded
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from functools import wraps
-from models.history_model import create_history, get_history_for_user
-import torch.nn.functional as F
-import numpy as np
+from utils import metrics
+from utils.metrics import timed
+from utils.profiler import SamplingProfiler
+from utils.jwt_helper import token_cache_counters
+import random
+import gc
+import hashlib
+import hmac
+import threading
+import time
+import atexit
+import signal
+import sys
 
 load_dotenv()
 
 app = Flask(__name__)
 CORS(app, origins=['http://localhost:5173', 'http://localhost:5174'])
 
-def token_required(f):
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        auth = request.headers.get('Authorization', None)
-        if not auth:
-            return jsonify({'message':'Token missing'}), 401
-        parts = auth.split()
-        if parts[0].lower() != 'bearer' or len(parts) != 2:
-            return jsonify({'message':'Invalid token format'}), 401
-        token = parts[1]
-        payload = verify_token(token)
-        if not payload:
-            return jsonify({'message':'Invalid or expired token'}), 401
-        request.user = payload['sub']
-        return f(*args, **kwargs)
-    return decorated
-
 # Load model once (lazy loading)
 MODEL_NAME = 'bert-base-uncased'
-LOCAL_MODEL_DIR = os.path.join(os.path.dirname(__file__), '..', 'fine_tuned_bert')
+LOCAL_MODEL_DIR = os.getenv('MODEL_DIR') or os.path.join(os.path.dirname(__file__), '..', 'fine_tuned_bert')
+# Versioned models live in MODEL_REGISTRY_DIR/versions/<version>; its CURRENT
+# file names the one to serve. Without a registry LOCAL_MODEL_DIR is served.
+MODEL_REGISTRY_DIR = os.getenv('MODEL_REGISTRY_DIR') or os.path.join(os.path.dirname(__file__), '..', 'model_registry')
+MODEL_WATCH_INTERVAL = float(os.getenv('MODEL_WATCH_INTERVAL', 5))
+# pytorch (fp32 eager), int8 (dynamic quantization) or onnx (ONNX Runtime on CPU)
+INFERENCE_BACKEND = os.getenv('INFERENCE_BACKEND', 'pytorch')
+# Prebuilt by export_artifact.py into <model dir>/serving; used when it matches the weights
+SERVING_ARTIFACT = os.getenv('SERVING_ARTIFACT', '1') == '1'
+SERVING_ARTIFACT_DIR = os.getenv('SERVING_ARTIFACT_DIR')
+# Stop at the first exit head this confident (bert_finetune.py --early_exit); 0 runs every layer
+EARLY_EXIT_THRESHOLD = float(os.getenv('EARLY_EXIT_THRESHOLD', 0))
+
+registry = ModelRegistry(MODEL_REGISTRY_DIR)
 
-def load_model_and_tokenizer():
+def resolve_model_source():
+    # (version, model_dir) to serve: the registry's CURRENT, else LOCAL_MODEL_DIR
+    version = registry.current()
+    if version:
+        return version, registry.path(version)
+    # Exit heads only change predictions (and so the version) when they are used
+    ignore = () if EARLY_EXIT_THRESHOLD else EXIT_HEAD_FILES
+    return model_fingerprint(LOCAL_MODEL_DIR, MODEL_NAME, ignore), LOCAL_MODEL_DIR
+
+def load_model_and_tokenizer(model_dir=None):
+    model_dir = model_dir or LOCAL_MODEL_DIR
     try:
-        from transformers import AutoTokenizer, AutoModelForSequenceClassification
-        if os.path.exists(os.path.join(LOCAL_MODEL_DIR, 'config.json')):
-            tokenizer = AutoTokenizer.from_pretrained(LOCAL_MODEL_DIR)
-            model = AutoModelForSequenceClassification.from_pretrained(LOCAL_MODEL_DIR)
+        artifact_dir = (model_dir == LOCAL_MODEL_DIR and SERVING_ARTIFACT_DIR) or os.path.join(model_dir, 'serving')
+        if SERVING_ARTIFACT and artifact_is_current(artifact_dir, model_fingerprint(model_dir, MODEL_NAME, EXIT_HEAD_FILES)):
+            tokenizer, model = load_artifact(artifact_dir)
         else:
-            tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-            model = AutoModelForSequenceClassification.from_pretrained(MODEL_NAME, num_labels=2)
+            from transformers import AutoTokenizer, AutoModelForSequenceClassification
+            if os.path.exists(os.path.join(model_dir, 'config.json')):
+                tokenizer = AutoTokenizer.from_pretrained(model_dir)
+                model = AutoModelForSequenceClassification.from_pretrained(model_dir)
+            else:
+                tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+                model = AutoModelForSequenceClassification.from_pretrained(MODEL_NAME, num_labels=2)
+        if not hasattr(model.config, 'id2label'):
+            model.config.id2label = {0: 'Fake', 1: 'Real'}
+            model.config.label2id = {'Fake': 0, 'Real': 1}
+        model.eval()
+        model = apply_backend(INFERENCE_BACKEND, model, tokenizer, model_dir)
+        if EARLY_EXIT_THRESHOLD:
+            model = apply_early_exit(model, model_dir, EARLY_EXIT_THRESHOLD)
         return tokenizer, model
     except Exception as e:
         raise Exception(f"Failed to load model: {str(e)}")
 
-tokenizer = None
-model = None
+# (tokenizer, model, version), replaced as a whole by swap_model. Inference
+# code reads it once per call, so a request never mixes two versions.
+model_bundle = None
+_model_lock = threading.Lock()
+
+def get_model_bundle():
+    global model_bundle
+    if model_bundle is None:
+        with _model_lock:
+            if model_bundle is None:
+                version, model_dir = resolve_model_source()
+                tok, mdl = load_model_and_tokenizer(model_dir)
+                model_bundle = (tok, mdl, version)
+    # In preload mode the gunicorn master must not run the watcher; post_fork starts it
+    if model_watcher is not None and MODEL_LOAD_MODE != 'preload':
+        model_watcher.ensure_started()
+    return model_bundle
 
 def get_model_and_tokenizer():
-    global tokenizer, model
-    if tokenizer is None or model is None:
-        tokenizer, model = load_model_and_tokenizer()
-        if not hasattr(model.config, 'id2label'):
-            model.config.id2label = {0: 'Fake', 1: 'Real'}
-            model.config.label2id = {'Fake': 0, 'Real': 1}
-        model.eval()
-    return tokenizer, model
+    tok, mdl, _ = get_model_bundle()
+    return tok, mdl
+
+def serving_version():
+    bundle = model_bundle
+    return bundle[2] if bundle is not None else resolve_model_source()[0]
+
+# lazy: load on first request (dev default). eager: load and warm up in the
+# background at startup; /readyz stays 503 until warm-up has finished.
+# preload: set by gunicorn.conf.py; the master loads, each worker warms up after fork.
+MODEL_LOAD_MODE = os.getenv('MODEL_LOAD_MODE', 'lazy')
+WARMUP_SEQ_LENGTHS = [int(n) for n in os.getenv('WARMUP_SEQ_LENGTHS', '16,64,128,256,512').split(',') if n]
+WARMUP_BATCH_SIZES = [int(n) for n in os.getenv('WARMUP_BATCH_SIZES', '1,8').split(',') if n]
+
+model_state = {'status': 'cold', 'error': None, 'loadSeconds': None, 'warmupSeconds': None}
+
+def warm_up(tok, mdl):
+    import torch
+    max_length = min(tok.model_max_length, mdl.config.max_position_embeddings)
+    for length in WARMUP_SEQ_LENGTHS:
+        length = min(length, max_length)
+        for batch_size in WARMUP_BATCH_SIZES:
+            inputs = tok(['news ' * length] * batch_size, truncation=True, max_length=length,
+                         padding='max_length', return_tensors='pt')
+            with torch.no_grad():
+                mdl(**inputs)
+
+def warm_up_model():
+    try:
+        model_state['status'] = 'loading'
+        start = time.perf_counter()
+        tok, mdl = get_model_and_tokenizer()
+        model_state['loadSeconds'] = time.perf_counter() - start
+
+        model_state['status'] = 'warming'
+        start = time.perf_counter()
+        warm_up(tok, mdl)
+        model_state['warmupSeconds'] = time.perf_counter() - start
+        model_state['status'] = 'ready'
+    except Exception as e:
+        model_state['status'] = 'failed'
+        model_state['error'] = str(e)
+        print(f'Model warm-up failed: {str(e)}')
+
+def start_warm_up():
+    thread = threading.Thread(target=warm_up_model, name='model-warmup', daemon=True)
+    thread.start()
+    return thread
+
+_readiness_lock = threading.Lock()
+
+def readiness():
+    # (ready, body). Ready means loaded and warmed in every mode; in lazy mode
+    # the first probe starts the load in the background.
+    if MODEL_LOAD_MODE == 'lazy' and model_state['status'] == 'cold':
+        with _readiness_lock:
+            if model_state['status'] == 'cold':
+                model_state['status'] = 'loading'
+                start_warm_up()
+    ready = model_state['status'] == 'ready'
+    return ready, {'ready': ready, 'mode': MODEL_LOAD_MODE, **model_state}
+
+# Hot-swap: the new version loads and warms up next to the serving one, then
+# replaces it in a single assignment. Requests already running finish on the
+# old bundle; its weights are freed when the last of them lets go.
+model_swap = {'status': 'idle', 'version': None, 'error': None, 'seconds': None}
+_swap_lock = threading.Lock()
+
+def release_memory():
+    gc.collect()
+    try:
+        import ctypes
+        ctypes.CDLL('libc.so.6').malloc_trim(0)
+    except Exception:
+        pass
+
+def swap_model(version):
+    global model_bundle
+    with _swap_lock:
+        if model_bundle is not None and model_bundle[2] == version:
+            return
+        model_swap.update({'status': 'loading', 'version': version, 'error': None, 'seconds': None})
+        start = time.perf_counter()
+        try:
+            tok, mdl = load_model_and_tokenizer(registry.path(version))
+            model_swap['status'] = 'warming'
+            warm_up(tok, mdl)
+        except Exception as e:
+            model_swap.update({'status': 'failed', 'error': str(e)})
+            raise
+        previous = model_bundle
+        model_bundle = (tok, mdl, version)
+        del previous, tok, mdl
+        for component in (prediction_cache, near_duplicates):
+            if component is not None:
+                component.version(force=True)
+        release_memory()
+        model_swap.update({'status': 'swapped', 'seconds': time.perf_counter() - start})
+        print(f'Now serving model version {version}')
+
+model_watcher = RegistryWatcher(registry, serving_version, swap_model, MODEL_WATCH_INTERVAL) if MODEL_WATCH_INTERVAL > 0 else None
+
+
+batch_size_hist = metrics.histogram('fakenews_batch_size', 'Texts per forward pass', metrics.SIZE_BUCKETS)
+sequence_tokens_hist = metrics.histogram('fakenews_sequence_tokens', 'Tokens per text after truncation', metrics.TOKEN_BUCKETS)
+truncated_tokens_total = metrics.counter('fakenews_truncated_tokens_total', 'Tokens dropped by truncation')
+truncated_texts_total = metrics.counter('fakenews_truncated_texts_total', 'Texts that were truncated')
+
+def record_tokenization(tokenizer, inputs, batch=True):
+    if batch:
+        batch_size_hist.observe(len(inputs['input_ids']))
+    mask = inputs['attention_mask']
+    # One tensor reduction per padded batch; unpadded encodings are all real tokens
+    lengths = mask.sum(dim=1).tolist() if hasattr(mask, 'sum') else [len(m) for m in mask]
+    for length in lengths:
+        sequence_tokens_hist.observe(length)
+    # Fast tokenizers keep what truncation cut off on each encoding
+    special = tokenizer.num_special_tokens_to_add()
+    for enc in getattr(inputs, 'encodings', None) or []:
+        if enc is not None and enc.overflowing:
+            truncated_texts_total.inc()
+            truncated_tokens_total.inc(sum(max(0, len(o.ids) - special) for o in enc.overflowing))
+
+exit_layer_hist = metrics.histogram('fakenews_exit_layer', 'Encoder layer that produced each verdict in early-exit mode',
+                                    (1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 16, 24))
+
+def predict_probs(texts, details=False):
+    # details: return (probs, float16 pooled embedding bytes or None, model version,
+    # exit layer or None) per text
+    tokenizer, model, version = get_model_bundle()
+    import torch
+    with timed('tokenize'):
+        inputs = tokenizer(texts, truncation=True, padding=True, return_tensors='pt')
+    record_tokenization(tokenizer, inputs)
+    with torch.no_grad():
+        with timed('forward'), capture_pooled(model if details and VECTOR_INDEX_ENABLED else None) as pooled:
+            outputs = model(**inputs)
+            logits = outputs.logits
+        with timed('softmax'):
+            probs = torch.softmax(logits, dim=-1).tolist()
+    exit_layers = getattr(outputs, 'exit_layers', None) or [None] * len(probs)
+    for layer in exit_layers:
+        if layer is not None:
+            exit_layer_hist.observe(layer)
+    if not details:
+        return probs
+    return [(p, e, version, l) for p, e, l in zip(probs, pooled.embeddings(len(probs)), exit_layers)]
+
+# Each analyzed text keeps a compact embedding in its history document;
+# a memory-mapped IVF index over them serves /similar.
+VECTOR_INDEX_ENABLED = os.getenv('VECTOR_INDEX_ENABLED', '1') == '1'
+VECTOR_INDEX_DIR = os.getenv('VECTOR_INDEX_DIR') or os.path.join(os.path.dirname(__file__), 'vector_index')
+
+# Requests from all handler threads are grouped into one padded forward pass
+BATCH_ENABLED = os.getenv('BATCH_ENABLED', '1') == '1'
+BATCH_MAX_SIZE = int(os.getenv('BATCH_MAX_SIZE', 16))
+BATCH_WAIT_MS = float(os.getenv('BATCH_WAIT_MS', 5))
+
+batcher = MicroBatcher(lambda texts: predict_probs(texts, details=True), BATCH_MAX_SIZE, BATCH_WAIT_MS) if BATCH_ENABLED else None
+
+# Admission control for model work (utils.admission). Single analyses are
+# interactive, /analyzeBatch and async image jobs are batch. Clients may
+# shorten their class's deadline with the X-Request-Deadline-Ms header.
+ADMISSION_ENABLED = os.getenv('ADMISSION_ENABLED', '1') == '1'
+DEADLINE_HEADER = 'X-Request-Deadline-Ms'
+
+admission = AdmissionController(
+    max_concurrent=int(os.getenv('ADMISSION_MAX_CONCURRENT', 2 * BATCH_MAX_SIZE if BATCH_ENABLED else 4)),
+    max_queue={'interactive': int(os.getenv('ADMISSION_QUEUE_INTERACTIVE', 64)),
+               'batch': int(os.getenv('ADMISSION_QUEUE_BATCH', 16))},
+    max_per_user=int(os.getenv('ADMISSION_MAX_PER_USER', 8)),
+    default_deadlines={'interactive': float(os.getenv('ADMISSION_DEADLINE_MS', 10000)) / 1000.0,
+                       'batch': float(os.getenv('ADMISSION_BATCH_DEADLINE_MS', 60000)) / 1000.0},
+) if ADMISSION_ENABLED else None
+
+def model_slot(cost=1, max_seconds=None):
+    # Callers load the model first, so a cold load is never timed as service time
+    return admission.slot(cost, max_seconds) if admission else nullcontext()
+
+def request_admission(priority, deadline_header, user_id):
+    if admission is None:
+        return nullcontext()
+    try:
+        deadline_ms = float(deadline_header) if deadline_header else None
+    except ValueError:
+        deadline_ms = None
+    return admission.context(priority, deadline_ms, user_id)
+
+def run_admitted(priority, deadline_header, user_id, fn, *args):
+    with request_admission(priority, deadline_header, user_id):
+        return fn(*args)
+
+def admission_class(priority):
+    # Goes below @token_required, which sets request.user
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            with request_admission(priority, request.headers.get(DEADLINE_HEADER), request.user):
+                return f(*args, **kwargs)
+        return decorated
+    return decorator
+
+def label_probs(probs):
+    _, model = get_model_and_tokenizer()
+    with timed('argmax'):
+        pred_index = max(range(len(probs)), key=probs.__getitem__)
+        prediction = model.config.id2label[pred_index]
+        confidence = probs[pred_index] * 100.0
+    return prediction, confidence
+
+# Repeated submissions of the same story skip the model. Keys include the
+# serving model version, so swapping models invalidates the cache.
+PREDICTION_CACHE_ENABLED = os.getenv('PREDICTION_CACHE_ENABLED', '1') == '1'
+PREDICTION_CACHE_SHARED = os.getenv('PREDICTION_CACHE_SHARED', '0') == '1'
+
+def cache_version(version):
+    # Cache and index version for results of registry/model version `version`
+    exit_mode = f':exit{EARLY_EXIT_THRESHOLD:g}' if EARLY_EXIT_THRESHOLD else ''
+    return f'{version}:{INFERENCE_BACKEND}{exit_mode}'
+
+def model_version():
+    return cache_version(serving_version())
+
+prediction_cache = PredictionCache(
+    model_version,
+    max_entries=int(os.getenv('PREDICTION_CACHE_SIZE', 10000)),
+    ttl_seconds=int(os.getenv('PREDICTION_CACHE_TTL', 3600)),
+    collection=prediction_cache_collection if PREDICTION_CACHE_SHARED else None,
+) if PREDICTION_CACHE_ENABLED else None
+
+def ensure_indexes_in_background():
+    # Index builds wait on the Mongo connection; keep them off the import path
+    def run():
+        try:
+            ensure_indexes()
+        except Exception as e:
+            print(f'Could not create indexes: {str(e)}')
+    threading.Thread(target=run, name='ensure-indexes', daemon=True).start()
+
+ensure_indexes_in_background()
+
+def run_model(text):
+    # (probs, embedding, model version, exit layer) for one text
+    get_model_bundle()
+    with model_slot():
+        return batcher.predict(text) if batcher else predict_probs([text], details=True)[0]
+
+def classify_probs(text):
+    # Returns (probs, embedding, model version, exit layer); cache hits carry
+    # no embedding or exit layer
+    probs = prediction_cache.get(text) if prediction_cache else None
+    if probs is not None:
+        return probs, None, serving_version(), None
+    probs, embedding, version, exit_layer = run_model(text)
+    if prediction_cache:
+        prediction_cache.set(text, probs, version=cache_version(version))
+    return probs, embedding, version, exit_layer
+
+# Lightly edited copies of an analyzed story reuse its verdict, whoever
+# analyzed it. Entries are keyed by history id and remember their owner; a
+# match is reported as duplicateOf that item only to the same user.
+NEAR_DUP_ENABLED = os.getenv('NEAR_DUP_ENABLED', '1') == '1'
+
+near_duplicates = NearDuplicateIndex(
+    model_version,
+    threshold=float(os.getenv('NEAR_DUP_THRESHOLD', 0.8)),
+    num_perm=int(os.getenv('NEAR_DUP_NUM_PERM', 128)),
+    max_entries=int(os.getenv('NEAR_DUP_MAX_ENTRIES', 200000)),
+    min_words=int(os.getenv('NEAR_DUP_MIN_WORDS', 20)),
+) if NEAR_DUP_ENABLED else None
+
+vector_index = VectorIndex(
+    VECTOR_INDEX_DIR,
+    nlist=int(os.getenv('VECTOR_INDEX_NLIST', 1024)),
+    nprobe=int(os.getenv('VECTOR_INDEX_NPROBE', 16)),
+    exact_limit=int(os.getenv('VECTOR_INDEX_EXACT_LIMIT', 20000)),
+    train_size=int(os.getenv('VECTOR_INDEX_TRAIN_SIZE', 50000)),
+) if VECTOR_INDEX_ENABLED else None
+vector_sync = VectorIndexSync(vector_index, history_collection, lag=float(os.getenv('VECTOR_INDEX_LAG', 10))) if vector_index else None
+
+def classify_or_match(text):
+    # Returns {'probs', 'embedding', 'modelVersion', 'exitLayer', 'signature', 'match'};
+    # match is (history id, similarity, (probs, owner id)) of a near-duplicate or None
+    signature = match = None
+    if near_duplicates is not None:
+        with timed('near_duplicate'):
+            signature = near_duplicates.signature(text)
+            match = near_duplicates.query(signature) if signature is not None else None
+    if match is not None:
+        probs, embedding, version, exit_layer = match[2][0], None, serving_version(), None
+    else:
+        probs, embedding, version, exit_layer = classify_probs(text)
+    return {'probs': probs, 'embedding': embedding, 'modelVersion': version, 'exitLayer': exit_layer,
+            'signature': signature, 'match': match}
+
+def remember_analysis(user_id, history_id, result):
+    if result['signature'] is not None and result['match'] is None:
+        near_duplicates.add(str(history_id), result['signature'], (result['probs'], str(user_id)),
+                            version=cache_version(result['modelVersion']))
+    if vector_sync is not None:
+        vector_sync.ensure_started()
+
+def duplicate_fields(match, user_id):
+    # Another user's history id is neither theirs to see nor readable by this user
+    if not match:
+        return {}
+    if match[2][1] != str(user_id):
+        return {'similarity': match[1]}
+    return {'duplicateOf': match[0], 'similarity': match[1]}
+
+def exit_fields(result):
+    return {'exitLayer': result['exitLayer']} if result['exitLayer'] is not None else {}
+
+ANALYZE_BATCH_MAX_ITEMS = int(os.getenv('ANALYZE_BATCH_MAX_ITEMS', 256))
+ANALYZE_BATCH_SIZE = int(os.getenv('ANALYZE_BATCH_SIZE', 32))
+
+def predict_probs_bucketed(texts, batch_size=ANALYZE_BATCH_SIZE, bundle=None):
+    # Tokenize once, then pad per length bucket. A failing bucket yields its
+    # exception in place of the probabilities so other items still succeed.
+    tokenizer, model, _ = bundle or get_model_bundle()
+    import torch
+    with timed('tokenize'):
+        encoded = tokenizer(texts, truncation=True)
+    record_tokenization(tokenizer, encoded, batch=False)
+    lengths = [len(ids) for ids in encoded['input_ids']]
+    results = [None] * len(texts)
+    for bucket in bucket_by_length(lengths, batch_size):
+        try:
+            features = [{k: encoded[k][i] for k in encoded.keys()} for i in bucket]
+            inputs = tokenizer.pad(features, return_tensors='pt')
+            batch_size_hist.observe(len(bucket))
+            with torch.no_grad():
+                with timed('forward'):
+                    logits = model(**inputs).logits
+                with timed('softmax'):
+                    probs = torch.softmax(logits, dim=-1).tolist()
+        except Exception as e:
+            probs = [e] * len(bucket)
+        for i, p in zip(bucket, probs):
+            results[i] = p
+    return results
+
+
+# Long-document mode: score every overlapping window instead of truncating at 512 tokens
+LONG_DOC_STRIDE = int(os.getenv('LONG_DOC_STRIDE', 128))
+LONG_DOC_AGGREGATION = os.getenv('LONG_DOC_AGGREGATION', 'mean')
+long_doc_windows_hist = metrics.histogram('fakenews_long_document_windows', 'Windows per long-document analysis', metrics.SIZE_BUCKETS)
+
+def predict_long_document(text, aggregation=LONG_DOC_AGGREGATION):
+    # Returns (probs, window probs, model version)
+    tokenizer, model, version = get_model_bundle()
+    import torch
+    max_length = min(tokenizer.model_max_length, model.config.max_position_embeddings)
+    with timed('tokenize'):
+        inputs = window_inputs(tokenizer, text, max_length, LONG_DOC_STRIDE)
+    n = inputs['input_ids'].size(0)
+    long_doc_windows_hist.observe(n)
+    with model_slot(n), torch.no_grad():
+        with timed('forward'):
+            logits = torch.cat([
+                model(**{k: v[i:i + ANALYZE_BATCH_SIZE] for k, v in inputs.items()}).logits
+                for i in range(0, n, ANALYZE_BATCH_SIZE)
+            ])
+    with timed('aggregate'):
+        probs, window_probs = aggregate_logits(logits, aggregation)
+    return probs, window_probs, version
+
+def classify_long_document(text, aggregation=LONG_DOC_AGGREGATION):
+    variant = f'long:{aggregation}:{LONG_DOC_STRIDE}'
+    cached = prediction_cache.get(text, variant) if prediction_cache else None
+    if cached is not None:
+        return cached[0], cached[1], serving_version()
+    probs, window_probs, version = predict_long_document(text, aggregation)
+    if prediction_cache:
+        prediction_cache.set(text, [probs, window_probs], variant, version=cache_version(version))
+    return probs, window_probs, version
+
+
+request_seconds = metrics.histogram('fakenews_request_seconds', 'HTTP request latency')
+requests_total = metrics.counter('fakenews_requests_total', 'HTTP requests by endpoint and status')
+
+# Opt-in: profile a random PROFILE_SAMPLE_RATE of requests and keep the
+# collapsed stacks of those slower than PROFILE_SLOW_MS in PROFILE_DIR.
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+PROFILE_SLOW_MS = float(os.getenv('PROFILE_SLOW_MS', 1000))
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(os.path.dirname(__file__), 'profiles'))
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    g.profiler = None
+    if PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE:
+        g.profiler = SamplingProfiler(threading.get_ident()).start()
+
+@app.after_request
+def record_request(response):
+    elapsed = time.perf_counter() - g.get('request_start', time.perf_counter())
+    endpoint = request.endpoint or 'unknown'
+    request_seconds.observe(elapsed, endpoint=endpoint)
+    requests_total.inc(endpoint=endpoint, status=str(response.status_code))
+    profiler = g.get('profiler')
+    if profiler is not None:
+        profiler.stop()
+        if elapsed * 1000.0 >= PROFILE_SLOW_MS:
+            path = profiler.dump(PROFILE_DIR, endpoint)
+            print(f'Slow request {endpoint} took {elapsed * 1000.0:.0f} ms, profile written to {path}')
+    return response
+
+cache_events = metrics.counter('fakenews_prediction_cache_events_total', 'Prediction cache hits, misses, evictions and invalidations')
+near_duplicate_events = metrics.counter('fakenews_near_duplicate_events_total', 'Near-duplicate index hits, misses and evictions')
+token_cache_events = metrics.counter('fakenews_token_cache_events_total', 'Verified-token cache hits, misses and evictions')
+vector_index_rows = metrics.gauge('fakenews_vector_index_rows', 'Embeddings searchable by /similar in this process')
+history_queue_depth = metrics.gauge('fakenews_history_queue_depth', 'History documents waiting to be written')
+history_flush_ms = metrics.gauge('fakenews_history_flush_ms', 'History write-behind flush latency')
+history_written = metrics.counter('fakenews_history_written_total', 'History documents written by the write-behind flusher')
+admission_events = metrics.counter('fakenews_admission_events_total', 'Model work admitted or rejected, by priority class and outcome')
+admission_queued = metrics.gauge('fakenews_admission_queued', 'Requests waiting for a model slot')
+admission_running = metrics.gauge('fakenews_admission_running', 'Requests holding a model slot')
+
+def collect_component_metrics():
+    if prediction_cache is not None:
+        stats = prediction_cache.stats()
+        for event in ('hits', 'shared_hits', 'misses', 'evictions', 'expirations', 'invalidations', 'stale'):
+            cache_events.set(stats[event], event=event)
+    if near_duplicates is not None:
+        stats = near_duplicates.stats()
+        for event in ('hits', 'misses', 'skipped', 'evictions', 'invalidations', 'stale'):
+            near_duplicate_events.set(stats[event], event=event)
+    if vector_index is not None:
+        vector_index_rows.set(vector_index.stats()['count'])
+    if admission is not None:
+        stats = admission.stats()
+        admission_running.set(stats['running'])
+        for priority, depth in stats['queued'].items():
+            admission_queued.set(depth, priority=priority)
+        for event in stats['events']:
+            admission_events.set(event['count'], priority=event['priority'], outcome=event['outcome'])
+    for event, value in token_cache_counters.items():
+        token_cache_events.set(value, event=event)
+    if history_writer is not None:
+        stats = history_writer.stats()
+        history_queue_depth.set(stats['queue_depth'])
+        history_flush_ms.set(stats['last_flush_ms'], kind='last')
+        history_flush_ms.set(stats['avg_flush_ms'], kind='avg')
+        history_flush_ms.set(stats['max_flush_ms'], kind='max')
+        history_written.set(stats['written'])
+
+metrics.register_collector(collect_component_metrics)
+
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
 
 
 @app.route('/')
 def home():
     return jsonify({'message':'AI Fake News Detector API'})
 
+@app.errorhandler(Overloaded)
+def overloaded(e):
+    return jsonify({'message': str(e)}), e.status, {'Retry-After': str(e.retry_after)}
+
+@app.errorhandler(PasswordHasherBusy)
+def password_hasher_busy(e):
+    return jsonify({'message':'Too many login attempts in progress, try again shortly'}), 503, {'Retry-After': '2'}
+
+@app.route('/healthz')
+def healthz():
+    return jsonify({'status': 'ok'})
+
+@app.route('/readyz')
+def readyz():
+    ready, body = readiness()
+    return jsonify(body), 200 if ready else 503
+
 @app.route('/signup', methods=['POST'])
 def signup():
     data = request.json
@@ -77,7 +600,7 @@ def signup():
         return jsonify({'message':'Missing fields'}), 400
     if find_by_email(email):
         return jsonify({'message':'Email already exists'}), 400
-    pw_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+    pw_hash = hash_password(password)
     user = create_user(name, email, pw_hash)
     return jsonify({'message':'User created', 'user': {'id': str(user['_id']), 'name': user['name'], 'email': user['email']}}), 201
 
@@ -91,65 +614,348 @@ def login():
     user = find_by_email(email)
     if not user:
         return jsonify({'message':'Invalid credentials'}), 401
-    if not bcrypt.checkpw(password.encode('utf-8'), user['password']):
+    if not check_password(password, user['password']):
         return jsonify({'message':'Invalid credentials'}), 401
     token = generate_token(user['_id'])
     return jsonify({'token': token, 'user': {'id': str(user['_id']), 'name': user['name'], 'email': user['email']}})
 
+def analyze_text_request(user_id, data):
+    # Shared by the Flask route and the ASGI app; returns (body, status)
+    try:
+        data = data or {}
+        text = data.get('text')
+        if not text:
+            return {'message':'No text provided'}, 400
+
+        if data.get('longDocument'):
+            aggregation = data.get('aggregation', LONG_DOC_AGGREGATION)
+            if aggregation not in AGGREGATIONS:
+                return {'message': f'Invalid aggregation, expected one of {list(AGGREGATIONS)}'}, 400
+            probs, window_probs, version = classify_long_document(text, aggregation)
+            prediction, confidence = label_probs(probs)
+            window_scores = []
+            for p in window_probs:
+                w_prediction, w_confidence = label_probs(p)
+                window_scores.append({'prediction': w_prediction, 'confidence': w_confidence})
+            extra = {'windows': len(window_scores), 'windowScores': window_scores, 'aggregation': aggregation}
+            result = {'probs': probs, 'embedding': None, 'modelVersion': version, 'exitLayer': None,
+                      'signature': None, 'match': None}
+        else:
+            result = classify_or_match(text)
+            prediction, confidence = label_probs(result['probs'])
+            extra = {**duplicate_fields(result['match'], user_id), **exit_fields(result)}
+
+        version = result['modelVersion']
+        with timed('history_write'):
+            hist = create_history(user_id, text, prediction, confidence, embedding=result['embedding'], model_version=version)
+        remember_analysis(user_id, hist['_id'], result)
+        return {'prediction': prediction, 'confidence': confidence, 'text': text, 'historyId': str(hist['_id']),
+                'modelVersion': version, **extra}, 200
+    except Overloaded:
+        raise
+    except Exception as e:
+        return {'message': f'Analysis failed: {str(e)}'}, 500
+
+def analyze_batch_request(user_id, data):
+    data = data or {}
+    texts = data.get('texts')
+    if not isinstance(texts, list) or not texts:
+        return {'message':'No texts provided'}, 400
+    if len(texts) > ANALYZE_BATCH_MAX_ITEMS:
+        return {'message': f'Too many texts (max {ANALYZE_BATCH_MAX_ITEMS})'}, 413
+
+    results = [None] * len(texts)
+    valid = []
+    for i, text in enumerate(texts):
+        if not isinstance(text, str) or not text.strip():
+            results[i] = {'index': i, 'error': 'No text provided'}
+        else:
+            valid.append(i)
+
+    all_probs = [prediction_cache.get(texts[i]) if prediction_cache else None for i in valid]
+    misses = [n for n, probs in enumerate(all_probs) if probs is None]
+    try:
+        bundle = get_model_bundle() if misses else None
+        version = bundle[2] if bundle else serving_version()
+        with model_slot(len(misses)):
+            computed = predict_probs_bucketed([texts[valid[n]] for n in misses], bundle=bundle) if misses else []
+    except Overloaded:
+        raise
+    except Exception as e:
+        return {'message': f'Analysis failed: {str(e)}'}, 500
+    for n, probs in zip(misses, computed):
+        all_probs[n] = probs
+        if prediction_cache and not isinstance(probs, Exception):
+            prediction_cache.set(texts[valid[n]], probs, version=cache_version(version))
+
+    records = []
+    for i, probs in zip(valid, all_probs):
+        if isinstance(probs, Exception):
+            results[i] = {'index': i, 'error': f'Analysis failed: {str(probs)}'}
+            continue
+        prediction, confidence = label_probs(probs)
+        results[i] = {'index': i, 'prediction': prediction, 'confidence': confidence}
+        records.append((i, {'input_text': texts[i], 'prediction': prediction, 'confidence': confidence, 'model_version': version}))
+
+    if records:
+        try:
+            with timed('history_write'):
+                ids = create_history_many(user_id, [r for _, r in records])
+            for (i, _), hist_id in zip(records, ids):
+                results[i]['historyId'] = str(hist_id)
+        except Exception as e:
+            for i, _ in records:
+                results[i]['historyError'] = f'Failed to save history: {str(e)}'
+
+    return {'results': results, 'modelVersion': version}, 200
+
 @app.route('/analyzeText', methods=['POST'])
 @token_required
+@admission_class('interactive')
 def analyze_text():
+    body, status = analyze_text_request(request.user, request.json)
+    return jsonify(body), status
+
+@app.route('/analyzeBatch', methods=['POST'])
+@token_required
+@admission_class('batch')
+def analyze_batch():
+    body, status = analyze_batch_request(request.user, request.json)
+    return jsonify(body), status
+
+SIMILAR_DEFAULT_K = 10
+SIMILAR_MAX_K = 50
+
+def similar_request(user_id, data):
+    # Closest earlier analyses of this user to a text or to one of their history items
+    if vector_index is None:
+        return {'message':'Similarity search is disabled'}, 404
+    data = data or {}
     try:
-        data = request.json
+        k = max(1, min(int(data.get('k', SIMILAR_DEFAULT_K)), SIMILAR_MAX_K))
+    except (TypeError, ValueError):
+        return {'message':'Invalid k'}, 400
+    exclude = None
+    embedding = None
+    if data.get('historyId'):
+        try:
+            item = get_history_item(user_id, data['historyId'])
+        except InvalidId:
+            item = None
+        if not item:
+            return {'message':'History item not found'}, 404
+        text, embedding, exclude = item['inputText'], item.get('embedding'), item['_id']
+    else:
         text = data.get('text')
         if not text:
-            return jsonify({'message':'No text provided'}), 400
+            return {'message':'No text or historyId provided'}, 400
+    try:
+        if embedding is None:
+            embedding = run_model(text)[1]
+        if embedding is None:
+            return {'message':'The inference backend does not expose embeddings'}, 501
+        vector_sync.ensure_started()
+        with timed('similar_search'):
+            hits = vector_index.search(decode_embedding(embedding), k, owner=user_id, exclude=exclude)
+        docs = get_history_items(user_id, [oid for oid, _ in hits])
+    except Overloaded:
+        raise
+    except Exception as e:
+        return {'message': f'Search failed: {str(e)}'}, 500
+    results = [{'id': str(oid), 'text': docs[oid].get('textPreview'), 'prediction': docs[oid]['prediction'],
+                'confidence': docs[oid]['confidence'], 'timestamp': docs[oid]['createdAt'],
+                'modelVersion': docs[oid].get('modelVersion'), 'score': score}
+               for oid, score in hits if oid in docs]
+    return {'results': results}, 200
 
-        tokenizer, model = get_model_and_tokenizer()
-        import torch
-        inputs = tokenizer(text, truncation=True, padding=True, return_tensors='pt')
-        with torch.no_grad():
-            outputs = model(**inputs)
-            logits = outputs.logits
-            probs = F.softmax(logits, dim=-1).squeeze().tolist()
+@app.route('/similar', methods=['POST'])
+@token_required
+@admission_class('interactive')
+def similar():
+    body, status = similar_request(request.user, request.json)
+    return jsonify(body), status
 
-        pred_index = np.argmax(probs)
-        prediction = model.config.id2label[pred_index]
-        confidence = probs[pred_index] * 100.0
+# Occlusion explanations (utils.explain). The article and its masked copies
+# run in batches of EXPLAIN_BATCH_SIZE, at most EXPLAIN_MAX_PASSES batches or
+# EXPLAIN_MAX_MS per request; clients may ask for less.
+EXPLAIN_BATCH_SIZE = int(os.getenv('EXPLAIN_BATCH_SIZE', 32))
+EXPLAIN_MAX_PASSES = int(os.getenv('EXPLAIN_MAX_PASSES', 4))
+EXPLAIN_MAX_MS = float(os.getenv('EXPLAIN_MAX_MS', 10000))
+
+explanation_cache = PredictionCache(
+    model_version,
+    max_entries=int(os.getenv('EXPLAIN_CACHE_SIZE', 1000)),
+    ttl_seconds=int(os.getenv('EXPLAIN_CACHE_TTL', 86400)),
+) if PREDICTION_CACHE_ENABLED else None
+
+def explain_request(user_id, data):
+    data = data or {}
+    text = data.get('text')
+    if not text:
+        return {'message':'No text provided'}, 400
+    try:
+        passes = max(1, min(int(data.get('maxPasses', EXPLAIN_MAX_PASSES)), EXPLAIN_MAX_PASSES))
+        max_ms = max(1.0, min(float(data.get('maxMs', EXPLAIN_MAX_MS)), EXPLAIN_MAX_MS))
+    except (TypeError, ValueError):
+        return {'message':'Invalid maxPasses or maxMs'}, 400
+    max_inputs = passes * EXPLAIN_BATCH_SIZE - 1
+    # Offsets refer to the exact text, so its hash is part of the key, not just the normalized text
+    variant = f"explain:{max_inputs}:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+    result = explanation_cache.get(text, variant) if explanation_cache else None
+    cached = result is not None
+    if result is None:
+        try:
+            tokenizer, model, version = get_model_bundle()
+            # explain_text stops after max_ms, so the estimate never exceeds it
+            with model_slot(max_inputs + 1, max_ms / 1000.0), timed('explain'):
+                result = explain_text(model, tokenizer, text, max_inputs, EXPLAIN_BATCH_SIZE, max_ms / 1000.0)
+        except Overloaded:
+            raise
+        except Exception as e:
+            return {'message': f'Explanation failed: {str(e)}'}, 500
+        # A run cut short by maxMs is not cached
+        if explanation_cache and result['complete']:
+            explanation_cache.set(text, result, variant, version=cache_version(version))
+    prediction, confidence = label_probs(result['probs'])
+    body = {k: v for k, v in result.items() if k not in ('probs', 'target')}
+    return {'prediction': prediction, 'confidence': confidence, 'cached': cached, **body}, 200
+
+@app.route('/explain', methods=['POST'])
+@token_required
+@admission_class('interactive')
+def explain():
+    body, status = explain_request(request.user, request.json)
+    return jsonify(body), status
+
+# OCR runs in a bounded pool; its text then goes through the same batched
+# classifier as /analyzeText. Async mode hands the whole pipeline to a job.
+OCR_TIMEOUT = float(os.getenv('OCR_TIMEOUT', 60))
+ocr_pool = OcrPool()
+job_executor = ThreadPoolExecutor(max_workers=int(os.getenv('OCR_JOB_THREADS', 4)), thread_name_prefix='image-job')
+
+def analyze_extracted_text(user_id, extracted):
+    if not extracted.strip():
+        return {'message':'No text found in image', 'text': ''}
+    result = classify_or_match(extracted)
+    prediction, confidence = label_probs(result['probs'])
+    with timed('history_write'):
+        hist = create_history(user_id, extracted, prediction, confidence, image_url=None,
+                              embedding=result['embedding'], model_version=result['modelVersion'])
+    remember_analysis(user_id, hist['_id'], result)
+    return {'prediction': prediction, 'confidence': confidence, 'text': extracted, 'historyId': str(hist['_id']),
+            'modelVersion': result['modelVersion'], **duplicate_fields(result['match'], user_id), **exit_fields(result)}
 
-        hist = create_history(request.user, text, prediction, confidence)
-        return jsonify({'prediction': prediction, 'confidence': confidence, 'text': text, 'historyId': str(hist['_id'])})
+def run_image_job(job_id, user_id, ocr_future):
+    try:
+        extracted = ocr_future.result(timeout=OCR_TIMEOUT)
+        result = run_admitted('batch', None, user_id, analyze_extracted_text, user_id, extracted)
+        finish_job(job_id, result=result)
     except Exception as e:
-        return jsonify({'message': f'Analysis failed: {str(e)}'}), 500
+        finish_job(job_id, error=f'Analysis failed: {str(e)}')
 
 @app.route('/analyzeImage', methods=['POST'])
 @token_required
+@admission_class('interactive')
 def analyze_image():
     if 'image' not in request.files:
         return jsonify({'message':'No image uploaded'}), 400
-    img = request.files['image']
-    from PIL import Image
-    import pytesseract
+    data = request.files['image'].read()
+    try:
+        ocr_future = ocr_pool.submit(data)
+    except OcrBusy:
+        return jsonify({'message':'Image analysis is busy, try again shortly'}), 503, {'Retry-After': '5'}
 
-    image = Image.open(img.stream)
-    extracted = pytesseract.image_to_string(image)
-    if not extracted.strip():
-        return jsonify({'message':'No text found in image', 'text': ''}), 200
+    if request.args.get('async') == '1' or request.form.get('async') == '1':
+        job_id = create_job(request.user, 'analyzeImage')
+        job_executor.submit(run_image_job, job_id, request.user, ocr_future)
+        return jsonify({'jobId': str(job_id), 'status': 'pending'}), 202
 
-    tokenizer, model = get_model_and_tokenizer()
-    import torch
-    inputs = tokenizer(extracted, truncation=True, padding=True, return_tensors='pt')
-    with torch.no_grad():
-        outputs = model(**inputs)
-        logits = outputs.logits
-        probs = F.softmax(logits, dim=-1).squeeze().tolist()
+    try:
+        extracted = ocr_future.result(timeout=OCR_TIMEOUT)
+    except Exception as e:
+        return jsonify({'message': f'OCR failed: {str(e)}'}), 500
+    return jsonify(analyze_extracted_text(request.user, extracted))
 
-    pred_index = np.argmax(probs)
-    prediction = model.config.id2label[pred_index]
-    confidence = probs[pred_index] * 100.0
+@app.route('/jobs/<job_id>', methods=['GET'])
+@token_required
+def get_job(job_id):
+    job = find_job(job_id, request.user)
+    if not job:
+        return jsonify({'message':'Job not found'}), 404
+    body = {'jobId': str(job['_id']), 'status': job['status']}
+    if job['status'] == 'done':
+        body['result'] = job['result']
+    elif job['status'] == 'failed':
+        body['error'] = job['error']
+    return jsonify(body)
+
+def cache_stats_body():
+    # Shared by the Flask route and the ASGI app
+    body = {'enabled': True, **prediction_cache.stats()} if prediction_cache else {'enabled': False}
+    body['nearDuplicates'] = near_duplicates.stats() if near_duplicates is not None else {'enabled': False}
+    body['explanations'] = explanation_cache.stats() if explanation_cache else {'enabled': False}
+    return body
+
+@app.route('/cache/stats', methods=['GET'])
+@token_required
+def cache_stats():
+    return jsonify(cache_stats_body())
+
+# Model registry admin API; disabled unless ADMIN_TOKEN is set
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
 
-    hist = create_history(request.user, extracted, prediction, confidence, image_url=None)
-    return jsonify({'prediction': prediction, 'confidence': confidence, 'text': extracted, 'historyId': str(hist['_id'])})
+def admin_authorized(token):
+    return bool(ADMIN_TOKEN) and hmac.compare_digest((token or '').encode('utf-8'), ADMIN_TOKEN.encode('utf-8'))
+
+def admin_required(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if not admin_authorized(request.headers.get('X-Admin-Token')):
+            return jsonify({'message':'Admin token missing or invalid'}), 403
+        return f(*args, **kwargs)
+    return decorated
+
+def models_status():
+    return {'serving': serving_version(), 'current': registry.current(), 'versions': registry.versions(),
+            'backend': INFERENCE_BACKEND, 'swap': dict(model_swap)}
+
+def swap_in_background(version):
+    def run():
+        try:
+            swap_model(version)
+        except Exception as e:
+            print(f'Could not switch to model version {version}: {str(e)}')
+    threading.Thread(target=run, name='model-swap', daemon=True).start()
+
+def activate_model_request(data):
+    version = (data or {}).get('version')
+    if not registry.exists(version):
+        return {'message':'Unknown model version'}, 404
+    registry.set_current(version)
+    # This process swaps right away; other workers' watchers follow within MODEL_WATCH_INTERVAL
+    swap_in_background(version)
+    return {'message':'Activating model version', 'version': version}, 202
+
+@app.route('/admin/models', methods=['GET'])
+@admin_required
+def list_models():
+    return jsonify(models_status())
+
+@app.route('/admin/models/activate', methods=['POST'])
+@admin_required
+def activate_model():
+    body, status = activate_model_request(request.json)
+    return jsonify(body), status
+
+@app.route('/history/writer/stats', methods=['GET'])
+@token_required
+def history_writer_stats():
+    return jsonify(history_writer_stats_body())
+
+def history_writer_stats_body():
+    if history_writer is None:
+        return {'enabled': False}
+    return {'enabled': True, **history_writer.stats()}
 
 @app.route('/profile', methods=['GET'])
 @token_required
@@ -171,11 +977,39 @@ def update_profile():
     user = update_user(request.user, update_data)
     return jsonify({'user': {'id': str(user['_id']), 'name': user['name'], 'email': user['email'], 'themePreference': user.get('themePreference', 'dark')}})
 
+HISTORY_PAGE_SIZE = int(os.getenv('HISTORY_PAGE_SIZE', 20))
+
 @app.route('/history', methods=['GET'])
 @token_required
 def get_history():
-    history = get_history_for_user(request.user)
-    return jsonify({'history': [{'id': str(h['_id']), 'text': h['inputText'], 'prediction': h['prediction'], 'confidence': h['confidence'], 'timestamp': h['createdAt'], 'image_url': h.get('imageUrl')} for h in history]})
+    full = request.args.get('fields') == 'full'
+    try:
+        limit = int(request.args.get('limit', HISTORY_PAGE_SIZE))
+        history, next_cursor = get_history_page(request.user, limit, request.args.get('cursor'), full=full)
+    except (ValueError, InvalidId):
+        return jsonify({'message':'Invalid limit or cursor'}), 400
+    items = [{'id': str(h['_id']), 'text': h['inputText'] if full else h.get('textPreview'), 'prediction': h['prediction'], 'confidence': h['confidence'], 'timestamp': h['createdAt'], 'image_url': h.get('imageUrl'), 'modelVersion': h.get('modelVersion')} for h in history]
+    return jsonify({'history': items, 'nextCursor': next_cursor})
+
+@app.route('/stats', methods=['GET'])
+@token_required
+def stats():
+    # Served from per-user rollups, so the cost does not grow with history
+    try:
+        return jsonify(get_stats(request.user, int(request.args.get('days', STATS_DEFAULT_DAYS))))
+    except ValueError:
+        return jsonify({'message':'Invalid days'}), 400
+
+@app.route('/history/<history_id>', methods=['GET'])
+@token_required
+def get_history_entry(history_id):
+    try:
+        h = get_history_item(request.user, history_id)
+    except InvalidId:
+        h = None
+    if not h:
+        return jsonify({'message':'History item not found'}), 404
+    return jsonify({'id': str(h['_id']), 'text': h['inputText'], 'prediction': h['prediction'], 'confidence': h['confidence'], 'timestamp': h['createdAt'], 'image_url': h.get('imageUrl'), 'modelVersion': h.get('modelVersion')})
 
 @app.route('/settings', methods=['PUT'])
 @token_required
@@ -186,6 +1020,18 @@ def update_settings():
     return jsonify({'message':'Settings updated'})
 
 
+if MODEL_LOAD_MODE == 'eager':
+    start_warm_up()
+
+def shutdown():
+    # Flush buffered history writes before the process exits
+    if history_writer is not None:
+        history_writer.close()
+
+atexit.register(shutdown)
+
+
 if __name__ == '__main__':
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
     port = int(os.getenv('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=True, use_reloader=False)
@@ -0,0 +1,372 @@
+# ASGI serving mode for the same routes as app.py.
+# Usage (from backend/): uvicorn asgi_app:app --host 0.0.0.0 --port 5000
+#
+# Idle and slow clients only hold coroutines. Mongo access goes through motor,
+# and blocking work (model inference, bcrypt, OCR) runs on executors, so the
+# event loop never waits on the CPU.
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import wraps
+
+from bson.errors import InvalidId
+from bson.objectid import ObjectId
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import Response
+from starlette.routing import Route
+from werkzeug.http import http_date
+
+import app as flask_app
+from models.async_user_model import create_user, find_by_email, find_by_id, update_user
+from models.async_history_model import get_history_page, get_history_item
+from models.async_stats_model import get_stats
+from models.stats_model import STATS_DEFAULT_DAYS
+from models.async_job_model import create_job, find_job
+from utils import metrics
+from utils.jwt_helper import generate_token, verify_token
+from utils.admission import Overloaded
+from utils.ocr import OcrBusy
+from utils.password_hasher import PasswordHasherBusy, submit as submit_password_work
+import bcrypt
+
+# Inference calls block on the micro-batcher or the model; this pool bounds
+# how many run at once while the event loop keeps serving other clients.
+inference_executor = ThreadPoolExecutor(max_workers=int(os.getenv('INFERENCE_THREADS', 16)), thread_name_prefix='inference')
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return http_date(value)
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def json_response(body, status=200, headers=None):
+    return Response(json.dumps(body, default=_json_default), status_code=status,
+                    headers=headers, media_type='application/json')
+
+
+async def run_blocking(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(inference_executor, fn, *args)
+
+
+async def run_admitted(request, priority, fn, *args):
+    # Model work inside fn waits for admission on the executor thread
+    return await run_blocking(flask_app.run_admitted, priority, request.headers.get(flask_app.DEADLINE_HEADER),
+                              request.state.user, fn, *args)
+
+
+async def read_json(request):
+    try:
+        return await request.json()
+    except Exception:
+        return None
+
+
+def endpoint(name, auth=False):
+    def decorator(handler):
+        @wraps(handler)
+        async def wrapped(request):
+            start = time.perf_counter()
+            try:
+                response = await _authorize(request, handler) if auth else await handler(request)
+            except Overloaded as e:
+                response = json_response({'message': str(e)}, e.status, {'Retry-After': str(e.retry_after)})
+            flask_app.request_seconds.observe(time.perf_counter() - start, endpoint=name)
+            flask_app.requests_total.inc(endpoint=name, status=str(response.status_code))
+            return response
+        return wrapped
+    return decorator
+
+
+async def _authorize(request, handler):
+    auth = request.headers.get('Authorization', None)
+    if not auth:
+        return json_response({'message':'Token missing'}, 401)
+    parts = auth.split()
+    if parts[0].lower() != 'bearer' or len(parts) != 2:
+        return json_response({'message':'Invalid token format'}, 401)
+    with metrics.timed('auth'):
+        payload = verify_token(parts[1])
+    if not payload:
+        return json_response({'message':'Invalid or expired token'}, 401)
+    request.state.user = payload['sub']
+    return await handler(request)
+
+
+async def hash_password(password):
+    with metrics.timed('bcrypt'):
+        return await asyncio.wrap_future(submit_password_work(bcrypt.hashpw, password.encode('utf-8'), bcrypt.gensalt()))
+
+
+async def check_password(password, password_hash):
+    with metrics.timed('bcrypt'):
+        return await asyncio.wrap_future(submit_password_work(bcrypt.checkpw, password.encode('utf-8'), password_hash))
+
+
+def user_body(user, theme=False):
+    body = {'id': str(user['_id']), 'name': user['name'], 'email': user['email']}
+    if theme:
+        body['themePreference'] = user.get('themePreference', 'dark')
+    return body
+
+
+@endpoint('home')
+async def home(request):
+    return json_response({'message':'AI Fake News Detector API'})
+
+
+@endpoint('healthz')
+async def healthz(request):
+    return json_response({'status': 'ok'})
+
+
+@endpoint('readyz')
+async def readyz(request):
+    ready, body = flask_app.readiness()
+    return json_response(body, 200 if ready else 503)
+
+
+@endpoint('metrics')
+async def metrics_endpoint(request):
+    return Response(metrics.render_prometheus(), media_type='text/plain; version=0.0.4')
+
+
+@endpoint('signup')
+async def signup(request):
+    data = await read_json(request) or {}
+    name = data.get('name')
+    email = data.get('email')
+    password = data.get('password')
+    if not (name and email and password):
+        return json_response({'message':'Missing fields'}, 400)
+    if await find_by_email(email):
+        return json_response({'message':'Email already exists'}, 400)
+    try:
+        pw_hash = await hash_password(password)
+    except PasswordHasherBusy:
+        return json_response({'message':'Too many login attempts in progress, try again shortly'}, 503, {'Retry-After': '2'})
+    user = await create_user(name, email, pw_hash)
+    return json_response({'message':'User created', 'user': user_body(user)}, 201)
+
+
+@endpoint('login')
+async def login(request):
+    data = await read_json(request) or {}
+    email = data.get('email')
+    password = data.get('password')
+    if not (email and password):
+        return json_response({'message':'Missing fields'}, 400)
+    user = await find_by_email(email)
+    if not user:
+        return json_response({'message':'Invalid credentials'}, 401)
+    try:
+        if not await check_password(password, user['password']):
+            return json_response({'message':'Invalid credentials'}, 401)
+    except PasswordHasherBusy:
+        return json_response({'message':'Too many login attempts in progress, try again shortly'}, 503, {'Retry-After': '2'})
+    token = generate_token(user['_id'])
+    return json_response({'token': token, 'user': user_body(user)})
+
+
+@endpoint('analyze_text', auth=True)
+async def analyze_text(request):
+    body, status = await run_admitted(request, 'interactive', flask_app.analyze_text_request, request.state.user,
+                                      await read_json(request))
+    return json_response(body, status)
+
+
+@endpoint('analyze_batch', auth=True)
+async def analyze_batch(request):
+    body, status = await run_admitted(request, 'batch', flask_app.analyze_batch_request, request.state.user,
+                                      await read_json(request))
+    return json_response(body, status)
+
+
+@endpoint('similar', auth=True)
+async def similar(request):
+    body, status = await run_admitted(request, 'interactive', flask_app.similar_request, request.state.user,
+                                      await read_json(request))
+    return json_response(body, status)
+
+
+@endpoint('explain', auth=True)
+async def explain(request):
+    body, status = await run_admitted(request, 'interactive', flask_app.explain_request, request.state.user,
+                                      await read_json(request))
+    return json_response(body, status)
+
+
+@endpoint('analyze_image', auth=True)
+async def analyze_image(request):
+    form = await request.form()
+    upload = form.get('image')
+    if upload is None or not hasattr(upload, 'read'):
+        return json_response({'message':'No image uploaded'}, 400)
+    data = await upload.read()
+    try:
+        ocr_future = flask_app.ocr_pool.submit(data)
+    except OcrBusy:
+        return json_response({'message':'Image analysis is busy, try again shortly'}, 503, {'Retry-After': '5'})
+
+    if request.query_params.get('async') == '1' or form.get('async') == '1':
+        job_id = await create_job(request.state.user, 'analyzeImage')
+        flask_app.job_executor.submit(flask_app.run_image_job, job_id, request.state.user, ocr_future)
+        return json_response({'jobId': str(job_id), 'status': 'pending'}, 202)
+
+    try:
+        extracted = await asyncio.wait_for(asyncio.wrap_future(ocr_future), flask_app.OCR_TIMEOUT)
+    except Exception as e:
+        return json_response({'message': f'OCR failed: {str(e)}'}, 500)
+    body = await run_admitted(request, 'interactive', flask_app.analyze_extracted_text, request.state.user, extracted)
+    return json_response(body)
+
+
+def _admin(request):
+    return flask_app.admin_authorized(request.headers.get('X-Admin-Token'))
+
+
+@endpoint('list_models')
+async def list_models(request):
+    if not _admin(request):
+        return json_response({'message':'Admin token missing or invalid'}, 403)
+    return json_response(flask_app.models_status())
+
+
+@endpoint('activate_model')
+async def activate_model(request):
+    if not _admin(request):
+        return json_response({'message':'Admin token missing or invalid'}, 403)
+    body, status = flask_app.activate_model_request(await read_json(request))
+    return json_response(body, status)
+
+
+@endpoint('cache_stats', auth=True)
+async def cache_stats(request):
+    return json_response(await run_blocking(flask_app.cache_stats_body))
+
+
+@endpoint('history_writer_stats', auth=True)
+async def history_writer_stats(request):
+    return json_response(flask_app.history_writer_stats_body())
+
+
+@endpoint('get_job', auth=True)
+async def get_job(request):
+    job = await find_job(request.path_params['job_id'], request.state.user)
+    if not job:
+        return json_response({'message':'Job not found'}, 404)
+    body = {'jobId': str(job['_id']), 'status': job['status']}
+    if job['status'] == 'done':
+        body['result'] = job['result']
+    elif job['status'] == 'failed':
+        body['error'] = job['error']
+    return json_response(body)
+
+
+@endpoint('get_profile', auth=True)
+async def get_profile(request):
+    user = await find_by_id(request.state.user)
+    if not user:
+        return json_response({'message':'User not found'}, 404)
+    return json_response({'user': user_body(user, theme=True)})
+
+
+@endpoint('update_profile', auth=True)
+async def update_profile(request):
+    data = await read_json(request) or {}
+    update_data = {}
+    if 'name' in data:
+        update_data['name'] = data['name']
+    if 'email' in data:
+        update_data['email'] = data['email']
+    user = await update_user(request.state.user, update_data)
+    return json_response({'user': user_body(user, theme=True)})
+
+
+def history_body(h, full=True):
+    return {'id': str(h['_id']), 'text': h['inputText'] if full else h.get('textPreview'), 'prediction': h['prediction'],
+            'confidence': h['confidence'], 'timestamp': h['createdAt'], 'image_url': h.get('imageUrl'),
+            'modelVersion': h.get('modelVersion')}
+
+
+@endpoint('get_history', auth=True)
+async def get_history(request):
+    full = request.query_params.get('fields') == 'full'
+    try:
+        limit = int(request.query_params.get('limit', flask_app.HISTORY_PAGE_SIZE))
+        items, next_cursor = await get_history_page(request.state.user, limit, request.query_params.get('cursor'), full=full)
+    except (ValueError, InvalidId):
+        return json_response({'message':'Invalid limit or cursor'}, 400)
+    return json_response({'history': [history_body(h, full) for h in items], 'nextCursor': next_cursor})
+
+
+@endpoint('stats', auth=True)
+async def stats(request):
+    try:
+        days = int(request.query_params.get('days', STATS_DEFAULT_DAYS))
+    except ValueError:
+        return json_response({'message':'Invalid days'}, 400)
+    return json_response(await get_stats(request.state.user, days))
+
+
+@endpoint('get_history_entry', auth=True)
+async def get_history_entry(request):
+    try:
+        h = await get_history_item(request.state.user, request.path_params['history_id'])
+    except InvalidId:
+        h = None
+    if not h:
+        return json_response({'message':'History item not found'}, 404)
+    return json_response(history_body(h))
+
+
+@endpoint('update_settings', auth=True)
+async def update_settings(request):
+    data = await read_json(request) or {}
+    if 'theme' in data:
+        await update_user(request.state.user, {'themePreference': data['theme']})
+    return json_response({'message':'Settings updated'})
+
+
+async def on_shutdown():
+    await asyncio.get_running_loop().run_in_executor(None, flask_app.shutdown)
+
+
+routes = [
+    Route('/', home),
+    Route('/healthz', healthz),
+    Route('/readyz', readyz),
+    Route('/metrics', metrics_endpoint),
+    Route('/signup', signup, methods=['POST']),
+    Route('/login', login, methods=['POST']),
+    Route('/analyzeText', analyze_text, methods=['POST']),
+    Route('/analyzeBatch', analyze_batch, methods=['POST']),
+    Route('/analyzeImage', analyze_image, methods=['POST']),
+    Route('/similar', similar, methods=['POST']),
+    Route('/explain', explain, methods=['POST']),
+    Route('/jobs/{job_id}', get_job),
+    Route('/cache/stats', cache_stats),
+    Route('/admin/models', list_models),
+    Route('/admin/models/activate', activate_model, methods=['POST']),
+    Route('/profile', get_profile, methods=['GET']),
+    Route('/profile', update_profile, methods=['PUT']),
+    Route('/stats', stats),
+    Route('/history', get_history),
+    Route('/history/writer/stats', history_writer_stats),
+    Route('/history/{history_id}', get_history_entry),
+    Route('/settings', update_settings, methods=['PUT']),
+]
+
+app = Starlette(
+    routes=routes,
+    middleware=[Middleware(CORSMiddleware, allow_origins=['http://localhost:5173', 'http://localhost:5174'],
+                           allow_methods=['*'], allow_headers=['*'])],
+    on_shutdown=[on_shutdown],
+)
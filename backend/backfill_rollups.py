@@ -0,0 +1,48 @@
+# Rebuild the per-user /stats rollups from the history collection. History is
+# streamed in batches into a scratch collection, which then replaces
+# history_rollups in one rename. Stop the API first: analyses stored while the
+# rebuild runs would be missing from the result.
+#
+# Usage (from backend/):
+#   python backfill_rollups.py
+#   python backfill_rollups.py --batch_size 20000
+import argparse
+import time
+
+from utils.db import db, history, history_rollups
+from models.stats_model import apply_rollups
+
+ROLLUP_FIELDS = {'userId': 1, 'prediction': 1, 'confidence': 1, 'imageUrl': 1, 'createdAt': 1}
+
+
+def main():
+    p = argparse.ArgumentParser(description='Rebuild /stats rollups from history')
+    p.add_argument('--batch_size', type=int, default=5000)
+    args = p.parse_args()
+
+    scratch = db.get_collection(f'{history_rollups.name}_rebuild')
+    scratch.drop()
+    scratch.create_index([('userId', 1), ('day', 1)])
+
+    done, start, batch = 0, time.time(), []
+    for doc in history.find({}, ROLLUP_FIELDS).sort('_id', 1).batch_size(args.batch_size):
+        batch.append(doc)
+        if len(batch) == args.batch_size:
+            apply_rollups(batch, scratch)
+            done += len(batch)
+            batch = []
+            print(f'rolled up {done} history items ({done / (time.time() - start):.0f}/s)', flush=True)
+    if batch:
+        apply_rollups(batch, scratch)
+        done += len(batch)
+
+    if done:
+        scratch.rename(history_rollups.name, dropTarget=True)
+    else:
+        scratch.drop()
+        history_rollups.delete_many({})
+    print(f'Rebuilt rollups from {done} history items in {time.time() - start:.1f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+# Latency above saturation with and without admission control.
+# Measures the capacity of one gunicorn worker with closed-loop clients, then
+# offers open-loop (Poisson) /analyzeText traffic at multiples of it, once with
+# ADMISSION_ENABLED=0 and once with it on. Without admission every request is
+# accepted and p99 grows for as long as the overload lasts; with it, excess
+# requests get 503/429 + Retry-After and the served ones stay within deadline.
+# Needs MongoDB running.
+# Usage (from backend/): python benchmarks/bench_admission.py --load 0.8,1.5,3 --duration 30
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, BACKEND_DIR)
+
+import numpy as np
+from bson.objectid import ObjectId
+from utils.jwt_helper import generate_token
+from load_test import TEXTS, drive, wait_ready
+
+
+def send(url, body, token, deadline_ms, timeout):
+    headers = {'Content-Type': 'application/json', 'Authorization': f'Bearer {token}'}
+    if deadline_ms:
+        headers['X-Request-Deadline-Ms'] = str(deadline_ms)
+    req = urllib.request.Request(url, data=json.dumps(body).encode('utf-8'), method='POST', headers=headers)
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as res:
+            status = res.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except Exception:
+        status = 'timeout'
+    return status, time.perf_counter() - start
+
+
+def open_loop(base_url, tokens, rate, duration, deadline_ms, timeout):
+    # Arrivals do not wait for earlier responses, like real users
+    results = []
+    lock = threading.Lock()
+
+    def one(n):
+        r = send(f'{base_url}/analyzeText', {'text': f'{TEXTS[n % len(TEXTS)]} #{n}'}, tokens[n % len(tokens)],
+                 deadline_ms, timeout)
+        with lock:
+            results.append(r)
+
+    rng = random.Random(0)
+    with ThreadPoolExecutor(max_workers=1024) as pool:
+        start = time.perf_counter()
+        next_at, n = start, 0
+        while next_at - start < duration:
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(one, n)
+            n += 1
+            next_at += rng.expovariate(rate)
+    ok = np.array([lat for status, lat in results if status == 200] or [0]) * 1000.0
+    count = lambda pred: sum(1 for status, _ in results if pred(status))
+    return {
+        'sent': len(results), 'goodput': count(lambda s: s == 200) / duration,
+        'p50_ms': float(np.percentile(ok, 50)), 'p99_ms': float(np.percentile(ok, 99)),
+        'shed': count(lambda s: s in (429, 503)), 'timeouts': count(lambda s: s == 'timeout'),
+        'errors': count(lambda s: s not in (200, 429, 503, 'timeout')),
+    }
+
+
+def start_server(port, threads, admission):
+    env = dict(os.environ, WEB_WORKERS='1', WEB_THREADS=str(threads), BIND=f'127.0.0.1:{port}',
+               PREDICTION_CACHE_ENABLED='0', NEAR_DUP_ENABLED='0', ADMISSION_ENABLED='1' if admission else '0')
+    return subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+                            cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def main():
+    p = argparse.ArgumentParser(description='Admission control load test')
+    p.add_argument('--load', default='0.8,1.5,3', help='Offered load as multiples of measured capacity')
+    p.add_argument('--duration', type=float, default=30)
+    p.add_argument('--deadline_ms', type=int, default=2000, help='Sent as X-Request-Deadline-Ms; 0 to omit')
+    p.add_argument('--users', type=int, default=200)
+    p.add_argument('--threads', type=int, default=128, help='WEB_THREADS, so requests queue in the app')
+    p.add_argument('--client_timeout', type=float, default=60)
+    p.add_argument('--port', type=int, default=5056)
+    args = p.parse_args()
+
+    base_url = f'http://127.0.0.1:{args.port}'
+    tokens = [generate_token(ObjectId()) for _ in range(args.users)]
+    capacity = None
+    for admission in (False, True):
+        server = start_server(args.port, args.threads, admission)
+        try:
+            if not wait_ready(base_url, 1):
+                print('Server did not become ready')
+                return
+            if capacity is None:
+                capacity = drive(base_url, tokens[0], 16, 10)['rps']
+                print(f'Capacity: {capacity:.1f} req/s (closed loop, 16 clients)')
+            print(f"Admission {'on' if admission else 'off'}:")
+            for load in [float(x) for x in args.load.split(',')]:
+                r = open_loop(base_url, tokens, load * capacity, args.duration, args.deadline_ms, args.client_timeout)
+                print(f"  {load:.1f}x ({load * capacity:.0f} req/s offered): goodput {r['goodput']:.1f} req/s  "
+                      f"p50 {r['p50_ms']:.0f} ms  p99 {r['p99_ms']:.0f} ms  shed {r['shed']}/{r['sent']}  "
+                      f"timeouts {r['timeouts']}  errors {r['errors']}")
+                time.sleep(2)
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
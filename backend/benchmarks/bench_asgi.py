@@ -0,0 +1,147 @@
+# Compare the Flask entry point (python app.py) with the ASGI app under uvicorn
+# while many idle/slow clients hold connections open. Needs MongoDB running.
+# Usage (from backend/): python benchmarks/bench_asgi.py --idle 2000 --active 32 --duration 20
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, BACKEND_DIR)
+
+import numpy as np
+from bson.objectid import ObjectId
+from utils.jwt_helper import generate_token
+
+SERVERS = {
+    'flask': lambda port: [sys.executable, 'app.py'],
+    'asgi': lambda port: [sys.executable, '-m', 'uvicorn', 'asgi_app:app', '--host', '127.0.0.1', '--port', str(port),
+                          '--log-level', 'warning'],
+}
+
+TEXTS = [
+    'NASA discovers new planet with potential for life.',
+    'BREAKING: Aliens invade Earth, martial law declared!',
+    'World leaders have reached a historic agreement to reduce carbon emissions by 50% by 2030.',
+]
+
+
+async def request(port, method, path, body=None, token=None, timeout=60):
+    reader, writer = await asyncio.wait_for(asyncio.open_connection('127.0.0.1', port), timeout)
+    try:
+        payload = json.dumps(body).encode('utf-8') if body is not None else b''
+        headers = [f'{method} {path} HTTP/1.1', f'Host: 127.0.0.1:{port}', 'Connection: close',
+                   f'Content-Length: {len(payload)}', 'Content-Type: application/json']
+        if token:
+            headers.append(f'Authorization: Bearer {token}')
+        writer.write(('\r\n'.join(headers) + '\r\n\r\n').encode('ascii') + payload)
+        await writer.drain()
+        status_line = await asyncio.wait_for(reader.readline(), timeout)
+        await asyncio.wait_for(reader.read(), timeout)
+        return int(status_line.split()[1])
+    finally:
+        writer.close()
+
+
+async def idle_client(port, stop):
+    # Slow client: sends a partial request line and trickles a header now and then
+    try:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    except OSError:
+        return False
+    try:
+        writer.write(b'GET /healthz HTTP/1.1\r\nHost: localhost\r\n')
+        await writer.drain()
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), 5)
+            except asyncio.TimeoutError:
+                writer.write(b'X-Slow: 1\r\n')
+                await writer.drain()
+        return True
+    except (OSError, ConnectionError):
+        return False
+    finally:
+        writer.close()
+
+
+async def scenario(port, token, idle, active, duration):
+    stop = asyncio.Event()
+    idle_tasks = [asyncio.create_task(idle_client(port, stop)) for _ in range(idle)]
+    await asyncio.sleep(2)
+
+    latencies = []
+    errors = [0]
+    deadline = time.time() + duration
+
+    async def active_client(i):
+        n = 0
+        while time.time() < deadline:
+            start = time.perf_counter()
+            try:
+                status = await request(port, 'POST', '/analyzeText', {'text': f'{TEXTS[n % len(TEXTS)]} #{i}-{n}'}, token)
+                if status == 200:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors[0] += 1
+            except Exception:
+                errors[0] += 1
+            n += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[active_client(i) for i in range(active)])
+    elapsed = time.perf_counter() - start
+    stop.set()
+    held = sum(1 for ok in await asyncio.gather(*idle_tasks) if ok)
+    lat = np.array(latencies or [0]) * 1000.0
+    return {'rps': len(latencies) / elapsed, 'p50_ms': float(np.percentile(lat, 50)),
+            'p99_ms': float(np.percentile(lat, 99)), 'errors': errors[0], 'idle_held': held}
+
+
+async def wait_up(port, timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if await request(port, 'GET', '/healthz', timeout=5) == 200:
+                return True
+        except Exception:
+            pass
+        await asyncio.sleep(0.5)
+    return False
+
+
+def main():
+    p = argparse.ArgumentParser(description='Flask vs ASGI under many idle connections')
+    p.add_argument('--idle', type=int, default=2000)
+    p.add_argument('--active', type=int, default=32)
+    p.add_argument('--duration', type=float, default=20)
+    p.add_argument('--port', type=int, default=5066)
+    p.add_argument('--servers', default='flask,asgi')
+    args = p.parse_args()
+
+    token = generate_token(ObjectId())
+    for name in args.servers.split(','):
+        # All clients share one token; admission's per-user cap would answer most of them with 429
+        env = dict(os.environ, PORT=str(args.port), MODEL_LOAD_MODE='eager', PREDICTION_CACHE_ENABLED='0',
+                   ADMISSION_ENABLED='0')
+        server = subprocess.Popen(SERVERS[name](args.port), cwd=BACKEND_DIR, env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            if not asyncio.run(wait_up(args.port)):
+                print(f'{name}: server did not start')
+                continue
+            # Let the eager warm-up finish before measuring
+            asyncio.run(request(args.port, 'POST', '/analyzeText', {'text': TEXTS[0]}, token, timeout=300))
+            r = asyncio.run(scenario(args.port, token, args.idle, args.active, args.duration))
+            print(f"{name:>6}: {r['rps']:.1f} req/s  p50 {r['p50_ms']:.1f} ms  p99 {r['p99_ms']:.1f} ms  "
+                  f"errors {r['errors']}  idle connections held {r['idle_held']}/{args.idle}")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+# Parity, latency and memory of each inference backend on a sample of Real.csv.
+# Every backend runs in its own process so resident memory is measured in isolation.
+# Usage (from backend/): python benchmarks/bench_backends.py --sample 100
+import argparse
+import csv
+import json
+import os
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, BACKEND_DIR)
+
+DEFAULT_CSV = os.path.join(BACKEND_DIR, '..', 'Real.csv')
+
+
+def load_texts(path, sample):
+    texts = []
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            text = (row.get('text') or '').strip()
+            if text:
+                texts.append(text)
+            if len(texts) >= sample:
+                break
+    return texts
+
+
+def rss_mb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024.0
+    return None
+
+
+def worker(backend, csv_path, sample, batch_size):
+    os.environ['INFERENCE_BACKEND'] = backend
+    os.environ['BATCH_ENABLED'] = '0'
+    os.environ['PREDICTION_CACHE_ENABLED'] = '0'
+    import numpy as np
+    from app import get_model_and_tokenizer, predict_probs
+
+    texts = load_texts(csv_path, sample)
+    before = rss_mb()
+    start = time.perf_counter()
+    get_model_and_tokenizer()
+    load_s = time.perf_counter() - start
+    predict_probs(texts[:2])  # warm up
+
+    single = []
+    probs = []
+    for text in texts:
+        t0 = time.perf_counter()
+        probs.append(predict_probs([text])[0])
+        single.append((time.perf_counter() - t0) * 1000.0)
+
+    t0 = time.perf_counter()
+    for i in range(0, len(texts), batch_size):
+        predict_probs(texts[i:i + batch_size])
+    batched_s = time.perf_counter() - t0
+
+    print(json.dumps({
+        'backend': backend,
+        'load_s': load_s,
+        'rss_mb': rss_mb(),
+        'model_rss_mb': rss_mb() - before,
+        'p50_ms': float(np.percentile(single, 50)),
+        'p99_ms': float(np.percentile(single, 99)),
+        'batched_texts_per_s': len(texts) / batched_s,
+        'probs': probs,
+    }))
+
+
+def main():
+    p = argparse.ArgumentParser(description='Inference backend parity and latency benchmark')
+    p.add_argument('--csv', default=DEFAULT_CSV)
+    p.add_argument('--sample', type=int, default=100)
+    p.add_argument('--batch_size', type=int, default=16)
+    p.add_argument('--backends', default='pytorch,int8,onnx')
+    p.add_argument('--worker', default=None, help=argparse.SUPPRESS)
+    args = p.parse_args()
+
+    if args.worker:
+        worker(args.worker, args.csv, args.sample, args.batch_size)
+        return
+
+    import numpy as np
+    results = {}
+    for backend in args.backends.split(','):
+        cmd = [sys.executable, os.path.abspath(__file__), '--worker', backend, '--csv', args.csv,
+               '--sample', str(args.sample), '--batch_size', str(args.batch_size)]
+        out = subprocess.run(cmd, cwd=BACKEND_DIR, capture_output=True, text=True)
+        if out.returncode != 0:
+            print(f'{backend}: failed\n{out.stderr.strip()[-2000:]}')
+            continue
+        results[backend] = json.loads(out.stdout.strip().splitlines()[-1])
+
+    reference = results.get('pytorch')
+    for backend, r in results.items():
+        line = (f"{backend:>8}: load {r['load_s']:.2f}s  rss {r['rss_mb']:.0f} MB (model +{r['model_rss_mb']:.0f} MB)  "
+                f"p50 {r['p50_ms']:.1f} ms  p99 {r['p99_ms']:.1f} ms  batched {r['batched_texts_per_s']:.1f} texts/s")
+        if reference is not None and backend != 'pytorch':
+            ref = np.array(reference['probs'])
+            got = np.array(r['probs'])
+            agreement = float((ref.argmax(axis=1) == got.argmax(axis=1)).mean())
+            max_diff = float(np.abs(ref - got).max())
+            line += f'  argmax agreement {agreement * 100:.1f}%  max |dp| {max_diff:.4f}'
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+# Compare throughput and latency of /analyzeText inference with and without micro-batching.
+# Usage (from backend/): python benchmarks/bench_batching.py --clients 16 --requests 400
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import numpy as np
+from app import predict_probs, get_model_and_tokenizer
+from utils.batcher import MicroBatcher
+
+SAMPLE_TEXTS = [
+    'NASA discovers new planet with potential for life.',
+    'BREAKING: Aliens invade Earth, martial law declared!',
+    'World leaders at the United Nations Climate Change Conference have reached a historic agreement to reduce carbon emissions.',
+    'Scientists confirm that drinking coffee makes you immortal, according to an anonymous source.',
+]
+
+
+def run(predict, clients, total):
+    latencies = []
+    lock = threading.Lock()
+    per_client = total // clients
+
+    def worker(i):
+        local = []
+        for j in range(per_client):
+            text = SAMPLE_TEXTS[(i + j) % len(SAMPLE_TEXTS)]
+            start = time.perf_counter()
+            predict(text)
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    lat = np.array(latencies) * 1000.0
+    return {
+        'requests': len(latencies),
+        'rps': len(latencies) / elapsed,
+        'p50_ms': float(np.percentile(lat, 50)),
+        'p99_ms': float(np.percentile(lat, 99)),
+    }
+
+
+def main():
+    p = argparse.ArgumentParser(description='Micro-batching benchmark')
+    p.add_argument('--clients', type=int, default=16)
+    p.add_argument('--requests', type=int, default=320)
+    p.add_argument('--max_batch_size', type=int, default=16)
+    p.add_argument('--max_wait_ms', type=float, default=5)
+    args = p.parse_args()
+
+    get_model_and_tokenizer()
+    predict_probs(SAMPLE_TEXTS)  # warm up
+
+    batcher = MicroBatcher(predict_probs, args.max_batch_size, args.max_wait_ms)
+    results = {
+        'unbatched': run(lambda t: predict_probs([t])[0], args.clients, args.requests),
+        'batched': run(batcher.predict, args.clients, args.requests),
+    }
+    for name, r in results.items():
+        print(f"{name:>10}: {r['requests']} req  {r['rps']:.1f} req/s  p50 {r['p50_ms']:.1f} ms  p99 {r['p99_ms']:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
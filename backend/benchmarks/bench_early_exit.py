@@ -0,0 +1,92 @@
+# Average layers used, latency and accuracy of early-exit inference per
+# confidence threshold, against the full model, on a held-out split.
+# Without --validation_file the split is the one bert_finetune.py holds out
+# (10% of --train_file, same --seed), so the heads never saw these texts.
+# Usage (from backend/):
+#   python benchmarks/bench_early_exit.py --train_file ../data.csv --thresholds 0.9,0.95,0.99
+#   python benchmarks/bench_early_exit.py --validation_file ../heldout.csv --label_value 1
+import argparse
+import os
+import sys
+import time
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, BACKEND_DIR)
+
+DEFAULT_MODEL_DIR = os.getenv('MODEL_DIR') or os.path.join(BACKEND_DIR, '..', 'fine_tuned_bert')
+
+
+def held_out(args):
+    from datasets import load_dataset
+    path = args.validation_file or args.train_file
+    dataset = load_dataset('csv', data_files={'train': path})['train']
+    if not args.validation_file:
+        dataset = dataset.train_test_split(test_size=0.1, seed=args.seed)['test']
+    text_col = next(c for c in (args.text_col, 'text', 'sentence', 'content', 'article', 'body') if c in dataset.column_names)
+    label_col = next((c for c in (args.label_col, 'label', 'labels', 'target', 'y') if c in dataset.column_names), None)
+    if label_col is None and args.label_value is None:
+        raise SystemExit(f'No label column in {dataset.column_names}; pass --label_col or --label_value')
+    rows = dataset.select(range(min(args.sample, len(dataset))))
+    texts = [t or '' for t in rows[text_col]]
+    labels = rows[label_col] if label_col else [args.label_value] * len(texts)
+    return texts, [int(l) for l in labels]
+
+
+def run(model, tokenizer, texts, max_length):
+    import torch
+    preds, layers, latencies = [], [], []
+    with torch.no_grad():
+        for text in texts:
+            inputs = tokenizer([text], truncation=True, max_length=max_length, return_tensors='pt')
+            start = time.perf_counter()
+            out = model(**inputs)
+            latencies.append((time.perf_counter() - start) * 1000.0)
+            preds.append(int(out.logits.argmax(dim=-1)[0]))
+            layers.append(getattr(out, 'exit_layers', [model.config.num_hidden_layers])[0])
+    return preds, layers, latencies
+
+
+def main():
+    p = argparse.ArgumentParser(description='Early-exit accuracy/latency benchmark')
+    p.add_argument('--model_dir', default=DEFAULT_MODEL_DIR)
+    p.add_argument('--train_file', default=os.path.join(BACKEND_DIR, '..', 'Real.csv'))
+    p.add_argument('--validation_file', default=None)
+    p.add_argument('--text_col', default=None)
+    p.add_argument('--label_col', default=None)
+    p.add_argument('--label_value', type=int, default=None)
+    p.add_argument('--seed', type=int, default=42)
+    p.add_argument('--sample', type=int, default=500)
+    p.add_argument('--max_length', type=int, default=512)
+    p.add_argument('--thresholds', default='0.8,0.9,0.95,0.99')
+    args = p.parse_args()
+
+    import numpy as np
+    import torch
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+    from utils.early_exit import EarlyExitClassifier, load_exit_heads
+
+    heads = load_exit_heads(args.model_dir)
+    if heads is None:
+        raise SystemExit(f'No exit heads in {args.model_dir}; train them with bert_finetune.py --early_exit')
+    tokenizer = AutoTokenizer.from_pretrained(args.model_dir)
+    model = AutoModelForSequenceClassification.from_pretrained(args.model_dir).eval()
+    texts, labels = held_out(args)
+    labels = np.array(labels)
+    print(f'{len(texts)} held-out texts, heads after layers {sorted(heads)}, torch threads {torch.get_num_threads()}')
+
+    run(model, tokenizer, texts[:5], args.max_length)  # warm up
+    full_preds, _, full_ms = run(model, tokenizer, texts, args.max_length)
+    full_preds = np.array(full_preds)
+    print(f"{'threshold':>9} {'accuracy':>9} {'agree':>7} {'avg layers':>10} {'p50 ms':>7} {'p99 ms':>7} {'mean ms':>8}")
+    print(f"{'full':>9} {(full_preds == labels).mean():>9.4f} {1.0:>7.1%} {model.config.num_hidden_layers:>10.2f} "
+          f"{np.percentile(full_ms, 50):>7.1f} {np.percentile(full_ms, 99):>7.1f} {np.mean(full_ms):>8.1f}")
+    for threshold in [float(t) for t in args.thresholds.split(',') if t]:
+        preds, layers, ms = run(EarlyExitClassifier(model, heads, threshold), tokenizer, texts, args.max_length)
+        preds = np.array(preds)
+        print(f'{threshold:>9.2f} {(preds == labels).mean():>9.4f} {(preds == full_preds).mean():>7.1%} '
+              f'{np.mean(layers):>10.2f} {np.percentile(ms, 50):>7.1f} {np.percentile(ms, 99):>7.1f} '
+              f'{np.mean(ms):>8.1f}  ({np.mean(ms) / np.mean(full_ms):.0%} of full)')
+
+
+if __name__ == '__main__':
+    main()
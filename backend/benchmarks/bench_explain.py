@@ -0,0 +1,69 @@
+# Latency of /explain's occlusion attribution for articles of different
+# lengths: every masked copy batched (as served) versus one forward pass per
+# copy. Both make the same perturbations and produce the same scores.
+# Usage (from backend/): python benchmarks/bench_explain.py --tokens 64,128,256,512 --max_passes 4
+import argparse
+import csv
+import os
+import sys
+import time
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, BACKEND_DIR)
+
+os.environ.setdefault('BATCH_ENABLED', '0')
+os.environ.setdefault('PREDICTION_CACHE_ENABLED', '0')
+
+DEFAULT_CSV = os.path.join(BACKEND_DIR, '..', 'Real.csv')
+
+
+def article(path, tokenizer, n_tokens):
+    # Real articles joined until the text fills n_tokens
+    words = []
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            words.extend((row.get('text') or '').split())
+            text = ' '.join(words)
+            if len(tokenizer(text)['input_ids']) >= n_tokens:
+                break
+    ids = tokenizer(text, truncation=True, max_length=n_tokens)['input_ids']
+    return tokenizer.decode(ids, skip_special_tokens=True)
+
+
+def timed_ms(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append((time.perf_counter() - start) * 1000.0)
+    return sorted(times)[len(times) // 2], result
+
+
+def main():
+    p = argparse.ArgumentParser(description='Explanation latency benchmark')
+    p.add_argument('--csv', default=DEFAULT_CSV)
+    p.add_argument('--tokens', default='64,128,256,512')
+    p.add_argument('--max_passes', type=int, default=4)
+    p.add_argument('--batch_size', type=int, default=32)
+    p.add_argument('--repeat', type=int, default=3)
+    args = p.parse_args()
+
+    from app import get_model_and_tokenizer
+    from utils.explain import explain_text
+
+    tokenizer, model = get_model_and_tokenizer()
+    max_inputs = args.max_passes * args.batch_size - 1
+    explain_text(model, tokenizer, 'warm up the model', max_inputs, args.batch_size)
+    print(f'Up to {max_inputs} masked copies per article, batches of {args.batch_size}')
+    print(f"{'tokens':>6} {'words':>6} {'span':>5} {'inputs':>6} {'passes':>6} {'batched ms':>11} {'unbatched ms':>13} {'speedup':>8}")
+    for n_tokens in [int(n) for n in args.tokens.split(',')]:
+        text = article(args.csv, tokenizer, n_tokens)
+        batched_ms, r = timed_ms(lambda: explain_text(model, tokenizer, text, max_inputs, args.batch_size), args.repeat)
+        single_ms, r1 = timed_ms(lambda: explain_text(model, tokenizer, text, max_inputs, 1), args.repeat)
+        drift = max((abs(a['score'] - b['score']) for a, b in zip(r['tokens'], r1['tokens'])), default=0.0)
+        print(f"{n_tokens:>6} {len(r['tokens']):>6} {r['spanWords']:>5} {r['inputs']:>6} {r['passes']:>6} "
+              f"{batched_ms:>11.0f} {single_ms:>13.0f} {single_ms / batched_ms:>7.1f}x  (max score diff {drift:.1e})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+# Compare the old full-history query with keyset pagination for a heavy user.
+# Inserts --rows synthetic history rows for a throwaway user id, then removes them.
+# Point MONGO_URI at a scratch database before running.
+# Usage (from backend/): python benchmarks/bench_history.py --rows 100000
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import bson
+from bson.objectid import ObjectId
+from utils.db import history, ensure_indexes
+from models.history_model import get_history_for_user, get_history_page
+
+ARTICLE = ('Scientists at NASA have announced the discovery of a new exoplanet in the habitable zone '
+           'of a nearby star. ') * 20
+
+
+def timed(fn, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000.0, result
+
+
+def payload_kb(items):
+    return sum(len(bson.encode(item)) for item in items) / 1024.0
+
+
+def main():
+    p = argparse.ArgumentParser(description='History query benchmark')
+    p.add_argument('--rows', type=int, default=100000)
+    p.add_argument('--page_size', type=int, default=20)
+    p.add_argument('--pages', type=int, default=50, help='pages to walk for the deep-pagination timing')
+    p.add_argument('--repeat', type=int, default=3)
+    args = p.parse_args()
+
+    ensure_indexes()
+    user_id = ObjectId()
+    start_time = datetime.utcnow()
+    print(f'Inserting {args.rows} rows for user {user_id}...')
+    for offset in range(0, args.rows, 5000):
+        docs = [{
+            'userId': user_id,
+            'inputText': ARTICLE,
+            'prediction': 'Real' if i % 2 else 'Fake',
+            'confidence': 90.0,
+            'imageUrl': None,
+            'createdAt': start_time - timedelta(seconds=i),
+        } for i in range(offset, min(offset + 5000, args.rows))]
+        history.insert_many(docs, ordered=False)
+
+    try:
+        ms, items = timed(lambda: get_history_for_user(str(user_id)), args.repeat)
+        print(f'full history      : {ms:9.1f} ms  {len(items)} rows  {payload_kb(items):10.0f} KB')
+
+        ms, (items, cursor) = timed(lambda: get_history_page(str(user_id), args.page_size), args.repeat)
+        print(f'first page        : {ms:9.1f} ms  {len(items)} rows  {payload_kb(items):10.1f} KB')
+
+        def walk():
+            cursor = None
+            for _ in range(args.pages):
+                _, cursor = get_history_page(str(user_id), args.page_size, cursor)
+            return cursor
+        ms, _ = timed(walk, args.repeat)
+        print(f'{args.pages} pages walked  : {ms:9.1f} ms  ({ms / args.pages:.2f} ms/page)')
+
+        plan = history.find({'userId': user_id}).sort([('createdAt', -1), ('_id', -1)]).limit(args.page_size).explain()
+        stage = plan.get('queryPlanner', {}).get('winningPlan', {})
+        print('page query plan   :', stage.get('stage'), stage.get('inputStage', {}).get('stage'))
+    finally:
+        history.delete_many({'userId': user_id})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+# Lookup latency and recall of the MinHash LSH near-duplicate index as it grows.
+# Probes are lightly edited copies of indexed articles (should match) and fresh
+# articles (should not). Filler entries use random signatures unless --real_fill
+# is given, which hashes generated articles instead (slower to build).
+# Usage (from backend/): python benchmarks/bench_near_duplicates.py --sizes 10000,100000,1000000
+import argparse
+import os
+import random
+import sys
+import time
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, BACKEND_DIR)
+
+import numpy as np
+from utils.near_duplicates import NearDuplicateIndex
+
+
+def rss_mb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024.0
+    return None
+
+
+def make_article(rng, vocab, words):
+    return ' '.join(rng.choice(vocab) for _ in range(words))
+
+
+def edit(rng, vocab, text, rate):
+    # Replace, drop or insert a fraction of the words, like a syndicated rewrite
+    out = []
+    for word in text.split():
+        r = rng.random()
+        if r < rate / 3:
+            out.append(rng.choice(vocab))
+        elif r < 2 * rate / 3:
+            continue
+        elif r < rate:
+            out.extend([word, rng.choice(vocab)])
+        else:
+            out.append(word)
+    return ' '.join(out)
+
+
+def main():
+    p = argparse.ArgumentParser(description='Near-duplicate index benchmark')
+    p.add_argument('--sizes', default='10000,100000,1000000')
+    p.add_argument('--queries', type=int, default=500)
+    p.add_argument('--threshold', type=float, default=0.8)
+    p.add_argument('--num_perm', type=int, default=128)
+    p.add_argument('--words', type=int, default=300, help='Words per generated article')
+    p.add_argument('--edit_rate', type=float, default=0.03)
+    p.add_argument('--real_fill', action='store_true')
+    args = p.parse_args()
+
+    rng = random.Random(0)
+    np_rng = np.random.RandomState(0)
+    vocab = [f'w{i}' for i in range(20000)]
+    sizes = [int(n) for n in args.sizes.split(',')]
+    index = NearDuplicateIndex(lambda: 'bench', threshold=args.threshold, num_perm=args.num_perm, max_entries=max(sizes) + args.queries)
+    print(f'threshold {args.threshold}  num_perm {args.num_perm}  bands {index.bands} x rows {index.rows}')
+
+    originals = [make_article(rng, vocab, args.words) for _ in range(args.queries)]
+    for i, text in enumerate(originals):
+        index.add(f'orig-{i}', index.signature(text), [0.5, 0.5])
+    duplicates = [edit(rng, vocab, text, args.edit_rate) for text in originals]
+    fresh = [make_article(rng, vocab, args.words) for _ in range(args.queries)]
+
+    filled = 0
+    for size in sizes:
+        start = time.perf_counter()
+        while filled < size:
+            if args.real_fill:
+                signature = index.signature(make_article(rng, vocab, args.words))
+            else:
+                signature = np_rng.randint(0, 1 << 32, size=args.num_perm, dtype=np.uint64).astype(np.uint32)
+            index.add(f'fill-{filled}', signature, [0.5, 0.5])
+            filled += 1
+        build_s = time.perf_counter() - start
+
+        sign_ms, query_ms, found, false_matches = [], [], 0, 0
+        for i, text in enumerate(duplicates + fresh):
+            t0 = time.perf_counter()
+            signature = index.signature(text)
+            t1 = time.perf_counter()
+            match = index.query(signature)
+            t2 = time.perf_counter()
+            sign_ms.append((t1 - t0) * 1000.0)
+            query_ms.append((t2 - t1) * 1000.0)
+            if i < len(duplicates):
+                found += match is not None and match[0] == f'orig-{i}'
+            else:
+                false_matches += match is not None
+
+        print(f'{len(index):>9} entries: build +{build_s:.1f}s  rss {rss_mb():.0f} MB  '
+              f'signature p50 {np.percentile(sign_ms, 50):.3f} ms  '
+              f'query p50 {np.percentile(query_ms, 50):.3f} ms  p99 {np.percentile(query_ms, 99):.3f} ms  '
+              f'recall {found / len(duplicates) * 100:.1f}%  false matches {false_matches}/{len(fresh)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+# Import time and cold start (import + model load + first prediction) of app.py,
+# loading the model with from_pretrained vs the serving artifact. Each run is a
+# fresh process so nothing is warm in the interpreter.
+# Usage (from backend/): python export_artifact.py && python benchmarks/bench_startup.py --runs 5
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, BACKEND_DIR)
+
+MODES = {
+    'from_pretrained': {'SERVING_ARTIFACT': '0'},
+    'artifact': {'SERVING_ARTIFACT': '1'},
+}
+
+
+def worker():
+    start = time.perf_counter()
+    import app
+    import_s = time.perf_counter() - start
+    heavy = sorted(m for m in ('torch', 'transformers', 'numpy') if m in sys.modules)
+
+    t0 = time.perf_counter()
+    app.get_model_and_tokenizer()
+    load_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    app.predict_probs(['NASA discovers new planet with potential for life.'])
+    first_s = time.perf_counter() - t0
+    print(json.dumps({'import_s': import_s, 'load_s': load_s, 'first_predict_s': first_s,
+                      'total_s': time.perf_counter() - start, 'heavy_at_import': heavy}))
+
+
+def main():
+    p = argparse.ArgumentParser(description='Import-time and cold-start benchmark')
+    p.add_argument('--runs', type=int, default=5)
+    p.add_argument('--modes', default='from_pretrained,artifact')
+    p.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = p.parse_args()
+
+    if args.worker:
+        worker()
+        return
+
+    for mode in args.modes.split(','):
+        env = dict(os.environ, BATCH_ENABLED='0', PREDICTION_CACHE_ENABLED='0', HISTORY_WRITE_BEHIND='0',
+                   MODEL_LOAD_MODE='lazy', **MODES[mode])
+        runs = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            out = subprocess.run([sys.executable, os.path.abspath(__file__), '--worker'], cwd=BACKEND_DIR,
+                                 env=env, capture_output=True, text=True)
+            if out.returncode != 0:
+                print(f'{mode}: failed\n{out.stderr.strip()[-2000:]}')
+                break
+            r = json.loads(out.stdout.strip().splitlines()[-1])
+            r['process_s'] = time.perf_counter() - start
+            runs.append(r)
+        if not runs:
+            continue
+        med = {k: statistics.median(r[k] for r in runs) for k in ('import_s', 'load_s', 'first_predict_s', 'process_s')}
+        print(f"{mode:>15}: import {med['import_s'] * 1000:.0f} ms  model load {med['load_s'] * 1000:.0f} ms  "
+              f"first prediction {med['first_predict_s'] * 1000:.0f} ms  process {med['process_s']:.2f} s  "
+              f"(heavy modules after import: {', '.join(runs[0]['heavy_at_import']) or 'none'})")
+
+
+if __name__ == '__main__':
+    main()
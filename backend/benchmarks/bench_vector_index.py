@@ -0,0 +1,86 @@
+# Recall and latency of the /similar IVF index against brute-force NumPy search.
+# Vectors are synthetic (clustered, unit-normalized, float16) and written to a
+# temporary memory-mapped index; 1M rows x 768 dims takes ~1.5 GB of disk.
+# Usage (from backend/): python benchmarks/bench_vector_index.py --rows 1000000 --nprobe 8,16,32
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, BACKEND_DIR)
+
+import numpy as np
+from bson.objectid import ObjectId
+from utils.vector_index import VectorIndex
+
+
+def clustered(rng, n, dim, centers, spread):
+    x = centers[rng.randint(0, len(centers), n)] + rng.normal(scale=spread, size=(n, dim)).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def main():
+    p = argparse.ArgumentParser(description='Vector index recall/latency benchmark')
+    p.add_argument('--rows', type=int, default=200000)
+    p.add_argument('--dim', type=int, default=768)
+    p.add_argument('--queries', type=int, default=200)
+    p.add_argument('--k', type=int, default=10)
+    p.add_argument('--nlist', type=int, default=1024)
+    p.add_argument('--nprobe', default='4,8,16,32')
+    p.add_argument('--clusters', type=int, default=2000)
+    p.add_argument('--spread', type=float, default=0.04)
+    p.add_argument('--dir', default=None, help='Index directory (default: a temporary one)')
+    args = p.parse_args()
+
+    rng = np.random.RandomState(0)
+    centers = rng.normal(size=(args.clusters, args.dim)).astype(np.float32)
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    owner = ObjectId()
+    path = args.dir or tempfile.mkdtemp(prefix='vector_index_')
+    index = VectorIndex(path, nlist=args.nlist, exact_limit=0, train_size=args.rows + 1)
+    index.try_acquire()
+    index.reset()
+
+    start = time.perf_counter()
+    keys = []
+    for i in range(0, args.rows, 50000):
+        n = min(50000, args.rows - i)
+        chunk_keys = [ObjectId() for _ in range(n)]
+        index.add_many(chunk_keys, [owner] * n, clustered(rng, n, args.dim, centers, args.spread))
+        keys.extend(chunk_keys)
+    index.flush()
+    build_s = time.perf_counter() - start
+    start = time.perf_counter()
+    index.train()
+    train_s = time.perf_counter() - start
+    print(f"{args.rows} rows x {args.dim} dims in {path}: insert {build_s:.1f}s, train {train_s:.1f}s "
+          f"({index.meta['nlist']} lists)")
+
+    vectors = np.asarray(index._arrays['vectors'][:args.rows], dtype=np.float32)
+    queries = clustered(rng, args.queries, args.dim, centers, args.spread)
+
+    truth, brute_ms = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        scores = vectors @ q
+        top = np.argpartition(-scores, args.k)[:args.k]
+        brute_ms.append((time.perf_counter() - t0) * 1000.0)
+        truth.append({keys[i] for i in top})
+    print(f'  brute force: p50 {np.percentile(brute_ms, 50):.1f} ms  p99 {np.percentile(brute_ms, 99):.1f} ms')
+
+    for nprobe in [int(n) for n in args.nprobe.split(',')]:
+        index.nprobe = nprobe
+        lat, recall = [], []
+        for q, expected in zip(queries, truth):
+            t0 = time.perf_counter()
+            hits = index.search(q, args.k)
+            lat.append((time.perf_counter() - t0) * 1000.0)
+            recall.append(len(expected & {oid for oid, _ in hits}) / args.k)
+        print(f'  nprobe {nprobe:>3}: p50 {np.percentile(lat, 50):.2f} ms  p99 {np.percentile(lat, 99):.2f} ms  '
+              f'recall@{args.k} {np.mean(recall) * 100:.1f}%')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+# Throughput of the gunicorn pre-fork server as the number of workers grows.
+# Starts gunicorn once per worker count, waits for every worker to be ready,
+# then drives /analyzeText from concurrent clients. Needs MongoDB running.
+# Usage (from backend/): python benchmarks/load_test.py --workers 1,2,4 --clients 32 --duration 20
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, BACKEND_DIR)
+
+import numpy as np
+from bson.objectid import ObjectId
+from utils.jwt_helper import generate_token
+
+TEXTS = [
+    'NASA discovers new planet with potential for life.',
+    'BREAKING: Aliens invade Earth, martial law declared!',
+    'World leaders at the United Nations Climate Change Conference have reached a historic agreement to reduce carbon emissions by 50% by 2030.',
+    'Scientists confirm that drinking coffee makes you immortal, according to an anonymous source.',
+]
+
+
+def post(url, body, token, timeout=60):
+    req = urllib.request.Request(url, data=json.dumps(body).encode('utf-8'), method='POST',
+                                 headers={'Content-Type': 'application/json', 'Authorization': f'Bearer {token}'})
+    with urllib.request.urlopen(req, timeout=timeout) as res:
+        return res.status
+
+
+def wait_ready(base_url, workers, timeout=300):
+    # /readyz is answered by whichever worker accepts the connection, so require
+    # a run of consecutive ready answers before starting.
+    deadline = time.time() + timeout
+    streak = 0
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f'{base_url}/readyz', timeout=5) as res:
+                streak = streak + 1 if res.status == 200 else 0
+        except (urllib.error.URLError, ConnectionError):
+            streak = 0
+        if streak >= workers * 4:
+            return True
+        time.sleep(0.25)
+    return False
+
+
+def memory_mb(pid):
+    # Sum RSS and PSS over the master and its workers; PSS splits shared pages
+    # between processes, so it shows what copy-on-write sharing saves.
+    pids = [pid]
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            pids += [int(p) for p in f.read().split()]
+    except OSError:
+        pass
+    rss = pss = 0
+    for p in pids:
+        try:
+            with open(f'/proc/{p}/smaps_rollup') as f:
+                for line in f:
+                    if line.startswith('Rss:'):
+                        rss += int(line.split()[1])
+                    elif line.startswith('Pss:'):
+                        pss += int(line.split()[1])
+        except OSError:
+            pass
+    return rss / 1024.0, pss / 1024.0
+
+
+def drive(base_url, token, clients, duration):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.time() + duration
+
+    def client(i):
+        local = []
+        n = i
+        while time.time() < stop_at:
+            start = time.perf_counter()
+            try:
+                post(f'{base_url}/analyzeText', {'text': f'{TEXTS[n % len(TEXTS)]} #{i}-{n}'}, token)
+                local.append(time.perf_counter() - start)
+            except Exception:
+                with lock:
+                    errors[0] += 1
+            n += 1
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    lat = np.array(latencies or [0]) * 1000.0
+    return {'rps': len(latencies) / elapsed, 'p50_ms': float(np.percentile(lat, 50)),
+            'p99_ms': float(np.percentile(lat, 99)), 'errors': errors[0]}
+
+
+def main():
+    p = argparse.ArgumentParser(description='Multi-worker load test')
+    p.add_argument('--workers', default='1,2,4')
+    p.add_argument('--clients', type=int, default=32)
+    p.add_argument('--duration', type=float, default=20)
+    p.add_argument('--port', type=int, default=5055)
+    args = p.parse_args()
+
+    base_url = f'http://127.0.0.1:{args.port}'
+    token = generate_token(ObjectId())
+    for n in [int(w) for w in args.workers.split(',')]:
+        # All clients share one token; admission's per-user cap would answer most of them with 429
+        env = dict(os.environ, WEB_WORKERS=str(n), BIND=f'127.0.0.1:{args.port}', PREDICTION_CACHE_ENABLED='0',
+                   ADMISSION_ENABLED='0')
+        server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+                                  cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            if not wait_ready(base_url, n):
+                print(f'{n} workers: server did not become ready')
+                continue
+            rss, pss = memory_mb(server.pid)
+            r = drive(base_url, token, args.clients, args.duration)
+            print(f"{n:>2} workers: {r['rps']:.1f} req/s  p50 {r['p50_ms']:.1f} ms  p99 {r['p99_ms']:.1f} ms  "
+                  f"errors {r['errors']}  rss {rss:.0f} MB  pss {pss:.0f} MB")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
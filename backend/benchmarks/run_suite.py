@@ -0,0 +1,333 @@
+# Offline end-to-end performance suite: tokenization, forward pass, the full
+# /analyzeText request, history writes and auth. Runs on one Linux box with no
+# network or MongoDB: the database is mongomock (pip install mongomock) and,
+# when fine_tuned_bert/ is missing, the model is a tiny random BERT built by
+# tiny_bert.py. Prediction cache, near-duplicate index and vector index are
+# off so every request takes the model path.
+# Results are JSON; --compare prints the change of every metric against an
+# earlier result file and exits 1 if any got worse by more than --tolerance
+# (metrics ending in _ms should go down, those ending in _per_s up).
+# Usage (from backend/):
+#   python benchmarks/run_suite.py --out bench_results/$(git rev-parse --short HEAD).json
+#   python benchmarks/run_suite.py --compare bench_results/baseline.json
+#   python benchmarks/run_suite.py --only tokenize,forward --quick
+import argparse
+import csv
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(BENCH_DIR, '..')
+sys.path.insert(0, BACKEND_DIR)
+
+from tiny_bert import FALLBACK_CORPUS, ensure_tiny_bert
+
+DEFAULT_CSV = os.path.join(BACKEND_DIR, '..', 'Real.csv')
+FINE_TUNED_DIR = os.path.join(BACKEND_DIR, '..', 'fine_tuned_bert')
+BENCHMARKS = ('tokenize', 'forward', 'analyze_text', 'history', 'auth')
+
+
+def configure_environment(args):
+    # Must run before app (and utils.db) is imported
+    if args.model_dir:
+        kind, model_dir = 'custom', args.model_dir
+    elif not args.tiny and os.path.exists(os.path.join(FINE_TUNED_DIR, 'config.json')):
+        kind, model_dir = 'fine_tuned', FINE_TUNED_DIR
+    else:
+        kind, model_dir = 'tiny', ensure_tiny_bert(os.path.join(tempfile.gettempdir(), 'fakenews_tiny_bert'), args.csv)
+    os.environ.update({
+        'MONGO_URI': args.mongo_uri,
+        'MODEL_DIR': model_dir,
+        'MODEL_REGISTRY_DIR': os.path.join(tempfile.gettempdir(), 'fakenews_bench_no_registry'),
+        'MODEL_WATCH_INTERVAL': '0',
+        'SERVING_ARTIFACT': '0',
+        'PREDICTION_CACHE_ENABLED': '0',
+        'NEAR_DUP_ENABLED': '0',
+        'VECTOR_INDEX_ENABLED': '0',
+        'HF_HUB_OFFLINE': '1',
+        'TRANSFORMERS_OFFLINE': '1',
+    })
+    return kind, model_dir
+
+
+def load_texts(path, n):
+    texts = []
+    if os.path.exists(path):
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                text = (row.get('text') or '').strip()
+                if text:
+                    texts.append(text)
+                if len(texts) >= n:
+                    break
+    return texts or [f'{FALLBACK_CORPUS} ({i})' for i in range(n)]
+
+
+def summarize(seconds, prefix=''):
+    lat = sorted(s * 1000.0 for s in seconds)
+    pick = lambda q: lat[min(len(lat) - 1, int(q * len(lat)))]
+    return {f'{prefix}p50_ms': pick(0.5), f'{prefix}p99_ms': pick(0.99), f'{prefix}mean_ms': sum(lat) / len(lat)}
+
+
+def bench_tokenize(ctx):
+    tokenizer, texts = ctx['tokenizer'], ctx['texts']
+    start = time.perf_counter()
+    tokens = sum(len(tokenizer(text, truncation=True)['input_ids']) for text in texts)
+    single = time.perf_counter() - start
+    start = time.perf_counter()
+    for i in range(0, len(texts), 32):
+        tokenizer(texts[i:i + 32], truncation=True, padding=True, return_tensors='pt')
+    batched = time.perf_counter() - start
+    return {'single_texts_per_s': len(texts) / single, 'single_tokens_per_s': tokens / single,
+            'batch32_texts_per_s': len(texts) / batched}
+
+
+def bench_forward(ctx):
+    import torch
+    tokenizer, model, repeat = ctx['tokenizer'], ctx['model'], ctx['repeat']
+    results = {}
+    for seq in (128, 512):
+        for batch in (1, 16):
+            inputs = tokenizer(['news ' * seq] * batch, truncation=True, max_length=seq, padding='max_length',
+                               return_tensors='pt')
+            times = []
+            with torch.no_grad():
+                model(**inputs)
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    model(**inputs)
+                    times.append(time.perf_counter() - start)
+            stats = summarize(times, f'seq{seq}_batch{batch}_')
+            stats[f'seq{seq}_batch{batch}_texts_per_s'] = batch * 1000.0 / stats[f'seq{seq}_batch{batch}_mean_ms']
+            results.update(stats)
+    return results
+
+
+def post_analyze(client, token, text):
+    start = time.perf_counter()
+    res = client.post('/analyzeText', json={'text': text}, headers={'Authorization': f'Bearer {token}'})
+    if res.status_code != 200:
+        raise RuntimeError(f'/analyzeText returned {res.status_code}: {res.get_data(as_text=True)[:200]}')
+    return time.perf_counter() - start
+
+
+def bench_analyze_text(ctx):
+    # In-process through the Flask test client: routing, auth, micro-batcher,
+    # model, history write; no sockets
+    from bson.objectid import ObjectId
+    from utils.jwt_helper import generate_token
+    app, texts, n, clients = ctx['app'], ctx['texts'], ctx['requests'], ctx['clients']
+    client = app.app.test_client()
+    token = generate_token(ObjectId())
+    post_analyze(client, token, texts[0])
+    sequential = [post_analyze(client, token, texts[i % len(texts)]) for i in range(n)]
+    results = summarize(sequential, 'sequential_')
+    results['sequential_per_s'] = n / sum(sequential)
+
+    concurrent = []
+    lock = threading.Lock()
+
+    def worker(k):
+        local_client, local_token = app.app.test_client(), generate_token(ObjectId())
+        local = [post_analyze(local_client, local_token, texts[(k + i * clients) % len(texts)]) for i in range(n // clients)]
+        with lock:
+            concurrent.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(k,)) for k in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    results.update(summarize(concurrent, f'concurrent{clients}_'))
+    results[f'concurrent{clients}_per_s'] = len(concurrent) / elapsed
+    return results
+
+
+def bench_history(ctx):
+    from bson.objectid import ObjectId
+    import models.history_model as history_model
+    texts, n = ctx['texts'], ctx['requests'] * 5
+    user = str(ObjectId())
+    writer = history_model.history_writer
+
+    history_model.history_writer = None
+    try:
+        start = time.perf_counter()
+        for i in range(n):
+            history_model.create_history(user, texts[i % len(texts)], 'Fake', 90.0, model_version='bench')
+        sync = time.perf_counter() - start
+        items = [{'input_text': texts[i % len(texts)], 'prediction': 'Real', 'confidence': 80.0} for i in range(32)]
+        start = time.perf_counter()
+        for _ in range(max(1, n // 32)):
+            history_model.create_history_many(user, items)
+        many = time.perf_counter() - start
+    finally:
+        history_model.history_writer = writer
+    results = {'sync_docs_per_s': n / sync, 'insert_many32_docs_per_s': max(1, n // 32) * 32 / many}
+
+    if writer is not None:
+        start = time.perf_counter()
+        for i in range(n):
+            history_model.create_history(user, texts[i % len(texts)], 'Fake', 90.0, model_version='bench')
+        submitted = time.perf_counter() - start
+        writer.close()
+        results['write_behind_submit_docs_per_s'] = n / submitted
+        results['write_behind_flushed_docs_per_s'] = n / (time.perf_counter() - start)
+    return results
+
+
+def bench_auth(ctx):
+    from bson.objectid import ObjectId
+    from utils.jwt_helper import generate_token, verify_token
+    from utils.password_hasher import hash_password, check_password
+    app, n = ctx['app'], ctx['requests'] * 10
+    results = {}
+
+    start = time.perf_counter()
+    tokens = [generate_token(ObjectId()) for _ in range(n)]
+    results['token_issue_per_s'] = n / (time.perf_counter() - start)
+    start = time.perf_counter()
+    for token in tokens:
+        verify_token(token)
+    results['token_verify_uncached_per_s'] = n / (time.perf_counter() - start)
+    start = time.perf_counter()
+    for _ in range(n):
+        verify_token(tokens[0])
+    results['token_verify_cached_per_s'] = n / (time.perf_counter() - start)
+
+    rounds = 4 if ctx['quick'] else 16
+    start = time.perf_counter()
+    password_hash = hash_password('benchmark-password')
+    results['bcrypt_hash_ms'] = (time.perf_counter() - start) * 1000.0
+    start = time.perf_counter()
+    for _ in range(rounds):
+        check_password('benchmark-password', password_hash)
+    results['bcrypt_check_per_s'] = rounds / (time.perf_counter() - start)
+
+    client = app.app.test_client()
+    email = f'bench-{ObjectId()}@example.com'
+    client.post('/signup', json={'name': 'Bench', 'email': email, 'password': 'benchmark-password'})
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        res = client.post('/login', json={'email': email, 'password': 'benchmark-password'})
+        times.append(time.perf_counter() - start)
+        if res.status_code != 200:
+            raise RuntimeError(f'/login returned {res.status_code}: {res.get_data(as_text=True)[:200]}')
+    results.update(summarize(times, 'login_'))
+    token = res.get_json()['token']
+    start = time.perf_counter()
+    for _ in range(n // 10):
+        client.get('/profile', headers={'Authorization': f'Bearer {token}'})
+    results['profile_requests_per_s'] = (n // 10) / (time.perf_counter() - start)
+    return results
+
+
+def environment(kind, model_dir, args):
+    import torch
+    import transformers
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=BACKEND_DIR, capture_output=True, text=True).stdout.strip()
+    except Exception:
+        commit = ''
+    return {
+        'timestamp': datetime.utcnow().isoformat() + 'Z',
+        'commit': commit or None,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'torch': torch.__version__,
+        'torch_threads': torch.get_num_threads(),
+        'transformers': transformers.__version__,
+        'model': kind,
+        'model_dir': os.path.abspath(model_dir),
+        'inference_backend': os.getenv('INFERENCE_BACKEND', 'pytorch'),
+        'mongo': args.mongo_uri.split('://', 1)[0],
+        'options': {k: v for k, v in vars(args).items() if k not in ('out', 'compare')},
+    }
+
+
+def compare(baseline, results, tolerance):
+    env, old_env = results['environment'], baseline.get('environment', {})
+    for key in ('model', 'cpus', 'torch', 'inference_backend'):
+        if old_env.get(key) != env.get(key):
+            print(f'note: {key} differs from the baseline ({old_env.get(key)} vs {env.get(key)})')
+    regressions = []
+    for bench, metrics in results['benchmarks'].items():
+        for key, value in metrics.items():
+            old = baseline.get('benchmarks', {}).get(bench, {}).get(key)
+            if not old or not isinstance(old, (int, float)):
+                continue
+            change = (value - old) / old
+            worse = change > tolerance if key.endswith('_ms') else change < -tolerance
+            flag = '  REGRESSION' if worse else ''
+            print(f'{bench}.{key}: {old:.2f} -> {value:.2f} ({change:+.1%}){flag}')
+            if worse:
+                regressions.append(f'{bench}.{key}')
+    return regressions
+
+
+def main():
+    p = argparse.ArgumentParser(description='Offline performance benchmark suite')
+    p.add_argument('--only', default=','.join(BENCHMARKS), help=f'Comma-separated subset of {",".join(BENCHMARKS)}')
+    p.add_argument('--quick', action='store_true', help='Fewer iterations, for a smoke run')
+    p.add_argument('--requests', type=int, default=200, help='/analyzeText requests per phase')
+    p.add_argument('--clients', type=int, default=8)
+    p.add_argument('--repeat', type=int, default=20, help='Forward passes per shape')
+    p.add_argument('--csv', default=DEFAULT_CSV, help='Corpus for texts and the tiny model vocabulary')
+    p.add_argument('--model_dir', default=None, help='Default: ../fine_tuned_bert if present, else a tiny random BERT')
+    p.add_argument('--tiny', action='store_true', help='Use the tiny random BERT even if fine_tuned_bert exists')
+    p.add_argument('--mongo_uri', default='mongomock://fakenews_bench', help='A real mongodb:// URI also works')
+    p.add_argument('--out', default=None, help='Write results here instead of stdout')
+    p.add_argument('--compare', default=None, help='Earlier result file to compare against')
+    p.add_argument('--tolerance', type=float, default=0.10)
+    args = p.parse_args()
+    selected = [b for b in args.only.split(',') if b]
+    unknown = set(selected) - set(BENCHMARKS)
+    if unknown:
+        raise SystemExit(f'Unknown benchmarks: {sorted(unknown)}')
+    if args.quick:
+        args.requests, args.repeat = min(args.requests, 32), min(args.repeat, 5)
+
+    kind, model_dir = configure_environment(args)
+    import app
+    tokenizer, model = app.get_model_and_tokenizer()
+    ctx = {'app': app, 'tokenizer': tokenizer, 'model': model, 'texts': load_texts(args.csv, 256),
+           'requests': args.requests, 'clients': args.clients, 'repeat': args.repeat, 'quick': args.quick}
+    functions = {'tokenize': bench_tokenize, 'forward': bench_forward, 'analyze_text': bench_analyze_text,
+                 'history': bench_history, 'auth': bench_auth}
+
+    results = {'environment': environment(kind, model_dir, args), 'benchmarks': {}}
+    for name in selected:
+        start = time.perf_counter()
+        results['benchmarks'][name] = functions[name](ctx)
+        print(f'{name} ({time.perf_counter() - start:.1f}s)', file=sys.stderr)
+        for key, value in results['benchmarks'][name].items():
+            print(f'  {key}: {value:.2f}', file=sys.stderr)
+
+    output = json.dumps(results, indent=2)
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), results, args.tolerance)
+        if regressions:
+            print(f'{len(regressions)} metrics regressed by more than {args.tolerance:.0%}: {", ".join(regressions)}')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
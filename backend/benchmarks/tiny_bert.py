@@ -0,0 +1,69 @@
+# A small randomly initialized BERT classifier with a WordPiece vocabulary
+# built from the local corpus, for benchmarking the serving path on a machine
+# without fine_tuned_bert/ or network access. Its verdicts are meaningless;
+# its shapes, tokenizer and code path are the real ones. The same seed and
+# corpus always give the same model.
+import collections
+import csv
+import json
+import os
+import re
+import string
+
+TINY_CONFIG = {'hidden_size': 128, 'num_hidden_layers': 2, 'num_attention_heads': 2, 'intermediate_size': 512}
+SPECIAL_TOKENS = ['[PAD]', '[UNK]', '[CLS]', '[SEP]', '[MASK]']
+FALLBACK_CORPUS = ('the government said on monday that the new policy would take effect next year '
+                   'officials confirmed reports of the agreement while critics called it a hoax')
+
+
+def corpus_words(csv_path, max_rows=5000):
+    counts = collections.Counter()
+    if csv_path and os.path.exists(csv_path):
+        with open(csv_path, newline='', encoding='utf-8') as f:
+            for n, row in enumerate(csv.DictReader(f)):
+                if n >= max_rows:
+                    break
+                counts.update(re.findall(r'[a-z0-9]+', (row.get('text') or '').lower()))
+    if not counts:
+        counts.update(FALLBACK_CORPUS.split())
+    return counts
+
+
+def build_vocab(counts, size):
+    chars = list(string.ascii_lowercase + string.digits + string.punctuation)
+    vocab = SPECIAL_TOKENS + chars + [f'##{c}' for c in string.ascii_lowercase + string.digits]
+    seen = set(vocab)
+    for word, _ in counts.most_common():
+        if len(vocab) >= size:
+            break
+        if word not in seen:
+            vocab.append(word)
+            seen.add(word)
+    return vocab
+
+
+def ensure_tiny_bert(out_dir, csv_path=None, vocab_size=8000, seed=0):
+    # Returns out_dir, building the model there unless the same build is present
+    marker = os.path.join(out_dir, 'tiny_bert.json')
+    spec = {'vocab_size': vocab_size, 'seed': seed, 'corpus': os.path.basename(csv_path or ''), **TINY_CONFIG}
+    if os.path.exists(marker):
+        with open(marker) as f:
+            if json.load(f) == spec:
+                return out_dir
+
+    import torch
+    from transformers import BertConfig, BertForSequenceClassification, BertTokenizerFast
+    os.makedirs(out_dir, exist_ok=True)
+    vocab_path = os.path.join(out_dir, 'vocab.txt')
+    with open(vocab_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(build_vocab(corpus_words(csv_path), vocab_size)) + '\n')
+    tokenizer = BertTokenizerFast(vocab_file=vocab_path, do_lower_case=True, model_max_length=512)
+    config = BertConfig(vocab_size=len(tokenizer), max_position_embeddings=512, num_labels=2,
+                        id2label={0: 'Fake', 1: 'Real'}, label2id={'Fake': 0, 'Real': 1}, **TINY_CONFIG)
+    torch.manual_seed(seed)
+    model = BertForSequenceClassification(config).eval()
+    model.save_pretrained(out_dir)
+    tokenizer.save_pretrained(out_dir)
+    with open(marker, 'w') as f:
+        json.dump(spec, f)
+    return out_dir
@@ -0,0 +1,75 @@
+# Rebuild the /similar vector index from the history collection, first
+# computing embeddings for history items that have none (older items, cache
+# and near-duplicate hits, bulk_score output). Stop the API first: only one
+# process may write the index.
+#
+# Usage (from backend/):
+#   python build_vector_index.py
+#   python build_vector_index.py --embed all --train    # after replacing the model
+import argparse
+import os
+import time
+
+os.environ.setdefault('HISTORY_WRITE_BEHIND', '0')
+os.environ.setdefault('BATCH_ENABLED', '0')
+os.environ.setdefault('PREDICTION_CACHE_ENABLED', '0')
+os.environ.setdefault('ADMISSION_ENABLED', '0')
+os.environ.setdefault('MODEL_WATCH_INTERVAL', '0')
+
+
+def embed_history(app, mode, batch_size):
+    from pymongo import UpdateOne
+
+    def flush(docs):
+        results = app.predict_probs([d['inputText'] or '' for d in docs], details=True)
+        ops = [UpdateOne({'_id': d['_id']}, {'$set': {'embedding': embedding}})
+               for d, (_, embedding, _, _) in zip(docs, results) if embedding is not None]
+        if len(ops) < len(docs):
+            raise SystemExit('The inference backend does not expose embeddings; use INFERENCE_BACKEND=pytorch or int8')
+        app.history_collection.bulk_write(ops, ordered=False)
+        return len(ops)
+
+    query = {} if mode == 'all' else {'embedding': {'$exists': False}}
+    done, start, batch = 0, time.time(), []
+    for doc in app.history_collection.find(query, {'inputText': 1}).batch_size(batch_size * 4):
+        batch.append(doc)
+        if len(batch) == batch_size:
+            done += flush(batch)
+            batch = []
+            print(f'embedded {done} items ({done / (time.time() - start):.1f}/s)', flush=True)
+    if batch:
+        done += flush(batch)
+    print(f'embedded {done} items')
+
+
+def main():
+    p = argparse.ArgumentParser(description='Rebuild the similar-article vector index')
+    p.add_argument('--embed', choices=['missing', 'all', 'none'], default='missing',
+                   help='Which history items get (re)computed embeddings first')
+    p.add_argument('--batch_size', type=int, default=64)
+    p.add_argument('--train', action='store_true', help='Train IVF lists even below VECTOR_INDEX_TRAIN_SIZE')
+    args = p.parse_args()
+
+    import app
+    from utils.vector_index import VectorIndexSync
+    if app.vector_index is None:
+        raise SystemExit('VECTOR_INDEX_ENABLED=0')
+    if not app.vector_index.try_acquire():
+        raise SystemExit(f'{app.VECTOR_INDEX_DIR} is locked by a running process; stop the API first')
+
+    if args.embed != 'none':
+        embed_history(app, args.embed, args.batch_size)
+
+    index = app.vector_index
+    index.reset()
+    sync = VectorIndexSync(index, app.history_collection, batch_size=10000)
+    start = time.time()
+    while sync.sync_once(lag=0, train=False):
+        print(f"indexed {index.meta['count']} items", flush=True)
+    if index.meta and (args.train or index.should_train()):
+        index.train()
+    print(f'{index.stats()} in {time.time() - start:.1f}s')
+
+
+if __name__ == '__main__':
+    main()
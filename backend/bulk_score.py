@@ -0,0 +1,276 @@
+# Offline bulk scoring: stream a CSV or JSONL file through the model in large
+# batches and write predictions incrementally to CSV, Parquet or the history
+# collection. Interrupted runs resume from the last written chunk.
+#
+# Usage (from backend/):
+#   python bulk_score.py ../Real.csv --output scores.csv --workers 4
+#   python bulk_score.py archive.jsonl --output scores_parquet --format parquet
+#   python bulk_score.py archive.csv --format mongo --user_id <ObjectId>
+import argparse
+import csv
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+
+# Bulk runs write their own batches; no write-behind thread or batching window needed
+os.environ.setdefault('HISTORY_WRITE_BEHIND', '0')
+os.environ.setdefault('BATCH_ENABLED', '0')
+os.environ.setdefault('PREDICTION_CACHE_ENABLED', '0')
+os.environ.setdefault('ADMISSION_ENABLED', '0')
+# A run scores every row with the version it started with
+os.environ.setdefault('MODEL_WATCH_INTERVAL', '0')
+
+csv.field_size_limit(sys.maxsize)
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Score a large CSV/JSONL file with the fake news model')
+    p.add_argument('input', help='CSV or JSONL file')
+    p.add_argument('--output', default=None, help='Output CSV file or Parquet directory (not used with --format mongo)')
+    p.add_argument('--format', choices=['csv', 'parquet', 'mongo'], default='csv')
+    p.add_argument('--input_format', choices=['csv', 'jsonl'], default=None, help='Default: from the file extension')
+    p.add_argument('--text_col', default='text')
+    p.add_argument('--id_col', default=None, help='Column copied to the output to identify rows')
+    p.add_argument('--user_id', default=None, help='History owner for --format mongo')
+    p.add_argument('--chunk_size', type=int, default=512, help='Rows per chunk handed to a worker')
+    p.add_argument('--batch_size', type=int, default=64, help='Texts per forward pass inside a chunk')
+    p.add_argument('--workers', type=int, default=1)
+    p.add_argument('--threads_per_worker', type=int, default=0, help='torch threads per worker (default: CPUs / workers)')
+    p.add_argument('--no_resume', action='store_true', help='Ignore an existing checkpoint and start over')
+    args = p.parse_args()
+    if args.input_format is None:
+        args.input_format = 'jsonl' if args.input.lower().endswith(('.jsonl', '.ndjson')) else 'csv'
+    if args.format == 'mongo' and not args.user_id:
+        p.error('--format mongo requires --user_id')
+    if args.format != 'mongo' and not args.output:
+        p.error('--output is required')
+    return args
+
+
+def read_rows(path, input_format, text_col, id_col):
+    with open(path, newline='', encoding='utf-8') as f:
+        if input_format == 'jsonl':
+            for line in f:
+                if line.strip():
+                    row = json.loads(line)
+                    yield row.get(text_col), row.get(id_col) if id_col else None
+        else:
+            for row in csv.DictReader(f):
+                yield row.get(text_col), row.get(id_col) if id_col else None
+
+
+def read_chunks(args, skip):
+    chunk = []
+    for n, (text, row_id) in enumerate(read_rows(args.input, args.input_format, args.text_col, args.id_col)):
+        if n < skip:
+            continue
+        chunk.append((n, row_id, text))
+        if len(chunk) >= args.chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+_batch_size = 64
+
+
+def init_worker(threads, batch_size):
+    global _batch_size
+    _batch_size = batch_size
+    import torch
+    if threads:
+        torch.set_num_threads(threads)
+
+
+def score_chunk(chunk):
+    from app import predict_probs_bucketed, label_probs
+    valid = [i for i, (_, _, text) in enumerate(chunk) if isinstance(text, str) and text.strip()]
+    probs = predict_probs_bucketed([chunk[i][2] for i in valid], _batch_size) if valid else []
+    results = [{'row': n, 'id': row_id, 'prediction': None, 'confidence': None, 'error': 'No text'}
+               for n, row_id, _ in chunk]
+    for i, p in zip(valid, probs):
+        if isinstance(p, Exception):
+            results[i]['error'] = str(p)
+            continue
+        prediction, confidence = label_probs(p)
+        results[i].update({'prediction': prediction, 'confidence': confidence, 'error': None,
+                           'probs': [float(x) for x in p]})
+    return chunk, results
+
+
+def ordered_imap(pool, fn, items, max_pending):
+    # Like Pool.imap, but only max_pending chunks are read ahead; imap would
+    # drain the whole input generator into its task queue.
+    pending = deque()
+    for item in items:
+        pending.append(pool.apply_async(fn, (item,)))
+        if len(pending) >= max_pending:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+class CsvSink:
+    fields = ['row', 'id', 'prediction', 'confidence', 'prob_fake', 'prob_real', 'error']
+
+    def __init__(self, path, resume_bytes=None):
+        exists = resume_bytes is not None and os.path.exists(path)
+        self.f = open(path, 'r+' if exists else 'w', newline='', encoding='utf-8')
+        if exists:
+            # Drop rows written after the last checkpoint
+            self.f.seek(resume_bytes)
+            self.f.truncate()
+        self.writer = csv.DictWriter(self.f, fieldnames=self.fields)
+        if not exists:
+            self.writer.writeheader()
+
+    def position(self):
+        return self.f.tell()
+
+    def write(self, chunk, results):
+        for r in results:
+            probs = r.get('probs') or [None, None]
+            self.writer.writerow({'row': r['row'], 'id': r['id'], 'prediction': r['prediction'],
+                                  'confidence': r['confidence'], 'prob_fake': probs[0], 'prob_real': probs[-1],
+                                  'error': r['error']})
+        self.f.flush()
+        os.fsync(self.f.fileno())
+
+    def close(self):
+        self.f.close()
+
+
+class ParquetSink:
+    # One part file per chunk, so a resumed run never rewrites earlier parts
+    def __init__(self, path):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise SystemExit('--format parquet requires pyarrow (pip install pyarrow)')
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+
+    def write(self, chunk, results):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pa.table({
+            'row': [r['row'] for r in results],
+            'id': [None if r['id'] is None else str(r['id']) for r in results],
+            'prediction': [r['prediction'] for r in results],
+            'confidence': [r['confidence'] for r in results],
+            'prob_fake': [(r.get('probs') or [None])[0] for r in results],
+            'prob_real': [(r.get('probs') or [None])[-1] for r in results],
+            'error': [r['error'] for r in results],
+        })
+        pq.write_table(table, os.path.join(self.path, f'part-{results[0]["row"]:012d}.parquet'))
+
+    def position(self):
+        return None
+
+    def close(self):
+        pass
+
+
+class MongoSink:
+    # History ids are derived from the run id and row number, so a chunk
+    # written again after a crash before its checkpoint is not duplicated
+    def __init__(self, user_id, run_id):
+        self.user_id = user_id
+        self.run_id = run_id
+
+    def history_id(self, row):
+        from bson.objectid import ObjectId
+        # Keeps the run's timestamp prefix, so ids still sort by creation time
+        digest = hashlib.sha1(f'{self.run_id}:{row}'.encode('utf-8')).digest()
+        return ObjectId(ObjectId(self.run_id).binary[:4] + digest[:8])
+
+    def write(self, chunk, results):
+        from models.history_model import create_history_once
+        from app import serving_version
+        texts = {n: text for n, _, text in chunk}
+        version = serving_version()
+        items = [{'_id': self.history_id(r['row']), 'input_text': texts[r['row']], 'prediction': r['prediction'],
+                  'confidence': r['confidence'], 'model_version': version} for r in results if r['error'] is None]
+        create_history_once(self.user_id, items)
+
+    def position(self):
+        return None
+
+    def close(self):
+        pass
+
+
+def checkpoint_path(args):
+    target = args.output or f'{args.input}.mongo-{args.user_id}'
+    return f'{target.rstrip(os.sep)}.checkpoint.json'
+
+
+def save_checkpoint(path, state):
+    with open(path + '.tmp', 'w') as f:
+        json.dump(state, f)
+    os.replace(path + '.tmp', path)
+
+
+def main():
+    args = parse_args()
+    ckpt = checkpoint_path(args)
+    state = {'rows_done': 0, 'output_bytes': None}
+    if not args.no_resume and os.path.exists(ckpt):
+        with open(ckpt) as f:
+            state = json.load(f)
+        print(f"Resuming after {state['rows_done']} rows (checkpoint {ckpt})")
+    rows_done = state['rows_done']
+    if not state.get('run_id'):
+        # Saved before anything is written, so a crash in the first chunk resumes with the same ids
+        from bson.objectid import ObjectId
+        state['run_id'] = str(ObjectId())
+        save_checkpoint(ckpt, state)
+
+    if args.format == 'csv':
+        sink = CsvSink(args.output, state['output_bytes'] if rows_done else None)
+    elif args.format == 'parquet':
+        sink = ParquetSink(args.output)
+    else:
+        sink = MongoSink(args.user_id, state['run_id'])
+
+    threads = args.threads_per_worker or max(1, (os.cpu_count() or 1) // args.workers)
+    # Load once in the parent so forked workers share the weights copy-on-write
+    from app import get_model_and_tokenizer
+    get_model_and_tokenizer()
+
+    pool = None
+    if args.workers > 1:
+        ctx = multiprocessing.get_context('fork')
+        pool = ctx.Pool(args.workers, initializer=init_worker, initargs=(threads, args.batch_size))
+        results_iter = ordered_imap(pool, score_chunk, read_chunks(args, rows_done), args.workers * 2)
+    else:
+        init_worker(threads, args.batch_size)
+        results_iter = map(score_chunk, read_chunks(args, rows_done))
+
+    start = time.perf_counter()
+    scored = errors = 0
+    try:
+        for chunk, results in results_iter:
+            sink.write(chunk, results)
+            rows_done = chunk[-1][0] + 1
+            scored += len(results)
+            errors += sum(1 for r in results if r['error'])
+            save_checkpoint(ckpt, {'rows_done': rows_done, 'output_bytes': sink.position(), 'run_id': state['run_id']})
+            elapsed = time.perf_counter() - start
+            print(f'{rows_done} rows done  {scored / elapsed:.1f} rows/s  ({errors} errors)', flush=True)
+    finally:
+        if pool is not None:
+            pool.terminate()
+        sink.close()
+
+    elapsed = time.perf_counter() - start
+    print(f'Scored {scored} rows in {elapsed:.1f}s: {scored / elapsed if elapsed else 0:.1f} rows/s, {errors} errors')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+# Build the serving artifact app.py loads at startup instead of from_pretrained.
+# Re-run after fine-tuning; the app ignores an artifact built from other weights.
+#
+# Usage (from backend/):
+#   python export_artifact.py
+#   python export_artifact.py --model_dir ../fine_tuned_bert_student --out_dir /srv/model
+import argparse
+import os
+import time
+
+from utils.early_exit import EXIT_HEAD_FILES
+from utils.prediction_cache import model_fingerprint
+from utils.serving_artifact import export_artifact, load_artifact
+
+MODEL_NAME = 'bert-base-uncased'
+DEFAULT_MODEL_DIR = os.getenv('MODEL_DIR') or os.path.join(os.path.dirname(__file__), '..', 'fine_tuned_bert')
+
+
+def main():
+    p = argparse.ArgumentParser(description='Export a memory-mappable serving artifact of the fine-tuned model')
+    p.add_argument('--model_dir', default=DEFAULT_MODEL_DIR)
+    p.add_argument('--out_dir', default=None, help='Default: <model_dir>/serving')
+    args = p.parse_args()
+    out_dir = args.out_dir or os.path.join(args.model_dir, 'serving')
+
+    import torch
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+    if os.path.exists(os.path.join(args.model_dir, 'config.json')):
+        tokenizer = AutoTokenizer.from_pretrained(args.model_dir)
+        model = AutoModelForSequenceClassification.from_pretrained(args.model_dir)
+    else:
+        print(f'No fine-tuned model in {args.model_dir}, exporting {MODEL_NAME}')
+        tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+        model = AutoModelForSequenceClassification.from_pretrained(MODEL_NAME, num_labels=2)
+    if not tokenizer.is_fast:
+        raise SystemExit('The serving artifact needs a fast tokenizer (tokenizer.json)')
+    model.eval()
+
+    export_artifact(model, tokenizer, out_dir, model_fingerprint(args.model_dir, MODEL_NAME, EXIT_HEAD_FILES))
+
+    # Round-trip check: the artifact must reproduce the original logits
+    start = time.perf_counter()
+    tok2, model2 = load_artifact(out_dir)
+    load_seconds = time.perf_counter() - start
+    sample = ['NASA discovers new planet with potential for life.', 'Aliens invade Earth, martial law declared!']
+    with torch.no_grad():
+        expected = model(**tokenizer(sample, padding=True, return_tensors='pt')).logits
+        actual = model2(**tok2(sample, padding=True, return_tensors='pt')).logits
+    diff = (expected - actual).abs().max().item()
+    if diff > 1e-4:
+        raise SystemExit(f'Artifact logits differ from the source model by {diff:.2e}')
+    print(f'Wrote {out_dir} (reload {load_seconds * 1000:.0f} ms, max logit diff {diff:.1e})')
+
+
+if __name__ == '__main__':
+    main()
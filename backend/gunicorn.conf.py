@@ -0,0 +1,54 @@
+# Production serving: pre-fork worker pool sharing one copy of the model weights.
+# Usage (from backend/): gunicorn -c gunicorn.conf.py app:app
+#
+# The master imports the app and loads the model before forking, so workers
+# share the weight pages copy-on-write instead of each loading their own copy.
+import gc
+import os
+
+bind = os.getenv('BIND', f"0.0.0.0:{os.getenv('PORT', 5000)}")
+workers = int(os.getenv('WEB_WORKERS', 2))
+threads = int(os.getenv('WEB_THREADS', 4))
+worker_class = 'gthread'
+preload_app = True
+timeout = int(os.getenv('WEB_TIMEOUT', 120))
+graceful_timeout = int(os.getenv('WEB_GRACEFUL_TIMEOUT', 30))
+
+# The master must not start torch's intra-op pool before forking: the pool does
+# not survive fork and a child inheriting it can deadlock.
+os.environ.setdefault('MODEL_LOAD_MODE', 'preload')
+
+
+def torch_threads_per_worker():
+    configured = int(os.getenv('TORCH_THREADS', 0))
+    if configured:
+        return configured
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+def when_ready(server):
+    import torch
+    torch.set_num_threads(1)
+    import app
+    app.get_model_and_tokenizer()
+    # Move everything allocated so far out of the GC's reach so collections in
+    # the workers don't write to (and un-share) the inherited pages.
+    gc.collect()
+    gc.freeze()
+    server.log.info('Model loaded in master, forking %d workers', workers)
+
+
+def post_fork(server, worker):
+    import torch
+    n = torch_threads_per_worker()
+    torch.set_num_threads(n)
+    import app
+    app.start_warm_up()
+    if app.model_watcher is not None:
+        app.model_watcher.ensure_started()
+    server.log.info('Worker %s using %d torch threads', worker.pid, n)
+
+
+def worker_exit(server, worker):
+    import app
+    app.shutdown()
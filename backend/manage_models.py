@@ -0,0 +1,53 @@
+# Publish and activate model versions in the registry the API serves from.
+# Running API processes pick up an activated version within MODEL_WATCH_INTERVAL
+# seconds, without a restart.
+#
+# Usage (from backend/):
+#   python manage_models.py list
+#   python manage_models.py publish ../fine_tuned_bert --activate
+#   python manage_models.py publish ../fine_tuned_bert_student --version student-v2
+#   python manage_models.py activate 20261018-101500
+import argparse
+import os
+
+from utils.model_registry import ModelRegistry
+
+DEFAULT_REGISTRY_DIR = os.getenv('MODEL_REGISTRY_DIR') or os.path.join(os.path.dirname(__file__), '..', 'model_registry')
+
+
+def main():
+    p = argparse.ArgumentParser(description='Manage versioned models for zero-downtime swaps')
+    p.add_argument('--registry', default=DEFAULT_REGISTRY_DIR)
+    sub = p.add_subparsers(dest='command', required=True)
+    sub.add_parser('list', help='List published versions')
+    pub = sub.add_parser('publish', help='Copy a saved model directory into the registry')
+    pub.add_argument('model_dir')
+    pub.add_argument('--version', default=None, help='Default: UTC timestamp')
+    pub.add_argument('--activate', action='store_true', help='Serve it once published')
+    act = sub.add_parser('activate', help='Serve a published version')
+    act.add_argument('version')
+    args = p.parse_args()
+
+    registry = ModelRegistry(args.registry)
+    try:
+        if args.command == 'list':
+            current = registry.current()
+            for version in registry.versions():
+                print(f"{'*' if version == current else ' '} {version}")
+            if current is None:
+                print('No version is active; the API serves MODEL_DIR')
+        elif args.command == 'publish':
+            version = registry.publish(args.model_dir, args.version)
+            print(f'Published {version}')
+            if args.activate:
+                registry.set_current(version)
+                print(f'Activated {version}')
+        else:
+            registry.set_current(args.version)
+            print(f'Activated {args.version}')
+    except ValueError as e:
+        raise SystemExit(str(e))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,20 @@
+from utils.async_db import history
+from models.history_model import LIST_PROJECTION, FULL_PROJECTION, HISTORY_PAGE_MAX, encode_cursor, decode_cursor
+from bson.objectid import ObjectId
+
+async def get_history_page(user_id, limit=20, cursor=None, full=False):
+    limit = max(1, min(int(limit), HISTORY_PAGE_MAX))
+    query = {'userId': ObjectId(user_id)}
+    if cursor:
+        created_at, oid = decode_cursor(cursor)
+        query['$or'] = [
+            {'createdAt': {'$lt': created_at}},
+            {'createdAt': created_at, '_id': {'$lt': oid}},
+        ]
+    projection = FULL_PROJECTION if full else LIST_PROJECTION
+    items = await history.find(query, projection).sort([('createdAt', -1), ('_id', -1)]).limit(limit + 1).to_list(limit + 1)
+    next_cursor = encode_cursor(items[limit - 1]) if len(items) > limit else None
+    return items[:limit], next_cursor
+
+async def get_history_item(user_id, history_id):
+    return await history.find_one({'_id': ObjectId(history_id), 'userId': ObjectId(user_id)})
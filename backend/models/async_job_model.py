@@ -0,0 +1,22 @@
+from utils.async_db import jobs
+from bson.objectid import ObjectId
+from bson.errors import InvalidId
+
+async def create_job(user_id, kind):
+    doc = {
+        'userId': ObjectId(user_id),
+        'kind': kind,
+        'status': 'pending',
+        'result': None,
+        'error': None,
+        'createdAt': __import__('datetime').datetime.utcnow(),
+        'finishedAt': None
+    }
+    res = await jobs.insert_one(doc)
+    return res.inserted_id
+
+async def find_job(job_id, user_id):
+    try:
+        return await jobs.find_one({'_id': ObjectId(job_id), 'userId': ObjectId(user_id)})
+    except InvalidId:
+        return None
@@ -0,0 +1,10 @@
+from utils.async_db import history_rollups
+from models.stats_model import TOTAL_DAY, STATS_DEFAULT_DAYS, stats_window, stats_body, rollup_id
+from bson.objectid import ObjectId
+
+async def get_stats(user_id, days=STATS_DEFAULT_DAYS):
+    window = stats_window(days)
+    uid = ObjectId(user_id)
+    total = await history_rollups.find_one({'_id': rollup_id(uid, TOTAL_DAY)})
+    daily = await history_rollups.find({'userId': uid, 'day': {'$gte': window[0], '$lte': window[-1]}}).to_list(len(window))
+    return stats_body(total, daily, window)
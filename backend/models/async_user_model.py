@@ -0,0 +1,18 @@
+from utils.async_db import users
+from bson.objectid import ObjectId
+
+async def create_user(name, email, password_hash):
+    doc = { 'name': name, 'email': email, 'password': password_hash, 'themePreference': 'dark' }
+    res = await users.insert_one(doc)
+    doc['_id'] = res.inserted_id
+    return doc
+
+async def find_by_email(email):
+    return await users.find_one({'email': email})
+
+async def find_by_id(user_id):
+    return await users.find_one({'_id': ObjectId(user_id)})
+
+async def update_user(user_id, update):
+    await users.update_one({'_id': ObjectId(user_id)}, {'$set': update})
+    return await find_by_id(user_id)
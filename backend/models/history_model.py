@@ -1,17 +1,133 @@
 from utils.db import history
+from utils.history_writer import HistoryWriter
+from pymongo.errors import BulkWriteError
+from models.stats_model import apply_rollups
 from bson.objectid import ObjectId
+from datetime import datetime
+import base64
+import os
 
-def create_history(user_id, input_text, prediction, confidence, image_url=None):
+# Writes are buffered and flushed in the background unless HISTORY_WRITE_BEHIND=0
+HISTORY_WRITE_BEHIND = os.getenv('HISTORY_WRITE_BEHIND', '1') == '1'
+
+history_writer = HistoryWriter(
+    history,
+    max_batch=int(os.getenv('HISTORY_FLUSH_BATCH', 200)),
+    flush_interval=float(os.getenv('HISTORY_FLUSH_INTERVAL_MS', 250)) / 1000.0,
+    max_queue=int(os.getenv('HISTORY_QUEUE_SIZE', 10000)),
+    on_written=apply_rollups,
+) if HISTORY_WRITE_BEHIND else None
+
+def _update_rollups(docs):
+    # The history write already succeeded; a rollup failure must not fail the
+    # request (a retry would store the history twice). backfill_rollups.py repairs it.
+    try:
+        apply_rollups(docs)
+    except Exception as e:
+        print(f'History rollup update failed for {len(docs)} documents: {str(e)}')
+
+def _history_doc(user_id, input_text, prediction, confidence, image_url=None, created_at=None, embedding=None,
+                 model_version=None, doc_id=None):
     doc = {
+        '_id': doc_id or ObjectId(),
         'userId': ObjectId(user_id),
         'inputText': input_text,
         'prediction': prediction,
         'confidence': float(confidence),
         'imageUrl': image_url,
-        'createdAt': __import__('datetime').datetime.utcnow()
+        'modelVersion': model_version,
+        'createdAt': created_at or datetime.utcnow()
     }
-    res = history.insert_one(doc)
-    return history.find_one({'_id': res.inserted_id})
+    if embedding is not None:
+        # float16 pooled output, indexed for /similar by utils.vector_index
+        doc['embedding'] = embedding
+    return doc
+
+def create_history(user_id, input_text, prediction, confidence, image_url=None, embedding=None, model_version=None):
+    doc = _history_doc(user_id, input_text, prediction, confidence, image_url, embedding=embedding, model_version=model_version)
+    if history_writer is not None:
+        return history_writer.submit(doc)
+    history.insert_one(doc)
+    _update_rollups([doc])
+    return doc
 
 def get_history_for_user(user_id):
     return list(history.find({'userId': ObjectId(user_id)}).sort('createdAt', -1))
+
+def create_history_many(user_id, items):
+    now = datetime.utcnow()
+    docs = [_history_doc(user_id, item['input_text'], item['prediction'], item['confidence'],
+                         item.get('image_url'), now, model_version=item.get('model_version')) for item in items]
+    if not docs:
+        return []
+    if history_writer is not None:
+        for doc in docs:
+            history_writer.submit(doc)
+    else:
+        history.insert_many(docs, ordered=True)
+        _update_rollups(docs)
+    return [doc['_id'] for doc in docs]
+
+def create_history_once(user_id, items):
+    # Items carry a deterministic '_id'; ones already stored (by an interrupted
+    # run being resumed) are skipped and not counted again. Always synchronous.
+    now = datetime.utcnow()
+    docs = [_history_doc(user_id, item['input_text'], item['prediction'], item['confidence'],
+                         item.get('image_url'), now, model_version=item.get('model_version'), doc_id=item['_id'])
+            for item in items]
+    if not docs:
+        return []
+    try:
+        history.insert_many(docs, ordered=False)
+        stored = docs
+    except BulkWriteError as e:
+        errors = e.details.get('writeErrors', [])
+        if any(err.get('code') != 11000 for err in errors):
+            raise
+        duplicates = {err['index'] for err in errors}
+        stored = [doc for i, doc in enumerate(docs) if i not in duplicates]
+    _update_rollups(stored)
+    return [doc['_id'] for doc in docs]
+
+HISTORY_PAGE_MAX = 100
+HISTORY_PREVIEW_CHARS = 200
+
+# List views never load the full article; they get a short preview computed by Mongo
+LIST_PROJECTION = {
+    'userId': 1, 'prediction': 1, 'confidence': 1, 'imageUrl': 1, 'modelVersion': 1, 'createdAt': 1,
+    'textPreview': {'$substrCP': ['$inputText', 0, HISTORY_PREVIEW_CHARS]},
+}
+
+FULL_PROJECTION = {'embedding': 0}
+
+def encode_cursor(doc):
+    raw = f"{doc['createdAt'].isoformat()}|{doc['_id']}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor):
+    raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+    created_at, oid = raw.split('|', 1)
+    return datetime.fromisoformat(created_at), ObjectId(oid)
+
+def get_history_page(user_id, limit=20, cursor=None, full=False):
+    # Keyset pagination on (userId, createdAt, _id), served by the compound index
+    # from utils.db.ensure_indexes. Returns (items, next_cursor).
+    limit = max(1, min(int(limit), HISTORY_PAGE_MAX))
+    query = {'userId': ObjectId(user_id)}
+    if cursor:
+        created_at, oid = decode_cursor(cursor)
+        query['$or'] = [
+            {'createdAt': {'$lt': created_at}},
+            {'createdAt': created_at, '_id': {'$lt': oid}},
+        ]
+    projection = FULL_PROJECTION if full else LIST_PROJECTION
+    items = list(history.find(query, projection).sort([('createdAt', -1), ('_id', -1)]).limit(limit + 1))
+    next_cursor = encode_cursor(items[limit - 1]) if len(items) > limit else None
+    return items[:limit], next_cursor
+
+def get_history_item(user_id, history_id):
+    return history.find_one({'_id': ObjectId(history_id), 'userId': ObjectId(user_id)})
+
+def get_history_items(user_id, history_ids):
+    docs = history.find({'_id': {'$in': [ObjectId(i) for i in history_ids]}, 'userId': ObjectId(user_id)}, LIST_PROJECTION)
+    return {doc['_id']: doc for doc in docs}
@@ -0,0 +1,30 @@
+from utils.db import jobs
+from bson.objectid import ObjectId
+from bson.errors import InvalidId
+
+def create_job(user_id, kind):
+    doc = {
+        'userId': ObjectId(user_id),
+        'kind': kind,
+        'status': 'pending',
+        'result': None,
+        'error': None,
+        'createdAt': __import__('datetime').datetime.utcnow(),
+        'finishedAt': None
+    }
+    res = jobs.insert_one(doc)
+    return res.inserted_id
+
+def finish_job(job_id, result=None, error=None):
+    jobs.update_one({'_id': ObjectId(job_id)}, {'$set': {
+        'status': 'failed' if error else 'done',
+        'result': result,
+        'error': error,
+        'finishedAt': __import__('datetime').datetime.utcnow()
+    }})
+
+def find_job(job_id, user_id):
+    try:
+        return jobs.find_one({'_id': ObjectId(job_id), 'userId': ObjectId(user_id)})
+    except InvalidId:
+        return None
@@ -0,0 +1,69 @@
+from utils.db import history_rollups
+from pymongo import UpdateOne
+from bson.objectid import ObjectId
+from datetime import datetime, timedelta
+
+# One rollup document per user per UTC day, plus one per user with day 'all',
+# kept current with $inc as history documents are written. Dashboards read a
+# bounded number of them instead of scanning history.
+TOTAL_DAY = 'all'
+STATS_DEFAULT_DAYS = 30
+STATS_MAX_DAYS = 366
+
+def rollup_id(user_id, day):
+    return f'{user_id}:{day}'
+
+def rollup_ops(docs):
+    # Aggregates history documents into one $inc upsert per (user, day)
+    rollups = {}
+    for doc in docs:
+        day = doc['createdAt'].strftime('%Y-%m-%d')
+        for key in (day, TOTAL_DAY):
+            r = rollups.setdefault((doc['userId'], key), {'inc': {}, 'first': doc['createdAt'], 'last': doc['createdAt']})
+            inc = r['inc']
+            inc['count'] = inc.get('count', 0) + 1
+            inc[f"labels.{doc['prediction']}"] = inc.get(f"labels.{doc['prediction']}", 0) + 1
+            inc['confidenceSum'] = inc.get('confidenceSum', 0.0) + float(doc['confidence'])
+            if doc.get('imageUrl'):
+                inc['images'] = inc.get('images', 0) + 1
+            r['first'] = min(r['first'], doc['createdAt'])
+            r['last'] = max(r['last'], doc['createdAt'])
+    return [UpdateOne({'_id': rollup_id(user_id, day)},
+                      {'$inc': r['inc'], '$min': {'firstAt': r['first']}, '$max': {'lastAt': r['last']},
+                       '$setOnInsert': {'userId': user_id, 'day': day}}, upsert=True)
+            for (user_id, day), r in rollups.items()]
+
+def apply_rollups(docs, collection=None):
+    ops = rollup_ops(docs)
+    if ops:
+        (collection if collection is not None else history_rollups).bulk_write(ops, ordered=False)
+
+def stats_window(days):
+    days = max(1, min(int(days), STATS_MAX_DAYS))
+    today = datetime.utcnow().date()
+    return [(today - timedelta(days=n)).strftime('%Y-%m-%d') for n in range(days - 1, -1, -1)]
+
+def _summary(doc):
+    doc = doc or {}
+    count = doc.get('count', 0)
+    return {
+        'count': count,
+        'labels': doc.get('labels', {}),
+        'avgConfidence': doc.get('confidenceSum', 0.0) / count if count else None,
+        'images': doc.get('images', 0),
+    }
+
+def stats_body(total, daily, window):
+    # daily: rollup documents for days in window; missing days count zero
+    by_day = {doc['day']: doc for doc in daily}
+    return {
+        'total': {**_summary(total), 'firstAt': (total or {}).get('firstAt'), 'lastAt': (total or {}).get('lastAt')},
+        'daily': [{'day': day, **_summary(by_day.get(day))} for day in window],
+    }
+
+def get_stats(user_id, days=STATS_DEFAULT_DAYS):
+    window = stats_window(days)
+    uid = ObjectId(user_id)
+    total = history_rollups.find_one({'_id': rollup_id(uid, TOTAL_DAY)})
+    daily = history_rollups.find({'userId': uid, 'day': {'$gte': window[0], '$lte': window[-1]}})
+    return stats_body(total, list(daily), window)
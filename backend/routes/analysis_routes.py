@@ -1,7 +1,6 @@
 from flask import Blueprint, request, jsonify
 from models.history_model import create_history
-from utils.jwt_helper import verify_token
-from functools import wraps
+from utils.jwt_helper import token_required
 import os
 
 bp = Blueprint('analysis', __name__)
@@ -16,7 +15,7 @@ import os
 # Prefer a locally fine-tuned model directory. If present, load from disk to avoid
 # downloading from the Hub. Otherwise fall back to the Hub model name below.
 # Note: bert-base-uncased is a base model (~110M params); for better accuracy, fine-tune it on your data using bert_finetune.py
-LOCAL_MODEL_DIR = "E:/mp/fine_tuned_bert"  # Hardcoded path to our fine-tuned model
+LOCAL_MODEL_DIR = os.getenv('MODEL_DIR') or os.path.join(os.path.dirname(__file__), '..', '..', 'fine_tuned_bert')
 
 # Resolve real local path (normalize)
 LOCAL_MODEL_DIR = os.path.normpath(LOCAL_MODEL_DIR)
@@ -55,30 +54,6 @@ def get_model_and_tokenizer():
         model.eval()
     return tokenizer, model
 
-def token_required(f):
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        print("DEBUG: token_required called")
-        auth = request.headers.get('Authorization', None)
-        if not auth:
-            print("DEBUG: No Authorization header")
-            return jsonify({'message':'Token missing'}), 401
-        parts = auth.split()
-        if parts[0].lower() != 'bearer' or len(parts) != 2:
-            print("DEBUG: Invalid token format")
-            return jsonify({'message':'Invalid token format'}), 401
-        token = parts[1]
-        print(f"DEBUG: Verifying token: {token[:20]}...")
-        payload = verify_token(token)
-        if not payload:
-            print("DEBUG: Token verification failed")
-            return jsonify({'message':'Invalid or expired token'}), 401
-        request.user = payload['sub']
-        print(f"DEBUG: Token valid, user: {request.user}")
-        return f(*args, **kwargs)
-    return decorated
-
-
 @bp.route('/analyzeText', methods=['POST'])
 @token_required
 def analyze_text():
@@ -1,14 +1,12 @@
 from flask import Blueprint, request, jsonify
 from models.user_model import create_user, find_by_email
-import bcrypt
-from utils.jwt_helper import generate_token
+from utils.password_hasher import hash_password
 
 auth_bp = Blueprint('auth_routes', __name__)
 
 
 @auth_bp.route('/signup', methods=['POST'])
 def signup():
-    print("DEBUG: signup route called")
     data = request.json
     name = data.get('name')
     email = data.get('email')
@@ -17,7 +15,7 @@ def signup():
         return jsonify({'message':'Missing fields'}), 400
     if find_by_email(email):
         return jsonify({'message':'Email already exists'}), 400
-    pw_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+    pw_hash = hash_password(password)
     user = create_user(name, email, pw_hash)
     return jsonify({'message':'User created', 'user': {'id': str(user['_id']), 'name': user['name'], 'email': user['email']}}), 201
 
@@ -1,29 +1,11 @@
 from flask import Blueprint, request, jsonify
-from models.user_model import find_by_id, update_user, find_by_email
+from models.user_model import find_by_id, update_user
 from models.history_model import get_history_for_user
-from utils.jwt_helper import verify_token
-from functools import wraps
-from bson.objectid import ObjectId
+from utils.jwt_helper import token_required
+from utils.password_hasher import hash_password
 
 bp = Blueprint('user', __name__)
 
-def token_required(f):
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        auth = request.headers.get('Authorization', None)
-        if not auth:
-            return jsonify({'message':'Token missing'}), 401
-        parts = auth.split()
-        if parts[0].lower() != 'bearer' or len(parts) != 2:
-            return jsonify({'message':'Invalid token format'}), 401
-        token = parts[1]
-        payload = verify_token(token)
-        if not payload:
-            return jsonify({'message':'Invalid or expired token'}), 401
-        request.user = payload['sub']
-        return f(*args, **kwargs)
-    return decorated
-
 
 @bp.route('/profile', methods=['GET'])
 @token_required
@@ -42,8 +24,7 @@ def profile_update():
     if 'name' in data:
         update['name'] = data['name']
     if 'password' in data and data['password']:
-        import bcrypt
-        update['password'] = bcrypt.hashpw(data['password'].encode('utf-8'), bcrypt.gensalt())
+        update['password'] = hash_password(data['password'])
     user = update_user(request.user, update)
     return jsonify({'user': {'id': str(user['_id']), 'name': user['name'], 'email': user['email']}})
 
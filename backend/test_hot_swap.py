@@ -0,0 +1,71 @@
+# Hot-swap while a request is in flight: a result computed by the old model
+# and stored after the swap must not be served as the new model's verdict.
+# Run from backend/: python test_hot_swap.py (or pytest test_hot_swap.py)
+import threading
+
+from utils.prediction_cache import PredictionCache
+from utils.near_duplicates import NearDuplicateIndex
+
+ARTICLE = ('The city council voted on Tuesday to approve a new budget that increases funding for public '
+           'transport, road repairs and local schools, while officials said property taxes would stay the same.')
+
+
+class Serving:
+    # Stands in for app.model_bundle: the version requests read when they start
+
+    def __init__(self):
+        self.version = 'v1'
+
+    def swap(self, version, *components):
+        # Mirrors app.swap_model: replace the bundle, then force a version check
+        self.version = version
+        for component in components:
+            component.version(force=True)
+
+
+def in_flight(serving, store, swapped):
+    # A request: reads its model version, runs, and stores after the swap happened
+    started = threading.Event()
+    def request():
+        version = serving.version
+        started.set()
+        swapped.wait(5)
+        store(version)
+    thread = threading.Thread(target=request)
+    thread.start()
+    started.wait(5)
+    return thread
+
+
+def test_prediction_cache_skips_result_of_swapped_out_model():
+    serving = Serving()
+    cache = PredictionCache(lambda: serving.version)
+    cache.set(ARTICLE, [0.9, 0.1], version='v1')
+    swapped = threading.Event()
+    thread = in_flight(serving, lambda version: cache.set(ARTICLE, [0.8, 0.2], version=version), swapped)
+    serving.swap('v2', cache)
+    swapped.set()
+    thread.join(5)
+    assert cache.get(ARTICLE) is None
+    assert cache.stats()['stale'] == 1
+    cache.set(ARTICLE, [0.3, 0.7], version='v2')
+    assert cache.get(ARTICLE) == [0.3, 0.7]
+
+
+def test_near_duplicate_index_skips_verdict_of_swapped_out_model():
+    serving = Serving()
+    index = NearDuplicateIndex(lambda: serving.version, min_words=5)
+    signature = index.signature(ARTICLE)
+    swapped = threading.Event()
+    thread = in_flight(serving, lambda version: index.add('h1', signature, ([0.8, 0.2], 'u1'), version=version), swapped)
+    serving.swap('v2', index)
+    swapped.set()
+    thread.join(5)
+    assert index.query(index.signature(ARTICLE.replace('Tuesday', 'Wednesday'))) is None
+    assert index.stats()['stale'] == 1
+
+
+if __name__ == '__main__':
+    test_prediction_cache_skips_result_of_swapped_out_model()
+    test_near_duplicate_index_skips_verdict_of_swapped_out_model()
+    print('Hot-swap tests passed')
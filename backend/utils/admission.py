@@ -0,0 +1,176 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+from utils.metrics import timed
+
+# Model work is admitted under a concurrency limit, interactive requests
+# before batch ones. A request that would overflow its class's queue, or
+# that cannot start and finish before its deadline at the measured service
+# rate, is turned away at once instead of waiting behind work it cannot
+# outlast. Limits are per process.
+PRIORITIES = ('interactive', 'batch')
+
+
+class Overloaded(Exception):
+
+    def __init__(self, message, status=503, retry_after=1):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+
+
+class AdmissionController:
+
+    def __init__(self, max_concurrent=32, max_queue=None, max_per_user=8, default_deadlines=None,
+                 initial_request_seconds=0.1, initial_unit_seconds=0.02):
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.max_queue = max_queue or {'interactive': 64, 'batch': 16}
+        self.max_per_user = max_per_user
+        self.default_deadlines = default_deadlines or {'interactive': 10.0, 'batch': 60.0}
+        # Work of cost n (texts) is estimated to take request_seconds + (n - 1) *
+        # unit_seconds: the latency of one text, then the marginal time of each
+        # further text, which runs batched with it. Both are moving averages.
+        self.request_seconds = initial_request_seconds
+        self.unit_seconds = initial_unit_seconds
+        self._cond = threading.Condition()
+        self._running = 0
+        self._running_seconds = 0.0
+        self._waiting = {p: [] for p in PRIORITIES}
+        self._per_user = {}
+        self._events = {}
+        self._local = threading.local()
+
+    @contextmanager
+    def context(self, priority, deadline_ms=None, user=None):
+        # Every slot() this thread takes inside the block is admitted as this
+        # class, by this deadline. A client deadline never extends the class default.
+        if priority not in PRIORITIES:
+            raise ValueError(f'Unknown priority class {priority!r}')
+        budget = self.default_deadlines[priority]
+        if deadline_ms is not None:
+            budget = min(budget, deadline_ms / 1000.0)
+        previous = getattr(self._local, 'request', None)
+        self._local.request = (priority, time.monotonic() + budget, user)
+        try:
+            yield
+        finally:
+            self._local.request = previous
+
+    def estimate(self, cost, max_seconds=None):
+        seconds = self.request_seconds + (cost - 1) * self.unit_seconds
+        return seconds if max_seconds is None else min(seconds, max_seconds)
+
+    @contextmanager
+    def slot(self, cost=1, max_seconds=None):
+        # max_seconds: work that stops itself at a time budget is never
+        # estimated above it, and its cut-short timing is not learned from.
+        # Threads outside any context() (background jobs, tools) count as batch
+        if getattr(self._local, 'held', False):
+            yield
+            return
+        request = getattr(self._local, 'request', None)
+        if request is None:
+            request = ('batch', time.monotonic() + self.default_deadlines['batch'], None)
+        priority, deadline, user = request
+        waiter = self._acquire(priority, deadline, user, max(1, cost), max_seconds)
+        self._local.held = True
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self._local.held = False
+            self._release(waiter, time.monotonic() - start)
+
+    def _count(self, priority, outcome):
+        key = (priority, outcome)
+        self._events[key] = self._events.get(key, 0) + 1
+
+    def _work_ahead(self, priority):
+        ahead = self._running_seconds
+        for p in PRIORITIES[:PRIORITIES.index(priority) + 1]:
+            ahead += sum(w['seconds'] for w in self._waiting[p])
+        return ahead
+
+    def _drain_seconds(self, priority):
+        return self._work_ahead(priority) / self.max_concurrent
+
+    def _may_start(self, priority, waiter):
+        if self._running >= self.max_concurrent or self._waiting[priority][0] is not waiter:
+            return False
+        return not any(self._waiting[p] for p in PRIORITIES[:PRIORITIES.index(priority)])
+
+    def _acquire(self, priority, deadline, user, cost, max_seconds):
+        with self._cond:
+            seconds = self.estimate(cost, max_seconds)
+            if user is not None and self._per_user.get(user, 0) >= self.max_per_user:
+                self._count(priority, 'user_limit')
+                raise Overloaded('Too many requests in progress for this user', 429, seconds)
+            queue = self._waiting[priority]
+            if len(queue) >= self.max_queue[priority]:
+                self._count(priority, 'queue_full')
+                raise Overloaded('Server is busy, try again shortly', 503, self._drain_seconds(priority))
+            start_in = 0.0 if self._running < self.max_concurrent and not queue else self._drain_seconds(priority)
+            if time.monotonic() + start_in + seconds > deadline:
+                self._count(priority, 'deadline')
+                raise Overloaded('Request cannot be served before its deadline', 503, start_in)
+
+            waiter = {'cost': cost, 'seconds': seconds, 'learn': max_seconds is None, 'user': user}
+            queue.append(waiter)
+            if user is not None:
+                self._per_user[user] = self._per_user.get(user, 0) + 1
+            try:
+                with timed('admission_wait'):
+                    while not self._may_start(priority, waiter):
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._count(priority, 'expired')
+                            raise Overloaded('Deadline passed while queued', 503, self._drain_seconds(priority))
+                        self._cond.wait(remaining)
+            except BaseException:
+                queue.remove(waiter)
+                self._forget_user(user)
+                self._cond.notify_all()
+                raise
+            queue.pop(0)
+            self._running += 1
+            self._running_seconds += seconds
+            self._count(priority, 'admitted')
+            return waiter
+
+    def _forget_user(self, user):
+        if user is None:
+            return
+        left = self._per_user.get(user, 1) - 1
+        if left > 0:
+            self._per_user[user] = left
+        else:
+            self._per_user.pop(user, None)
+
+    def _release(self, waiter, elapsed):
+        with self._cond:
+            self._running -= 1
+            self._running_seconds -= waiter['seconds']
+            self._forget_user(waiter['user'])
+            if waiter['learn']:
+                self._learn(waiter['cost'], elapsed)
+            self._cond.notify_all()
+
+    def _learn(self, cost, elapsed):
+        if cost == 1:
+            self.request_seconds = 0.8 * self.request_seconds + 0.2 * elapsed
+        else:
+            marginal = max(0.0, elapsed - self.request_seconds) / (cost - 1)
+            self.unit_seconds = 0.8 * self.unit_seconds + 0.2 * marginal
+
+    def stats(self):
+        with self._cond:
+            return {
+                'running': self._running,
+                'maxConcurrent': self.max_concurrent,
+                'queued': {p: len(q) for p, q in self._waiting.items()},
+                'requestMs': self.request_seconds * 1000.0,
+                'unitMs': self.unit_seconds * 1000.0,
+                'events': [{'priority': p, 'outcome': o, 'count': n} for (p, o), n in self._events.items()],
+            }
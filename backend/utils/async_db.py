@@ -0,0 +1,16 @@
+from motor.motor_asyncio import AsyncIOMotorClient
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/ai_fake_news')
+
+# Non-blocking counterpart of utils/db.py for the ASGI app
+client = AsyncIOMotorClient(MONGO_URI)
+db = client.get_default_database()
+
+users = db.get_collection('users')
+history = db.get_collection('history')
+jobs = db.get_collection('jobs')
+history_rollups = db.get_collection('history_rollups')
@@ -0,0 +1,79 @@
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    # Collects single-text requests from many handler threads and runs them
+    # through predict_fn as one padded batch. predict_fn takes a list of texts
+    # and returns one result per text, in order.
+
+    def __init__(self, predict_fn, max_batch_size=16, max_wait_ms=5):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._pending = []
+        self._cond = threading.Condition()
+        self._thread = None
+        self._pid = None
+
+    def _ensure_started(self):
+        # The worker thread does not survive a fork, so restart it per process
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._cond:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                self._pending = []
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+            self._thread.start()
+
+    def submit(self, text):
+        self._ensure_started()
+        fut = Future()
+        with self._cond:
+            self._pending.append((text, fut, time.monotonic()))
+            self._cond.notify()
+        return fut
+
+    def predict(self, text, timeout=None):
+        return self.submit(text).result(timeout=timeout)
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            deadline = self._pending[0][2] + self.max_wait
+            while len(self._pending) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = self._pending[:self.max_batch_size]
+            self._pending = self._pending[self.max_batch_size:]
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            live = [(text, fut) for text, fut, _ in batch if fut.set_running_or_notify_cancel()]
+            if not live:
+                continue
+            texts = [text for text, _ in live]
+            futures = [fut for _, fut in live]
+            try:
+                results = self.predict_fn(texts)
+                for fut, res in zip(futures, results):
+                    fut.set_result(res)
+            except Exception as e:
+                for fut in futures:
+                    fut.set_exception(e)
+
+
+def bucket_by_length(lengths, max_batch_size):
+    # Group indices of similar length so each padded batch wastes little on pad tokens
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    return [order[i:i + max_batch_size] for i in range(0, len(order), max_batch_size)]
@@ -0,0 +1,31 @@
+AGGREGATIONS = ('mean', 'max', 'attention')
+
+
+def window_inputs(tokenizer, text, max_length=512, stride=128):
+    # Split text into overlapping windows of at most max_length tokens, sharing
+    # `stride` tokens with the previous window. All windows come back padded
+    # into one tensor batch so they can run in a single forward pass.
+    inputs = tokenizer(text, truncation=True, max_length=max_length, stride=stride,
+                       return_overflowing_tokens=True, padding=True, return_tensors='pt')
+    inputs.pop('overflow_to_sample_mapping', None)
+    return inputs
+
+
+def aggregate_logits(logits, rule='mean'):
+    # logits: (windows, labels). Returns (combined probs, per-window probs).
+    if rule not in AGGREGATIONS:
+        raise ValueError(f'Unknown aggregation {rule!r}, expected one of {AGGREGATIONS}')
+    import torch.nn.functional as F
+    window_probs = F.softmax(logits, dim=-1)
+    if rule == 'mean':
+        combined = F.softmax(logits.mean(dim=0), dim=-1)
+    elif rule == 'max':
+        combined = window_probs[window_probs.max(dim=-1).values.argmax()]
+    else:
+        # Windows attend by their decision margin: clear-cut windows dominate,
+        # ambiguous boilerplate windows contribute little.
+        top2 = logits.topk(min(2, logits.size(-1)), dim=-1).values
+        margin = top2[:, 0] - top2[:, -1]
+        weights = F.softmax(margin, dim=0)
+        combined = F.softmax((weights.unsqueeze(-1) * logits).sum(dim=0), dim=-1)
+    return combined.tolist(), window_probs.tolist()
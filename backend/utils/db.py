@@ -6,9 +6,29 @@ load_dotenv()
 
 MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/ai_fake_news')
 
-client = MongoClient(MONGO_URI)
+if MONGO_URI.startswith('mongomock://'):
+    # In-memory stand-in for offline benchmarks: mongomock://<database name>
+    try:
+        import mongomock
+    except ImportError:
+        raise Exception('MONGO_URI=mongomock:// requires mongomock (pip install mongomock)')
+    client = mongomock.MongoClient(MONGO_URI.replace('mongomock://', 'mongodb://localhost/', 1))
+else:
+    client = MongoClient(MONGO_URI)
 db = client.get_default_database() if client else None
 
 # Ensure collections
 users = db.get_collection('users')
 history = db.get_collection('history')
+prediction_cache = db.get_collection('prediction_cache')
+jobs = db.get_collection('jobs')
+history_rollups = db.get_collection('history_rollups')
+
+PREDICTION_CACHE_TTL = int(os.getenv('PREDICTION_CACHE_TTL', 3600))
+JOB_TTL = int(os.getenv('JOB_TTL', 86400))
+
+def ensure_indexes():
+    history.create_index([('userId', 1), ('createdAt', -1), ('_id', -1)])
+    prediction_cache.create_index('createdAt', expireAfterSeconds=PREDICTION_CACHE_TTL)
+    jobs.create_index('createdAt', expireAfterSeconds=JOB_TTL)
+    history_rollups.create_index([('userId', 1), ('day', 1)])
@@ -0,0 +1,103 @@
+import json
+import os
+from types import SimpleNamespace
+
+# Exit heads are trained by `bert_finetune.py --early_exit` and saved next to
+# the model as early_exit.json (layers, sizes) and early_exit.safetensors.
+# Layers are numbered from 1; the model's own classifier is layer N.
+EXIT_CONFIG = 'early_exit.json'
+EXIT_WEIGHTS = 'early_exit.safetensors'
+# Not part of the backbone: they never invalidate its serving artifact
+EXIT_HEAD_FILES = (EXIT_CONFIG, EXIT_WEIGHTS)
+
+
+def exit_head(hidden_size, num_labels):
+    # Same shape as BERT's pooler + classifier; bert_finetune.py builds it identically
+    import torch
+    return torch.nn.Sequential(
+        torch.nn.Linear(hidden_size, hidden_size),
+        torch.nn.Tanh(),
+        torch.nn.Linear(hidden_size, num_labels),
+    )
+
+
+def load_exit_heads(model_dir):
+    # {layer: head} or None when the model was not trained with exit heads
+    config_path = os.path.join(model_dir, EXIT_CONFIG)
+    if not os.path.exists(config_path):
+        return None
+    from safetensors.torch import load_file
+    with open(config_path) as f:
+        config = json.load(f)
+    state = load_file(os.path.join(model_dir, EXIT_WEIGHTS))
+    heads = {}
+    for layer in config['layers']:
+        head = exit_head(config['hidden_size'], config['num_labels'])
+        prefix = f'{layer}.'
+        head.load_state_dict({k[len(prefix):]: v for k, v in state.items() if k.startswith(prefix)})
+        heads[int(layer)] = head.eval()
+    return heads
+
+
+class EarlyExitClassifier:
+    # Drop-in for a BERT sequence classifier at inference time. Runs the encoder
+    # one layer at a time; after each layer with a head, texts whose top
+    # probability reaches threshold take that head's logits and leave the
+    # batch. The rest go on to the model's own classifier. The output carries
+    # exit_layers, one per text. No pooled output is exposed, so embeddings
+    # are not captured in this mode.
+
+    def __init__(self, model, heads, threshold):
+        self.model = model
+        self.heads = heads
+        self.threshold = threshold
+        self.config = model.config
+
+    def eval(self):
+        self.model.eval()
+        return self
+
+    def __call__(self, input_ids, attention_mask=None, token_type_ids=None, **kwargs):
+        import torch
+        bert = self.model.base_model
+        if attention_mask is None:
+            attention_mask = torch.ones_like(input_ids)
+        hidden = bert.embeddings(input_ids=input_ids, token_type_ids=token_type_ids)
+        mask = bert.get_extended_attention_mask(attention_mask, input_ids.shape)
+        layers = bert.encoder.layer
+        n = input_ids.size(0)
+        logits = hidden.new_zeros((n, self.config.num_labels))
+        exit_layers = [len(layers)] * n
+        active = torch.arange(n)
+        for i, layer in enumerate(layers[:-1], start=1):
+            out = layer(hidden, attention_mask=mask)
+            hidden = out[0] if isinstance(out, tuple) else out
+            head = self.heads.get(i)
+            if head is None:
+                continue
+            head_logits = head(hidden[:, 0])
+            done = torch.softmax(head_logits, dim=-1).max(dim=-1).values >= self.threshold
+            if not done.any():
+                continue
+            logits[active[done]] = head_logits[done]
+            for j in active[done].tolist():
+                exit_layers[j] = i
+            keep = ~done
+            if not keep.any():
+                return SimpleNamespace(logits=logits, exit_layers=exit_layers)
+            active, hidden, mask = active[keep], hidden[keep], mask[keep]
+        out = layers[-1](hidden, attention_mask=mask)
+        hidden = out[0] if isinstance(out, tuple) else out
+        logits[active] = self.model.classifier(self.model.dropout(bert.pooler(hidden)))
+        return SimpleNamespace(logits=logits, exit_layers=exit_layers)
+
+
+def apply_early_exit(model, model_dir, threshold):
+    if getattr(model, 'base_model', None) is None or not hasattr(model.base_model, 'encoder'):
+        print('Early exit needs a PyTorch BERT model; serving the full model')
+        return model
+    heads = load_exit_heads(model_dir)
+    if heads is None:
+        print(f'No exit heads in {model_dir} (train them with bert_finetune.py --early_exit); serving the full model')
+        return model
+    return EarlyExitClassifier(model, heads, threshold)
@@ -0,0 +1,76 @@
+import math
+import time
+
+# Occlusion attribution: each run of consecutive words is replaced by [MASK]
+# and the drop in the predicted class's probability is that phrase's score
+# (negative when hiding it makes the verdict more certain). Every perturbed
+# input has the same length as the original, so they stack into a few full
+# batches without padding. At most max_inputs perturbations are made; longer
+# texts are occluded in proportionally longer phrases.
+
+
+def words_of(encoding):
+    # [(first token, last token + 1, char start, char end)] per word of a fast-tokenizer encoding
+    words = []
+    for i, (word_id, (start, end)) in enumerate(zip(encoding.word_ids, encoding.offsets)):
+        if word_id is None:
+            continue
+        if words and words[-1][4] == word_id:
+            first, _, word_start, _, _ = words[-1]
+            words[-1] = (first, i + 1, word_start, end, word_id)
+        else:
+            words.append((i, i + 1, start, end, word_id))
+    return [w[:4] for w in words]
+
+
+def occlusion_spans(n_words, max_inputs):
+    span = max(1, math.ceil(n_words / max(1, max_inputs)))
+    return span, [(i, min(i + span, n_words)) for i in range(0, n_words, span)]
+
+
+def explain_text(model, tokenizer, text, max_inputs=127, batch_size=32, max_seconds=None, max_length=512):
+    # Returns the explanation dict; scores of phrases left when max_seconds ran
+    # out are None and 'complete' is False. batch_size=1 gives the unbatched baseline.
+    import torch
+    if not getattr(tokenizer, 'is_fast', False):
+        raise ValueError('Explanations need a fast tokenizer')
+    start_time = time.perf_counter()
+    inputs = tokenizer([text], truncation=True, max_length=max_length, return_tensors='pt')
+    encoding = inputs.encodings[0]
+    words = words_of(encoding)
+    span, spans = occlusion_spans(len(words), max_inputs)
+
+    ids = inputs['input_ids'][0]
+    mask_id = tokenizer.mask_token_id if tokenizer.mask_token_id is not None else tokenizer.unk_token_id
+    batch = ids.repeat(len(spans) + 1, 1)
+    for row, (first_word, last_word) in enumerate(spans, start=1):
+        batch[row, words[first_word][0]:words[last_word - 1][1]] = mask_id
+    extra = {k: v.expand(batch.size(0), -1) for k, v in inputs.items() if k != 'input_ids'}
+
+    probs = []
+    passes = 0
+    with torch.no_grad():
+        for i in range(0, batch.size(0), batch_size):
+            if passes and max_seconds is not None and time.perf_counter() - start_time >= max_seconds:
+                break
+            chunk = {'input_ids': batch[i:i + batch_size], **{k: v[i:i + batch_size] for k, v in extra.items()}}
+            probs.extend(torch.softmax(model(**chunk).logits, dim=-1).tolist())
+            passes += 1
+
+    base = probs[0]
+    target = max(range(len(base)), key=base.__getitem__)
+    scores = [None] * len(words)
+    for (first_word, last_word), p in zip(spans, probs[1:]):
+        for w in range(first_word, last_word):
+            scores[w] = base[target] - p[target]
+    return {
+        'probs': base,
+        'target': target,
+        'tokens': [{'text': text[s:e], 'start': s, 'end': e, 'score': score}
+                   for (_, _, s, e), score in zip(words, scores)],
+        'spanWords': span,
+        'passes': passes,
+        'inputs': len(probs),
+        'complete': len(probs) == batch.size(0),
+        'truncated': bool(encoding.overflowing),
+    }
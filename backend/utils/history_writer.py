@@ -0,0 +1,136 @@
+import os
+import queue
+import threading
+import time
+
+
+class HistoryWriter:
+    # Write-behind buffer for history documents. Callers get their document back
+    # immediately (with a client-generated _id); a background thread sends the
+    # queue to Mongo with insert_many, flushing when max_batch documents are
+    # waiting or flush_interval seconds have passed, whichever comes first.
+    # A full queue blocks the caller for up to put_timeout seconds, then the
+    # document is written synchronously so nothing is dropped. on_written, if
+    # given, is called with every list of documents once it is stored.
+
+    def __init__(self, collection, max_batch=200, flush_interval=0.25, max_queue=10000, put_timeout=0.5, retries=3,
+                 on_written=None):
+        self.collection = collection
+        self.on_written = on_written
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.retries = retries
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._pid = None
+        self.counters = {'enqueued': 0, 'written': 0, 'batches': 0, 'sync_writes': 0, 'failed': 0,
+                         'last_flush_ms': 0.0, 'max_flush_ms': 0.0, 'total_flush_ms': 0.0}
+
+    def _ensure_started(self):
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            if self._pid is not None and self._pid != os.getpid():
+                # Documents queued in the parent are the parent's to flush
+                self._queue = queue.Queue(maxsize=self._queue.maxsize)
+            self._pid = os.getpid()
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='history-writer', daemon=True)
+            self._thread.start()
+
+    def submit(self, doc):
+        self._ensure_started()
+        try:
+            self._queue.put(doc, timeout=self.put_timeout)
+        except queue.Full:
+            self.collection.insert_one(doc)
+            with self._lock:
+                self.counters['sync_writes'] += 1
+            self._notify([doc])
+            return doc
+        with self._lock:
+            self.counters['enqueued'] += 1
+        return doc
+
+    def _take_batch(self):
+        try:
+            first = self._queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=max(0.0, remaining)) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _notify(self, docs):
+        if self.on_written is None:
+            return
+        try:
+            self.on_written(docs)
+        except Exception as e:
+            print(f'History on_written hook failed for {len(docs)} documents: {str(e)}')
+
+    def _write(self, batch):
+        start = time.perf_counter()
+        pending = batch
+        for attempt in range(self.retries):
+            try:
+                self.collection.insert_many(pending, ordered=False)
+                pending = []
+            except Exception as e:
+                # An unordered bulk insert stores every document without a write
+                # error; duplicate keys are documents an earlier attempt stored.
+                # Anything else (including errors without details) is retried.
+                errors = (getattr(e, 'details', None) or {}).get('writeErrors')
+                if errors is not None:
+                    failed = {err['index'] for err in errors if err.get('code') != 11000}
+                    pending = [doc for i, doc in enumerate(pending) if i in failed]
+                if pending and attempt == self.retries - 1:
+                    print(f'History write-behind dropped {len(pending)} documents: {str(e)}')
+            if not pending:
+                break
+            if attempt < self.retries - 1:
+                time.sleep(0.1 * (2 ** attempt))
+        dropped = {id(doc) for doc in pending}
+        written = [doc for doc in batch if id(doc) not in dropped]
+        elapsed = (time.perf_counter() - start) * 1000.0
+        with self._lock:
+            self.counters['failed'] += len(pending)
+            self.counters['written'] += len(written)
+            self.counters['batches'] += 1
+            self.counters['last_flush_ms'] = elapsed
+            self.counters['max_flush_ms'] = max(self.counters['max_flush_ms'], elapsed)
+            self.counters['total_flush_ms'] += elapsed
+        if written:
+            self._notify(written)
+
+    def _run(self):
+        while not (self._stopping.is_set() and self._queue.empty()):
+            batch = self._take_batch()
+            if batch:
+                self._write(batch)
+
+    def close(self, timeout=10.0):
+        # Flush everything still queued; called on graceful shutdown
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+        stats['queue_depth'] = self._queue.qsize()
+        stats['queue_capacity'] = self._queue.maxsize
+        stats['avg_flush_ms'] = stats['total_flush_ms'] / stats['batches'] if stats['batches'] else 0.0
+        return stats
@@ -0,0 +1,88 @@
+import os
+from types import SimpleNamespace
+
+BACKENDS = ('pytorch', 'int8', 'onnx')
+
+
+def quantize_dynamic_int8(model):
+    # Linear layers hold nearly all BERT weights; int8 dynamic quantization keeps
+    # activations in fp32 and needs no calibration data.
+    import torch
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def export_onnx(model, tokenizer, onnx_path, opset=14):
+    import torch
+    os.makedirs(os.path.dirname(onnx_path), exist_ok=True)
+    sample = tokenizer(['export sample'], return_tensors='pt')
+    input_names = [k for k in ('input_ids', 'attention_mask', 'token_type_ids') if k in sample]
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names}
+    dynamic_axes['logits'] = {0: 'batch'}
+    model.eval()
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[k] for k in input_names),
+            onnx_path,
+            input_names=input_names,
+            output_names=['logits'],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+        )
+    return onnx_path
+
+
+class OnnxSequenceClassifier:
+    # Drop-in for AutoModelForSequenceClassification at inference time:
+    # takes the tokenizer's tensors and returns an object with .logits.
+
+    def __init__(self, onnx_path, config, num_threads=None):
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise Exception('INFERENCE_BACKEND=onnx requires onnxruntime (pip install onnxruntime)')
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(onnx_path, options, providers=['CPUExecutionProvider'])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+        self.config = config
+
+    def eval(self):
+        return self
+
+    def __call__(self, **inputs):
+        import numpy as np
+        import torch
+        feeds = {}
+        for name in self.input_names:
+            value = inputs[name]
+            feeds[name] = value.cpu().numpy().astype(np.int64) if hasattr(value, 'cpu') else np.asarray(value, dtype=np.int64)
+        logits = self.session.run(['logits'], feeds)[0]
+        return SimpleNamespace(logits=torch.from_numpy(logits))
+
+
+def _needs_export(onnx_path, model_dir):
+    # Re-export when the fine-tuned weights are newer than the ONNX graph
+    if not os.path.exists(onnx_path):
+        return True
+    if not os.path.isdir(model_dir):
+        return False
+    newest = max((os.path.getmtime(os.path.join(model_dir, f)) for f in os.listdir(model_dir)
+                  if os.path.isfile(os.path.join(model_dir, f))), default=0)
+    return os.path.getmtime(onnx_path) < newest
+
+
+def apply_backend(backend, model, tokenizer, model_dir):
+    if backend not in BACKENDS:
+        raise Exception(f'Unknown INFERENCE_BACKEND {backend!r}, expected one of {BACKENDS}')
+    if backend == 'int8':
+        return quantize_dynamic_int8(model)
+    if backend == 'onnx':
+        onnx_path = os.getenv('ONNX_MODEL_PATH') or os.path.join(model_dir, 'onnx', 'model.onnx')
+        if _needs_export(onnx_path, model_dir):
+            export_onnx(model, tokenizer, onnx_path)
+        threads = int(os.getenv('ONNX_NUM_THREADS', 0)) or None
+        return OnnxSequenceClassifier(onnx_path, model.config, threads)
+    return model
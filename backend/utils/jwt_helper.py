@@ -1,7 +1,14 @@
 import jwt
 import os
+import hashlib
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
+from functools import wraps
 from dotenv import load_dotenv
+from flask import request, jsonify
+from utils.metrics import timed
 
 load_dotenv()
 
@@ -16,9 +23,64 @@ def generate_token(user_id, expires_hours=24):
     }
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGO)
 
-def verify_token(token):
+# Verified payloads are cached so repeat requests with the same token skip
+# signature checks. An entry never outlives the token's own exp claim.
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 10000))
+TOKEN_CACHE_TTL = float(os.getenv('TOKEN_CACHE_TTL', 300))
+
+_token_cache = OrderedDict()
+_token_cache_lock = threading.Lock()
+token_cache_counters = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+def _decode_token(token):
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGO])
         return payload
     except Exception as e:
         return None
+
+def verify_token(token):
+    if TOKEN_CACHE_SIZE <= 0:
+        return _decode_token(token)
+    key = hashlib.sha256(token.encode('utf-8')).digest()
+    now = time.time()
+    with _token_cache_lock:
+        entry = _token_cache.get(key)
+        if entry is not None:
+            payload, expires_at = entry
+            if expires_at > now:
+                _token_cache.move_to_end(key)
+                token_cache_counters['hits'] += 1
+                return payload
+            del _token_cache[key]
+        token_cache_counters['misses'] += 1
+    payload = _decode_token(token)
+    if payload is None:
+        return None
+    expires_at = now + TOKEN_CACHE_TTL
+    if 'exp' in payload:
+        expires_at = min(expires_at, float(payload['exp']))
+    with _token_cache_lock:
+        _token_cache[key] = (payload, expires_at)
+        while len(_token_cache) > TOKEN_CACHE_SIZE:
+            _token_cache.popitem(last=False)
+            token_cache_counters['evictions'] += 1
+    return payload
+
+def token_required(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        auth = request.headers.get('Authorization', None)
+        if not auth:
+            return jsonify({'message':'Token missing'}), 401
+        parts = auth.split()
+        if parts[0].lower() != 'bearer' or len(parts) != 2:
+            return jsonify({'message':'Invalid token format'}), 401
+        token = parts[1]
+        with timed('auth'):
+            payload = verify_token(token)
+        if not payload:
+            return jsonify({'message':'Invalid or expired token'}), 401
+        request.user = payload['sub']
+        return f(*args, **kwargs)
+    return decorated
@@ -0,0 +1,135 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Minimal in-process metrics with Prometheus text output. Values are per
+# process; with several gunicorn workers each one exposes its own series.
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 4096, 16384)
+
+_lock = threading.Lock()
+_metrics = {}
+_collectors = []
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def set(self, value, **labels):
+        # For mirroring counters kept by another component at scrape time
+        key = tuple(sorted(labels.items()))
+        with _lock:
+            self.values[key] = value
+
+    def samples(self):
+        return [(self.name, dict(key), value) for key, value in self.values.items()]
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.values = {}
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with _lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = [[0] * len(self.buckets), 0.0, 0]
+            i = bisect.bisect_left(self.buckets, value)
+            if i < len(self.buckets):
+                entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self):
+        out = []
+        for key, (counts, total, count) in self.values.items():
+            labels = dict(key)
+            cumulative = 0
+            for bound, c in zip(self.buckets, counts):
+                cumulative += c
+                out.append((f'{self.name}_bucket', {**labels, 'le': repr(float(bound))}, cumulative))
+            out.append((f'{self.name}_bucket', {**labels, 'le': '+Inf'}, count))
+            out.append((f'{self.name}_sum', labels, total))
+            out.append((f'{self.name}_count', labels, count))
+        return out
+
+
+def _register(cls, name, help_text, *args):
+    with _lock:
+        metric = _metrics.get(name)
+        if metric is None:
+            metric = _metrics[name] = cls(name, help_text, *args)
+        return metric
+
+
+def counter(name, help_text):
+    return _register(Counter, name, help_text)
+
+
+def gauge(name, help_text):
+    return _register(Gauge, name, help_text)
+
+
+def histogram(name, help_text, buckets=DEFAULT_BUCKETS):
+    return _register(Histogram, name, help_text, buckets)
+
+
+def register_collector(fn):
+    # fn is called at scrape time to refresh gauges from other components
+    _collectors.append(fn)
+
+
+stage_seconds = histogram('fakenews_stage_seconds', 'Time spent in each stage of the analysis pipeline')
+
+
+@contextmanager
+def timed(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_seconds.observe(time.perf_counter() - start, stage=stage)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def render_prometheus():
+    for fn in list(_collectors):
+        try:
+            fn()
+        except Exception:
+            pass
+    lines = []
+    with _lock:
+        for metric in _metrics.values():
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                label_str = ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+                lines.append(f'{name}{{{label_str}}} {value}' if label_str else f'{name} {value}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,115 @@
+import os
+import re
+import shutil
+import threading
+import time
+from datetime import datetime
+
+# A registry directory holds one sub-directory per model version plus a
+# CURRENT file naming the version to serve:
+#   model_registry/
+#     CURRENT
+#     versions/20261018-101500/   config.json, weights, tokenizer (+ serving/, onnx/)
+# Versions are immutable once published; serving a different one only
+# rewrites CURRENT, which every API process watches.
+VERSION_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9._-]{0,63}$')
+
+
+class ModelRegistry:
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, version):
+        if not VERSION_PATTERN.match(version or ''):
+            raise ValueError(f'Invalid model version {version!r}')
+        return os.path.join(self.root, 'versions', version)
+
+    def exists(self, version):
+        try:
+            return os.path.exists(os.path.join(self.path(version), 'config.json'))
+        except ValueError:
+            return False
+
+    def versions(self):
+        base = os.path.join(self.root, 'versions')
+        if not os.path.isdir(base):
+            return []
+        return sorted(v for v in os.listdir(base) if self.exists(v))
+
+    def current(self):
+        try:
+            with open(os.path.join(self.root, 'CURRENT')) as f:
+                version = f.read().strip()
+        except FileNotFoundError:
+            return None
+        return version if self.exists(version) else None
+
+    def set_current(self, version):
+        if not self.exists(version):
+            raise ValueError(f'Unknown model version {version!r}')
+        tmp = os.path.join(self.root, 'CURRENT.tmp')
+        with open(tmp, 'w') as f:
+            f.write(version + '\n')
+        os.replace(tmp, os.path.join(self.root, 'CURRENT'))
+
+    def publish(self, source_dir, version=None):
+        # Copy next to the final location, then rename, so watchers never see a partial version
+        if not os.path.exists(os.path.join(source_dir, 'config.json')):
+            raise ValueError(f'{source_dir} is not a saved model directory')
+        version = version or datetime.utcnow().strftime('%Y%m%d-%H%M%S')
+        target = self.path(version)
+        if os.path.exists(target):
+            raise ValueError(f'Model version {version!r} already exists')
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp = os.path.join(self.root, 'versions', f'.{version}.tmp')
+        shutil.rmtree(tmp, ignore_errors=True)
+        shutil.copytree(source_dir, tmp)
+        os.rename(tmp, target)
+        return version
+
+
+class RegistryWatcher:
+    # Polls the registry's CURRENT file and calls on_change(version) from a
+    # background thread when it names a version other than serving_fn().
+    # A version that failed to load is not retried until CURRENT changes.
+
+    def __init__(self, registry, serving_fn, on_change, interval=5.0):
+        self.registry = registry
+        self.serving_fn = serving_fn
+        self.on_change = on_change
+        self.interval = interval
+        self._failed = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        # The thread does not survive a fork, so start it per process
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='model-registry-watcher', daemon=True)
+            self._thread.start()
+
+    def check(self):
+        version = self.registry.current()
+        if version is None or version == self.serving_fn() or version == self._failed:
+            return
+        try:
+            self.on_change(version)
+            self._failed = None
+        except Exception as e:
+            self._failed = version
+            print(f'Could not switch to model version {version}: {str(e)}')
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.check()
+            except Exception as e:
+                print(f'Model registry watcher error: {str(e)}')
@@ -0,0 +1,171 @@
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from utils.prediction_cache import normalize_text
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_WORD = re.compile(r'\w+')
+
+
+def shingles(text, size=3):
+    # Word n-grams of the normalized text; crc32 keeps them stable across processes
+    words = _WORD.findall(normalize_text(text))
+    if len(words) <= size:
+        return {zlib.crc32(' '.join(words).encode('utf-8'))}
+    return {zlib.crc32(' '.join(words[i:i + size]).encode('utf-8')) for i in range(len(words) - size + 1)}
+
+
+def optimal_bands(threshold, num_perm, false_negative_weight=0.7):
+    # Pick bands x rows so the LSH S-curve switches at the Jaccard threshold,
+    # minimizing the weighted false positive / false negative area under it.
+    # Candidates are verified against the threshold anyway, so a false
+    # positive only costs a comparison while a false negative costs inference.
+    def area(fn, lo, hi, steps=200):
+        width = (hi - lo) / steps
+        return sum(fn(lo + (i + 0.5) * width) for i in range(steps)) * width
+
+    best, best_error = (num_perm, 1), float('inf')
+    for bands in range(1, num_perm + 1):
+        if num_perm % bands:
+            continue
+        rows = num_perm // bands
+        fp = area(lambda s: 1 - (1 - s ** rows) ** bands, 0.0, threshold)
+        fn = area(lambda s: (1 - s ** rows) ** bands, threshold, 1.0)
+        error = (1 - false_negative_weight) * fp + false_negative_weight * fn
+        if error < best_error:
+            best, best_error = (bands, rows), error
+    return best
+
+
+class MinHasher:
+
+    def __init__(self, num_perm=128, shingle_size=3, seed=1):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.seed = seed
+        self._a = None
+        self._b = None
+
+    def _params(self):
+        if self._a is None:
+            import numpy as np
+            rng = np.random.RandomState(self.seed)
+            # a, b < 2^32 and 32-bit shingle hashes keep a * x + b exact in uint64
+            self._b = rng.randint(0, 1 << 32, size=(self.num_perm, 1), dtype=np.uint64)
+            self._a = rng.randint(1, 1 << 32, size=(self.num_perm, 1), dtype=np.uint64)
+        return self._a, self._b
+
+    def signature(self, text):
+        import numpy as np
+        a, b = self._params()
+        hashes = np.fromiter(shingles(text, self.shingle_size), dtype=np.uint64)
+        permuted = (a * hashes[None, :] + b) % np.uint64(_MERSENNE_PRIME)
+        return (permuted.min(axis=1) & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+
+
+class NearDuplicateIndex:
+    # In-process MinHash LSH index of analyzed texts. A query returns the most
+    # similar indexed entry whose estimated Jaccard similarity is at least
+    # `threshold`, so small edits of a known story reuse its verdict.
+    # Like PredictionCache, entries are dropped when version_fn changes.
+
+    def __init__(self, version_fn, threshold=0.8, num_perm=128, shingle_size=3, max_entries=200000,
+                 min_words=20, version_check_interval=5.0):
+        self.version_fn = version_fn
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm, shingle_size)
+        self.bands, self.rows = optimal_bands(threshold, num_perm)
+        self.max_entries = max_entries
+        self.min_words = min_words
+        self.version_check_interval = version_check_interval
+        self._entries = OrderedDict()
+        self._buckets = [{} for _ in range(self.bands)]
+        self._lock = threading.Lock()
+        self._version = None
+        self._version_checked = 0.0
+        self.counters = {'hits': 0, 'misses': 0, 'skipped': 0, 'evictions': 0, 'invalidations': 0, 'stale': 0}
+
+    def version(self, force=False):
+        now = time.monotonic()
+        if force or self._version is None or now - self._version_checked >= self.version_check_interval:
+            current = self.version_fn()
+            with self._lock:
+                if self._version is not None and current != self._version:
+                    self._clear_locked()
+                    self.counters['invalidations'] += 1
+                self._version = current
+                self._version_checked = now
+        return self._version
+
+    def signature(self, text):
+        # None for texts too short for a meaningful similarity estimate
+        if len(_WORD.findall(text)) < self.min_words:
+            with self._lock:
+                self.counters['skipped'] += 1
+            return None
+        return self.hasher.signature(text)
+
+    def _band_keys(self, signature):
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def query(self, signature):
+        self.version()
+        best = None
+        with self._lock:
+            candidates = set()
+            for bucket, band in zip(self._buckets, self._band_keys(signature)):
+                candidates.update(bucket.get(band, ()))
+            for key in candidates:
+                other, value = self._entries[key]
+                similarity = float((other == signature).mean())
+                if similarity >= self.threshold and (best is None or similarity > best[1]):
+                    best = (key, similarity, value)
+            self.counters['hits' if best else 'misses'] += 1
+        return best
+
+    def add(self, key, signature, value, version=None):
+        # version: as for PredictionCache.set, verdicts of a swapped-out model are dropped
+        current = self.version()
+        with self._lock:
+            if version is not None and version != current:
+                self.counters['stale'] += 1
+                return
+            if key in self._entries:
+                self._remove_locked(key)
+            self._entries[key] = (signature, value)
+            for bucket, band in zip(self._buckets, self._band_keys(signature)):
+                bucket.setdefault(band, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove_locked(next(iter(self._entries)))
+                self.counters['evictions'] += 1
+
+    def _remove_locked(self, key):
+        signature, _ = self._entries.pop(key)
+        for bucket, band in zip(self._buckets, self._band_keys(signature)):
+            keys = bucket.get(band)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del bucket[band]
+
+    def _clear_locked(self):
+        self._entries.clear()
+        self._buckets = [{} for _ in range(self.bands)]
+
+    def clear(self):
+        with self._lock:
+            self._clear_locked()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats['size'] = len(self._entries)
+        stats.update({'maxEntries': self.max_entries, 'threshold': self.threshold, 'numPerm': self.hasher.num_perm,
+                      'bands': self.bands, 'rows': self.rows, 'modelVersion': self._version})
+        return stats
@@ -0,0 +1,92 @@
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.metrics import timed
+
+OCR_WORKERS = int(os.getenv('OCR_WORKERS', 2))
+OCR_MAX_PENDING = int(os.getenv('OCR_MAX_PENDING', 16))
+OCR_MAX_SIDE = int(os.getenv('OCR_MAX_SIDE', 2000))
+OCR_BINARIZE = os.getenv('OCR_BINARIZE', '1') == '1'
+
+
+class OcrBusy(Exception):
+    pass
+
+
+def otsu_threshold(gray):
+    import numpy as np
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    total = hist.sum()
+    if total == 0:
+        return 128
+    levels = np.arange(256)
+    weight_bg = np.cumsum(hist)
+    weight_fg = total - weight_bg
+    mean_bg = np.cumsum(hist * levels)
+    mean_total = mean_bg[-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        between = (mean_total * weight_bg - mean_bg * total) ** 2 / (weight_bg * weight_fg)
+    return int(np.nanargmax(between))
+
+
+def preprocess_image(image, max_side=OCR_MAX_SIDE, binarize=OCR_BINARIZE):
+    # Tesseract time grows with pixel count; phone photos are far larger than
+    # needed for body text. Grayscale + Otsu binarization also helps accuracy.
+    from PIL import Image
+    image = image.convert('L')
+    longest = max(image.size)
+    if longest > max_side:
+        scale = max_side / float(longest)
+        image = image.resize((max(1, int(image.width * scale)), max(1, int(image.height * scale))), Image.LANCZOS)
+    if binarize:
+        import numpy as np
+        gray = np.asarray(image)
+        threshold = otsu_threshold(gray)
+        image = Image.fromarray(np.where(gray > threshold, 255, 0).astype(np.uint8))
+    return image
+
+
+def ocr_image_bytes(data):
+    from PIL import Image
+    import pytesseract
+    with timed('ocr_preprocess'):
+        image = preprocess_image(Image.open(io.BytesIO(data)))
+    with timed('ocr'):
+        return pytesseract.image_to_string(image)
+
+
+class OcrPool:
+    # pytesseract runs every call in its own tesseract subprocess, so the pool
+    # threads only wait on those processes; max_workers bounds how many run at
+    # once and max_pending bounds the queue in front of them.
+
+    def __init__(self, max_workers=OCR_WORKERS, max_pending=OCR_MAX_PENDING):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='ocr')
+                self._pid = os.getpid()
+            return self._executor
+
+    def submit(self, data):
+        if not self._slots.acquire(blocking=False):
+            raise OcrBusy('OCR queue is full')
+        try:
+            fut = self._get_executor().submit(ocr_image_bytes, data)
+        except Exception:
+            self._slots.release()
+            raise
+        fut.add_done_callback(lambda _: self._slots.release())
+        return fut
+
+    def run(self, data, timeout=None):
+        return self.submit(data).result(timeout=timeout)
@@ -0,0 +1,63 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import bcrypt
+
+from utils.metrics import timed
+
+# bcrypt costs ~250 ms of CPU per call. Running it on a small dedicated pool
+# caps how many cores a login storm can take from inference; beyond
+# BCRYPT_MAX_PENDING queued calls new logins are turned away instead of piling up.
+BCRYPT_WORKERS = int(os.getenv('BCRYPT_WORKERS', 2))
+BCRYPT_MAX_PENDING = int(os.getenv('BCRYPT_MAX_PENDING', 32))
+BCRYPT_TIMEOUT = float(os.getenv('BCRYPT_TIMEOUT', 10))
+
+
+class PasswordHasherBusy(Exception):
+    pass
+
+
+_slots = threading.BoundedSemaphore(BCRYPT_MAX_PENDING)
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix='bcrypt')
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def submit(fn, *args):
+    if not _slots.acquire(blocking=False):
+        raise PasswordHasherBusy('Too many pending password operations')
+    try:
+        fut = _get_executor().submit(fn, *args)
+    except Exception:
+        _slots.release()
+        raise
+    fut.add_done_callback(lambda _: _slots.release())
+    return fut
+
+
+def _result(fut):
+    # A call stuck behind the queue for BCRYPT_TIMEOUT is reported as busy (503)
+    try:
+        return fut.result(timeout=BCRYPT_TIMEOUT)
+    except FutureTimeout:
+        raise PasswordHasherBusy('Password operation timed out')
+
+
+def hash_password(password):
+    with timed('bcrypt'):
+        return _result(submit(bcrypt.hashpw, password.encode('utf-8'), bcrypt.gensalt()))
+
+
+def check_password(password, password_hash):
+    with timed('bcrypt'):
+        return _result(submit(bcrypt.checkpw, password.encode('utf-8'), password_hash))
@@ -0,0 +1,131 @@
+import hashlib
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime
+
+
+def normalize_text(text):
+    # The classifier is uncased, so case and whitespace differences never change the verdict
+    text = unicodedata.normalize('NFKC', text)
+    return re.sub(r'\s+', ' ', text).strip().lower()
+
+
+def model_fingerprint(model_dir, fallback, ignore=()):
+    # Cheap version id for a model directory: file names, sizes and mtimes,
+    # leaving out the files named in ignore
+    if not os.path.isdir(model_dir):
+        return fallback
+    h = hashlib.sha256()
+    for name in sorted(os.listdir(model_dir)):
+        path = os.path.join(model_dir, name)
+        if os.path.isfile(path) and name not in ignore:
+            st = os.stat(path)
+            h.update(f'{name}:{st.st_size}:{st.st_mtime_ns};'.encode('utf-8'))
+    return h.hexdigest()[:16]
+
+
+class PredictionCache:
+    # Two-tier cache of model outputs keyed by hash(model version, variant, normalized text).
+    # Tier 1 is an in-process LRU with size and TTL limits; tier 2 is an optional
+    # Mongo collection shared by all workers.
+
+    def __init__(self, version_fn, max_entries=10000, ttl_seconds=3600, collection=None, version_check_interval=5.0):
+        self.version_fn = version_fn
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.collection = collection
+        self.version_check_interval = version_check_interval
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self._version_checked = 0.0
+        self.counters = {'hits': 0, 'shared_hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0,
+                         'stale': 0}
+
+    def version(self, force=False):
+        now = time.monotonic()
+        if force or self._version is None or now - self._version_checked >= self.version_check_interval:
+            current = self.version_fn()
+            with self._lock:
+                if self._version is not None and current != self._version:
+                    self._entries.clear()
+                    self.counters['invalidations'] += 1
+                self._version = current
+                self._version_checked = now
+        return self._version
+
+    def key(self, text, variant='', version=None):
+        raw = f'{version or self.version()}\0{variant}\0{normalize_text(text)}'
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, text, variant=''):
+        key = self.key(text, variant)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires > now:
+                    self._entries.move_to_end(key)
+                    self.counters['hits'] += 1
+                    return value
+                del self._entries[key]
+                self.counters['expirations'] += 1
+        if self.collection is not None:
+            try:
+                doc = self.collection.find_one({'_id': key})
+            except Exception:
+                doc = None
+            if doc is not None:
+                self._put_local(key, doc['value'])
+                with self._lock:
+                    self.counters['shared_hits'] += 1
+                return doc['value']
+        with self._lock:
+            self.counters['misses'] += 1
+        return None
+
+    def set(self, text, value, variant='', version=None):
+        # version: the model version that produced value. A result that finished
+        # after its model was swapped out is not stored under the new version.
+        current = self.version()
+        if version is not None and version != current:
+            with self._lock:
+                self.counters['stale'] += 1
+            return
+        key = self.key(text, variant, current)
+        self._put_local(key, value)
+        if self.collection is not None:
+            try:
+                self.collection.replace_one(
+                    {'_id': key},
+                    {'_id': key, 'value': value, 'modelVersion': current, 'createdAt': datetime.utcnow()},
+                    upsert=True)
+            except Exception:
+                pass
+
+    def _put_local(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.counters['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats['size'] = len(self._entries)
+        stats['maxEntries'] = self.max_entries
+        stats['ttlSeconds'] = self.ttl
+        stats['modelVersion'] = self._version
+        stats['shared'] = self.collection is not None
+        return stats
@@ -0,0 +1,57 @@
+import json
+import os
+
+# A serving artifact is the fine-tuned model flattened into what inference
+# needs: one safetensors file (all weights and buffers), config.json and the
+# fast tokenizer's tokenizer.json. Loading it builds the model on the meta
+# device and assigns the memory-mapped tensors, so there is no random
+# init, no checkpoint conversion and no copy of the weights.
+WEIGHTS_FILE = 'model.safetensors'
+MANIFEST_FILE = 'artifact.json'
+BUFFER_PREFIX = '__buffer__.'
+
+
+def export_artifact(model, tokenizer, out_dir, source_fingerprint=None):
+    from safetensors.torch import save_file
+    os.makedirs(out_dir, exist_ok=True)
+    state = model.state_dict()
+    tensors = {name: t.detach().contiguous() for name, t in state.items()}
+    # Non-persistent buffers (e.g. BERT position_ids) are not in state_dict
+    for name, buf in model.named_buffers():
+        if name not in state:
+            tensors[BUFFER_PREFIX + name] = buf.detach().contiguous()
+    save_file(tensors, os.path.join(out_dir, WEIGHTS_FILE), metadata={'format': 'pt'})
+    model.config.save_pretrained(out_dir)
+    tokenizer.save_pretrained(out_dir, legacy_format=False)
+    with open(os.path.join(out_dir, MANIFEST_FILE), 'w') as f:
+        json.dump({'source': source_fingerprint, 'architecture': type(model).__name__}, f)
+    return out_dir
+
+
+def artifact_is_current(artifact_dir, source_fingerprint):
+    path = os.path.join(artifact_dir, MANIFEST_FILE)
+    if not os.path.exists(path) or not os.path.exists(os.path.join(artifact_dir, WEIGHTS_FILE)):
+        return False
+    with open(path) as f:
+        return json.load(f).get('source') == source_fingerprint
+
+
+def load_artifact(artifact_dir):
+    import torch
+    from safetensors.torch import load_file
+    from transformers import AutoConfig, AutoModelForSequenceClassification, PreTrainedTokenizerFast
+
+    config = AutoConfig.from_pretrained(artifact_dir)
+    with torch.device('meta'):
+        model = AutoModelForSequenceClassification.from_config(config)
+    tensors = load_file(os.path.join(artifact_dir, WEIGHTS_FILE))
+    buffers = {k[len(BUFFER_PREFIX):]: tensors.pop(k) for k in list(tensors) if k.startswith(BUFFER_PREFIX)}
+    model.load_state_dict(tensors, strict=True, assign=True)
+    for name, value in buffers.items():
+        module_name, _, attr = name.rpartition('.')
+        module = model.get_submodule(module_name) if module_name else model
+        module.register_buffer(attr, value, persistent=False)
+    model.eval()
+
+    tokenizer = PreTrainedTokenizerFast.from_pretrained(artifact_dir)
+    return tokenizer, model
@@ -0,0 +1,362 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from bson.objectid import ObjectId
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines run a single process
+    fcntl = None
+
+
+def oid_words(oid):
+    import numpy as np
+    return np.frombuffer(ObjectId(oid).binary, dtype='<u4')
+
+
+def _owner_hash(words):
+    import numpy as np
+    words = words.astype(np.uint64)
+    return ((words[:, 0] << np.uint64(32)) | words[:, 1]) ^ (words[:, 2] * np.uint64(0x9E3779B97F4A7C15))
+
+
+class VectorIndex:
+    # IVF (inverted file) index over unit-normalized float16 embeddings of
+    # history items, kept in memory-mapped files under `path`:
+    #   vectors.bin  rows x dim float16
+    #   keys.bin     rows x 3 uint32, the history ObjectId
+    #   owners.bin   rows x 3 uint32, the user ObjectId
+    #   lists.bin    rows int32, IVF list of each row (-1 before training)
+    #   centroids.npy, meta.json
+    # meta.json holds the row count and is replaced last, so readers never
+    # see a half-written row. One process (holding index.lock) appends; the
+    # others map the files read-only and pick up new rows on refresh().
+    # Until there are train_size rows the index is searched exhaustively.
+
+    ARRAYS = ('vectors', 'keys', 'owners', 'lists')
+
+    def __init__(self, path, nlist=1024, nprobe=16, exact_limit=20000, train_size=50000,
+                 grow_rows=65536, refresh_interval=1.0):
+        self.path = path
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.exact_limit = exact_limit
+        self.train_size = train_size
+        self.grow_rows = grow_rows
+        self.refresh_interval = refresh_interval
+        self.writable = False
+        self.meta = None
+        self._arrays = None
+        self._centroids = None
+        self._centroids_generation = None
+        self._mapped = None
+        self._csr = None
+        self._lock = threading.RLock()
+        self._lock_file = None
+        self._refreshed = 0.0
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _read_meta(self):
+        try:
+            with open(self._file('meta.json')) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_meta(self):
+        tmp = self._file('meta.json.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(self.meta, f)
+        os.replace(tmp, self._file('meta.json'))
+
+    def _specs(self, rows):
+        import numpy as np
+        return {'vectors': (np.float16, (rows, self.meta['dim'])), 'keys': (np.uint32, (rows, 3)),
+                'owners': (np.uint32, (rows, 3)), 'lists': (np.int32, (rows,))}
+
+    def _map(self):
+        # The writer maps the whole preallocated capacity, readers only the committed rows
+        import numpy as np
+        rows = self.meta['capacity'] if self.writable else self.meta['count']
+        mode = 'r+' if self.writable else 'r'
+        self._arrays = {
+            name: np.memmap(self._file(f'{name}.bin'), dtype=dtype, mode=mode, shape=shape) if rows else np.zeros(shape, dtype)
+            for name, (dtype, shape) in self._specs(rows).items()
+        }
+        self._mapped = (rows, self.meta['generation'])
+        if self.meta['trained'] and self._centroids_generation != self.meta['generation']:
+            self._centroids = np.load(self._file('centroids.npy'))
+            self._centroids_generation = self.meta['generation']
+
+    # Writer role
+
+    def try_acquire(self):
+        # Non-blocking; True if this process is (now) the writer
+        with self._lock:
+            if self.writable:
+                return True
+            os.makedirs(self.path, exist_ok=True)
+            f = open(self._file('index.lock'), 'a')
+            if fcntl is not None:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    f.close()
+                    return False
+            self._lock_file = f
+            self.writable = True
+            self.meta = self._read_meta()
+            if self.meta is not None:
+                self._map()
+            return True
+
+    def reset(self):
+        with self._lock:
+            for name in self.ARRAYS:
+                if os.path.exists(self._file(f'{name}.bin')):
+                    os.remove(self._file(f'{name}.bin'))
+            for name in ('centroids.npy', 'meta.json'):
+                if os.path.exists(self._file(name)):
+                    os.remove(self._file(name))
+            self.meta = None
+            self._arrays = self._centroids = self._centroids_generation = self._csr = self._mapped = None
+
+    def _grow(self, min_rows):
+        import numpy as np
+        capacity = max(self.meta['capacity'] * 2, self.meta['capacity'] + self.grow_rows, min_rows)
+        if self._arrays is not None:
+            for array in self._arrays.values():
+                if hasattr(array, 'flush'):
+                    array.flush()
+        self._arrays = None
+        for name, (dtype, shape) in self._specs(capacity).items():
+            size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+            with open(self._file(f'{name}.bin'), 'a+b') as f:
+                f.truncate(size)
+        self.meta['capacity'] = capacity
+        self._map()
+
+    def add_many(self, keys, owners, vectors):
+        import numpy as np
+        vectors = np.asarray(vectors, dtype=np.float32)
+        vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        with self._lock:
+            if not self.writable:
+                raise Exception('Vector index is read-only in this process')
+            if self.meta is None:
+                self.meta = {'dim': int(vectors.shape[1]), 'count': 0, 'capacity': 0, 'trained': False,
+                             'nlist': 0, 'generation': 0, 'watermark': None}
+            if vectors.shape[1] != self.meta['dim']:
+                raise ValueError(f"Embedding has {vectors.shape[1]} dims, index has {self.meta['dim']}")
+            start, end = self.meta['count'], self.meta['count'] + len(vectors)
+            if end > self.meta['capacity']:
+                self._grow(end)
+            self._arrays['vectors'][start:end] = vectors.astype(np.float16)
+            self._arrays['keys'][start:end] = np.stack([oid_words(k) for k in keys])
+            self._arrays['owners'][start:end] = np.stack([oid_words(o) for o in owners])
+            self._arrays['lists'][start:end] = self._assign(vectors) if self.meta['trained'] else -1
+            self.meta['count'] = end
+
+    def flush(self, watermark=None):
+        with self._lock:
+            if self.meta is None:
+                return
+            for array in self._arrays.values():
+                if hasattr(array, 'flush'):
+                    array.flush()
+            if watermark is not None:
+                self.meta['watermark'] = str(watermark)
+            self._write_meta()
+
+    def should_train(self):
+        return bool(self.meta) and not self.meta['trained'] and self.meta['count'] >= self.train_size
+
+    def train(self, sample_size=None, iterations=15, seed=0):
+        # Spherical k-means on a sample, then every row is assigned to its nearest centroid
+        import numpy as np
+        with self._lock:
+            count = self.meta['count']
+            nlist = max(1, min(self.nlist, count // 39))
+            rng = np.random.RandomState(seed)
+            sample_size = min(count, sample_size or nlist * 64)
+            sample = np.sort(rng.choice(count, sample_size, replace=False))
+            x = np.asarray(self._arrays['vectors'][sample], dtype=np.float32)
+            centroids = x[rng.choice(len(x), nlist, replace=False)]
+            for _ in range(iterations):
+                assign = np.concatenate([np.argmax(x[i:i + 65536] @ centroids.T, axis=1) for i in range(0, len(x), 65536)])
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, assign, x)
+                sizes = np.bincount(assign, minlength=nlist)
+                empty = sizes == 0
+                sums[empty] = x[rng.choice(len(x), int(empty.sum()))]
+                centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+            self._centroids = centroids.astype(np.float32)
+            self._centroids_generation = self.meta['generation'] + 1
+            for i in range(0, count, 65536):
+                chunk = np.asarray(self._arrays['vectors'][i:min(count, i + 65536)], dtype=np.float32)
+                self._arrays['lists'][i:i + len(chunk)] = self._assign(chunk)
+            tmp = self._file('centroids.tmp.npy')
+            np.save(tmp, self._centroids)
+            os.replace(tmp, self._file('centroids.npy'))
+            self.meta.update({'trained': True, 'nlist': nlist, 'generation': self.meta['generation'] + 1})
+            self._csr = None
+            self.flush()
+
+    def _assign(self, vectors):
+        import numpy as np
+        return np.argmax(vectors @ self._centroids.T, axis=1).astype(np.int32)
+
+    # Readers
+
+    def refresh(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._refreshed < self.refresh_interval:
+            return
+        with self._lock:
+            self._refreshed = now
+            if self.writable:
+                return
+            meta = self._read_meta()
+            if meta is None:
+                return
+            self.meta = meta
+            if self._mapped != (meta['count'], meta['generation']):
+                self._map()
+
+    def _build_csr(self, count):
+        # Rows grouped by IVF list and by owner; rows added later are scanned directly
+        import numpy as np
+        lists = np.asarray(self._arrays['lists'][:count])
+        list_order = np.argsort(lists, kind='stable')
+        list_starts = np.searchsorted(lists[list_order], np.arange(self.meta['nlist'] + 1)) if self.meta['trained'] else None
+        owner_keys = _owner_hash(np.asarray(self._arrays['owners'][:count]))
+        owner_order = np.argsort(owner_keys, kind='stable')
+        self._csr = (self.meta['generation'], count, list_order, list_starts, owner_order, owner_keys[owner_order])
+
+    def _indexed(self, count):
+        if self._csr is None or self._csr[0] != self.meta['generation'] or count - self._csr[1] > max(self.exact_limit, count // 20):
+            self._build_csr(count)
+        return self._csr
+
+    def search(self, query, k=10, owner=None, exclude=None):
+        # Returns [(history ObjectId, cosine similarity)], best first
+        import numpy as np
+        self.refresh()
+        with self._lock:
+            if not self.meta or not self.meta['count']:
+                return []
+            count = self.meta['count']
+            arrays = self._arrays
+            _, indexed, list_order, list_starts, owner_order, owner_keys = self._indexed(count)
+            trained = self.meta['trained']
+            centroids = self._centroids
+        q = np.asarray(query, dtype=np.float32)
+        q = q / max(float(np.linalg.norm(q)), 1e-12)
+        pending = np.arange(indexed, count)
+
+        rows = None
+        if owner is not None:
+            words = oid_words(owner)
+            key = _owner_hash(words[None, :])[0]
+            lo, hi = np.searchsorted(owner_keys, key, 'left'), np.searchsorted(owner_keys, key, 'right')
+            rows = np.concatenate([owner_order[lo:hi], pending[_owner_hash(np.asarray(arrays['owners'][pending])) == key]])
+            rows = rows[np.all(arrays['owners'][rows] == words, axis=1)]
+            if len(rows) <= self.exact_limit or not trained:
+                return self._score(arrays, rows, q, k, exclude)
+        elif not trained or count <= self.exact_limit:
+            return self._score(arrays, np.arange(count), q, k, exclude)
+
+        probe = np.argsort(-(centroids @ q))[:self.nprobe]
+        if rows is not None:
+            candidates = rows[np.isin(arrays['lists'][rows], probe)]
+        else:
+            candidates = np.concatenate([list_order[list_starts[l]:list_starts[l + 1]] for l in probe] +
+                                        [pending[np.isin(arrays['lists'][pending], probe)]])
+        return self._score(arrays, candidates, q, k, exclude)
+
+    def _score(self, arrays, rows, q, k, exclude):
+        import numpy as np
+        if len(rows) == 0:
+            return []
+        rows = np.sort(rows)
+        scores = np.concatenate([np.asarray(arrays['vectors'][rows[i:i + 65536]], dtype=np.float32) @ q
+                                 for i in range(0, len(rows), 65536)])
+        if exclude is not None:
+            scores[np.all(arrays['keys'][rows] == oid_words(exclude), axis=1)] = -np.inf
+        top = np.argpartition(-scores, min(k, len(scores)) - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(ObjectId(arrays['keys'][rows[i]].tobytes()), float(scores[i])) for i in top if np.isfinite(scores[i])]
+
+    def stats(self):
+        with self._lock:
+            meta = dict(self.meta or {})
+        return {'count': meta.get('count', 0), 'dim': meta.get('dim'), 'trained': meta.get('trained', False),
+                'nlist': meta.get('nlist', 0), 'nprobe': self.nprobe, 'writer': self.writable}
+
+
+class VectorIndexSync:
+    # Feeds the index from the history collection. Every process runs one
+    # sync thread: whoever holds the index lock tails history by _id and
+    # appends new embeddings; the others refresh their read-only view and
+    # take over the lock if the writer exits. Documents are picked up `lag`
+    # seconds after their _id was generated so late write-behind flushes
+    # are not skipped by the _id watermark.
+
+    def __init__(self, index, collection, interval=2.0, lag=10.0, batch_size=1000):
+        self.index = index
+        self.collection = collection
+        self.interval = interval
+        self.lag = lag
+        self.batch_size = batch_size
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self.last_error = None
+
+    def ensure_started(self):
+        # The thread does not survive a fork, so start it per process
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='vector-index-sync', daemon=True)
+            self._thread.start()
+
+    def sync_once(self, lag=None, train=True):
+        # Appends up to batch_size new documents; returns how many
+        import numpy as np
+        from utils.embeddings import decode_embedding
+        lag = self.lag if lag is None else lag
+        id_range = {'$lt': ObjectId.from_datetime(datetime.utcnow() - timedelta(seconds=lag))}
+        watermark = (self.index.meta or {}).get('watermark')
+        if watermark:
+            id_range['$gt'] = ObjectId(watermark)
+        docs = list(self.collection.find({'_id': id_range, 'embedding': {'$exists': True}},
+                                         {'userId': 1, 'embedding': 1}).sort('_id', 1).limit(self.batch_size))
+        if docs:
+            vectors = np.stack([decode_embedding(d['embedding']) for d in docs])
+            self.index.add_many([d['_id'] for d in docs], [d['userId'] for d in docs], vectors)
+            self.index.flush(watermark=docs[-1]['_id'])
+        if train and self.index.should_train():
+            self.index.train()
+        return len(docs)
+
+    def _run(self):
+        while True:
+            try:
+                if self.index.try_acquire():
+                    while self.sync_once() == self.batch_size:
+                        pass
+                else:
+                    self.index.refresh(force=True)
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+            time.sleep(self.interval)
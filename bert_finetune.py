@@ -1,15 +1,24 @@
 import argparse
+import hashlib
+import json
 import os
-from datasets import load_dataset, Dataset, DatasetDict
+import re
+import time
+from copy import deepcopy
+from datasets import load_dataset, load_from_disk, Dataset, DatasetDict
+from safetensors.torch import save_file
+from torch.utils.data import DataLoader
 from transformers import (
     AutoTokenizer,
     AutoModelForSequenceClassification,
+    DataCollatorWithPadding,
     TrainingArguments,
     Trainer,
     default_data_collator,
 )
 import numpy as np
 import torch
+import torch.nn.functional as F
 from sklearn.metrics import accuracy_score, f1_score
 
 def parse_args():
@@ -18,7 +27,7 @@ def parse_args():
                         help='Hugging Face model name (default: bert-base-uncased)')
     p.add_argument('--train_file', default=None, help='Path to CSV/TSV train file with columns text,label')
     p.add_argument('--validation_file', default=None, help='Optional validation file (CSV/TSV)')
-    p.add_argument('--output_dir', default='./fine_tuned_bert')
+    p.add_argument('--output_dir', default=None, help='Default: ./fine_tuned_bert, or ./fine_tuned_bert_student with --distill')
     p.add_argument('--num_labels', type=int, default=2)
     p.add_argument('--num_train_epochs', type=int, default=3)
     p.add_argument('--per_device_train_batch_size', type=int, default=8)
@@ -29,7 +38,28 @@ def parse_args():
     p.add_argument('--label_col', type=str, default=None, help='Column name for label in CSV/TSV')
     p.add_argument('--label_value', type=int, default=None, help='If specified, assign this label to all examples (0=Fake, 1=Real). Useful for single-class datasets.')
     p.add_argument('--delimiter', type=str, default=None, help='Delimiter for CSV/TSV (auto-detect if not provided)')
-    return p.parse_args()
+    p.add_argument('--cache_dir', type=str, default='./tokenized_cache', help='Where tokenized datasets are cached between runs')
+    p.add_argument('--no_cache', action='store_true', help='Always re-tokenize instead of reusing the cache')
+    p.add_argument('--padding', choices=['dynamic', 'max_length'], default='dynamic',
+                        help='dynamic: pad each batch to its longest example (default); max_length: pad everything to --max_length')
+    p.add_argument('--pad_to_multiple_of', type=int, default=None, help='Round dynamic padding up to a multiple of this (e.g. 8 for tensor cores)')
+    p.add_argument('--group_by_length', action='store_true', help='Batch examples of similar length together to reduce padding further')
+    p.add_argument('--distill', action='store_true', help='Train a small student against soft labels from --teacher_dir')
+    p.add_argument('--teacher_dir', type=str, default='./fine_tuned_bert', help='Fine-tuned teacher model for --distill')
+    p.add_argument('--student_layers', type=int, default=4, help='Encoder layers in the student (initialized from evenly spaced teacher layers)')
+    p.add_argument('--student_model', type=str, default=None,
+                        help='Use this pretrained model (e.g. a MiniLM/BERT-small with the same vocab) as the student instead of a truncated teacher')
+    p.add_argument('--distill_temperature', type=float, default=2.0)
+    p.add_argument('--distill_alpha', type=float, default=0.5, help='Weight of the hard-label loss; 1 - alpha goes to the soft-label loss')
+    p.add_argument('--early_exit', action='store_true',
+                        help='Train exit heads on intermediate layers of the fine-tuned model in --output_dir (the model itself is frozen)')
+    p.add_argument('--exit_layers', type=str, default='2,4,6,8,10', help='Encoder layers (from 1) that get an exit head')
+    p.add_argument('--exit_learning_rate', type=float, default=5e-4)
+    p.add_argument('--exit_thresholds', type=str, default='0.8,0.9,0.95,0.99', help='Confidence thresholds to report on the validation split')
+    args = p.parse_args()
+    if args.output_dir is None:
+        args.output_dir = './fine_tuned_bert_student' if args.distill else './fine_tuned_bert'
+    return args
 
 
 def compute_metrics(pred):
@@ -40,24 +70,7 @@ def compute_metrics(pred):
     return {'accuracy': acc, 'f1': f1}
 
 
-def main():
-    args = parse_args()
-    os.makedirs(args.output_dir, exist_ok=True)
-
-    # Set seed and device
-    torch.manual_seed(args.seed)
-    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-
-    # Load tokenizer and model
-    tokenizer = AutoTokenizer.from_pretrained(args.model_name)
-    model = AutoModelForSequenceClassification.from_pretrained(args.model_name, num_labels=args.num_labels)
-    model.to(device)
-
-    # Set label mapping
-    model.config.id2label = {0: 'Fake', 1: 'Real'}
-    model.config.label2id = {'Fake': 0, 'Real': 1}
-
-    # Load dataset
+def load_raw_dataset(args):
     if args.train_file:
         # try detect format
         data_files = {'train': args.train_file}
@@ -97,15 +110,15 @@ def main():
             raise ValueError(f'Could not detect label column. Found columns: {train_cols}. You can specify --label_col or --label_value')
 
         # Normalize dataset column names to 'text' and 'label'
-        def rename_columns(example):
-            result = {'text': example[text_col]}
-            if label_col in example:
-                result['label'] = example[label_col]
+        def rename_columns(batch):
+            result = {'text': batch[text_col]}
+            if label_col in batch:
+                result['label'] = batch[label_col]
             elif args.label_value is not None:
-                result['label'] = args.label_value
+                result['label'] = [args.label_value] * len(batch[text_col])
             return result
 
-        dataset = dataset.map(lambda ex: rename_columns(ex), batched=False)
+        dataset = dataset.map(rename_columns, batched=True)
         # normalize to DatasetDict
         if 'validation' not in dataset:
             # create a small split for validation
@@ -118,16 +131,72 @@ def main():
         dataset = Dataset.from_dict({'text': texts, 'label': labels})
         dataset = dataset.train_test_split(test_size=0.5, seed=args.seed)
         dataset = DatasetDict({'train': dataset['train'], 'validation': dataset['test']})
+    return dataset
+
+
+def dataset_fingerprint(args, tokenizer):
+    # Anything that changes the tokenized output must be part of the key
+    h = hashlib.sha256()
+    for path in (args.train_file, args.validation_file):
+        if path:
+            st = os.stat(path)
+            h.update(f'{os.path.abspath(path)}:{st.st_size}:{st.st_mtime_ns};'.encode('utf-8'))
+    settings = {
+        'tokenizer': tokenizer.name_or_path,
+        'tokenizer_class': type(tokenizer).__name__,
+        'vocab_size': tokenizer.vocab_size,
+        'max_length': args.max_length,
+        'padding': args.padding,
+        'text_col': args.text_col,
+        'label_col': args.label_col,
+        'label_value': args.label_value,
+        'delimiter': args.delimiter,
+        'seed': args.seed,
+    }
+    h.update(json.dumps(settings, sort_keys=True).encode('utf-8'))
+    return h.hexdigest()[:16]
+
+
+def load_tokenized_dataset(args, tokenizer):
+    # Tokenized splits are saved as Arrow files and memory-mapped on reuse, so
+    # repeated runs and hyperparameter sweeps skip CSV parsing and tokenization.
+    cache_path = os.path.join(args.cache_dir, dataset_fingerprint(args, tokenizer))
+    if not args.no_cache and os.path.exists(os.path.join(cache_path, 'dataset_dict.json')):
+        print(f'Using tokenized dataset cache: {cache_path}')
+        return load_from_disk(cache_path)
+
+    dataset = load_raw_dataset(args)
 
-    # Tokenize function
     def tokenize_fn(ex):
-        return tokenizer(ex['text'], truncation=True, padding='max_length', max_length=args.max_length)
+        if args.padding == 'max_length':
+            enc = tokenizer(ex['text'], truncation=True, padding='max_length', max_length=args.max_length)
+        else:
+            enc = tokenizer(ex['text'], truncation=True, max_length=args.max_length)
+        enc['length'] = [sum(mask) for mask in enc['attention_mask']]
+        return enc
 
     tokenized = dataset.map(tokenize_fn, batched=True)
-    tokenized = tokenized.remove_columns([c for c in tokenized['train'].column_names if c not in ('input_ids','attention_mask','label')])
+    keep = ('input_ids', 'attention_mask', 'token_type_ids', 'label', 'length')
+    tokenized = tokenized.remove_columns([c for c in tokenized['train'].column_names if c not in keep])
+    if not args.no_cache:
+        tokenized.save_to_disk(cache_path)
+        print(f'Saved tokenized dataset cache: {cache_path}')
+        tokenized = load_from_disk(cache_path)
+    return tokenized
 
-    # Training args
-    training_args = TrainingArguments(
+
+def padding_stats(dataloader):
+    # Real vs padded tokens the model sees in one pass over the training data
+    real = padded = 0
+    for batch in dataloader:
+        mask = batch['attention_mask']
+        real += int(mask.sum())
+        padded += mask.numel()
+    return real, max(padded, 1)
+
+
+def make_training_args(args, **overrides):
+    kwargs = dict(
         output_dir=args.output_dir,
         num_train_epochs=args.num_train_epochs,
         per_device_train_batch_size=args.per_device_train_batch_size,
@@ -138,8 +207,267 @@ def main():
         logging_steps=50,
         load_best_model_at_end=True,
         fp16=torch.cuda.is_available(),
-        seed=args.seed
+        seed=args.seed,
+        group_by_length=args.group_by_length,
+        length_column_name='length'
     )
+    kwargs.update(overrides)
+    return TrainingArguments(**kwargs)
+
+
+def build_student(args, teacher):
+    if args.student_model:
+        return AutoModelForSequenceClassification.from_pretrained(args.student_model, num_labels=args.num_labels)
+    # Same architecture with fewer encoder layers; embeddings, pooler, classifier
+    # and evenly spaced encoder layers are copied from the teacher (DistilBERT-style init).
+    config = deepcopy(teacher.config)
+    n = min(args.student_layers, teacher.config.num_hidden_layers)
+    config.num_hidden_layers = n
+    student = AutoModelForSequenceClassification.from_config(config)
+    picks = [round(i * (teacher.config.num_hidden_layers - 1) / max(n - 1, 1)) for i in range(n)]
+    state = {}
+    for key, value in teacher.state_dict().items():
+        m = re.match(r'(.*\.layer\.)(\d+)(\..*)', key)
+        if not m:
+            state[key] = value
+            continue
+        for j, pick in enumerate(picks):
+            if pick == int(m.group(2)):
+                state[f'{m.group(1)}{j}{m.group(3)}'] = value
+    student.load_state_dict(state)
+    return student
+
+
+class DistillationTrainer(Trainer):
+    def __init__(self, *args, temperature=2.0, alpha=0.5, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.temperature = temperature
+        self.alpha = alpha
+
+    def compute_loss(self, model, inputs, return_outputs=False, num_items_in_batch=None, **kwargs):
+        # transformers 4.46+ passes num_items_in_batch; the loss is a batch mean either way
+        teacher_logits = inputs.pop('teacher_logits', None)
+        inputs.pop('length', None)
+        outputs = model(**inputs)
+        if teacher_logits is None:
+            return (outputs.loss, outputs) if return_outputs else outputs.loss
+        t = self.temperature
+        soft_loss = F.kl_div(F.log_softmax(outputs.logits / t, dim=-1), F.softmax(teacher_logits / t, dim=-1),
+                             reduction='batchmean') * (t * t)
+        loss = self.alpha * outputs.loss + (1 - self.alpha) * soft_loss
+        return (loss, outputs) if return_outputs else loss
+
+    def prediction_step(self, model, inputs, prediction_loss_only, ignore_keys=None):
+        inputs = {k: v for k, v in inputs.items() if k not in ('teacher_logits', 'length')}
+        return super().prediction_step(model, inputs, prediction_loss_only, ignore_keys)
+
+
+def add_teacher_logits(dataset, teacher, collator, batch_size=64):
+    # Soft labels are computed once up front instead of running the teacher every epoch
+    device = next(teacher.parameters()).device
+    teacher.eval()
+
+    def fn(batch):
+        features = [{k: batch[k][i] for k in ('input_ids', 'attention_mask', 'token_type_ids') if k in batch}
+                    for i in range(len(batch['input_ids']))]
+        inputs = {k: v.to(device) for k, v in collator(features).items()}
+        with torch.no_grad():
+            logits = teacher(**inputs).logits
+        return {'teacher_logits': logits.float().cpu().tolist()}
+
+    return dataset.map(fn, batched=True, batch_size=batch_size)
+
+
+def cpu_latency_ms(model, tokenizer, texts, max_length):
+    model = model.to('cpu').eval()
+    times = []
+    with torch.no_grad():
+        for text in texts:
+            inputs = tokenizer(text, truncation=True, max_length=max_length, return_tensors='pt')
+            start = time.perf_counter()
+            model(**inputs)
+            times.append((time.perf_counter() - start) * 1000.0)
+    return float(np.mean(times[1:] or times))
+
+
+def distill(args):
+    if os.path.abspath(args.output_dir) == os.path.abspath(args.teacher_dir):
+        raise ValueError('--output_dir must differ from --teacher_dir when distilling')
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    tokenizer = AutoTokenizer.from_pretrained(args.teacher_dir)
+    teacher = AutoModelForSequenceClassification.from_pretrained(args.teacher_dir).to(device)
+    student = build_student(args, teacher).to(device)
+    student.config.id2label = {0: 'Fake', 1: 'Real'}
+    student.config.label2id = {'Fake': 0, 'Real': 1}
+
+    tokenized = load_tokenized_dataset(args, tokenizer)
+    collator = DataCollatorWithPadding(tokenizer, pad_to_multiple_of=args.pad_to_multiple_of)
+    tokenized = DatasetDict({split: add_teacher_logits(ds, teacher, collator) for split, ds in tokenized.items()})
+
+    trainer = DistillationTrainer(
+        model=student,
+        args=make_training_args(args, remove_unused_columns=False),
+        train_dataset=tokenized['train'],
+        eval_dataset=tokenized['validation'],
+        tokenizer=tokenizer,
+        data_collator=collator,
+        compute_metrics=compute_metrics,
+        temperature=args.distill_temperature,
+        alpha=args.distill_alpha
+    )
+    trainer.train()
+    student_metrics = trainer.evaluate()
+
+    teacher_trainer = DistillationTrainer(
+        model=teacher,
+        args=make_training_args(args, remove_unused_columns=False),
+        eval_dataset=tokenized['validation'],
+        tokenizer=tokenizer,
+        data_collator=collator,
+        compute_metrics=compute_metrics
+    )
+    teacher_metrics = teacher_trainer.evaluate()
+
+    trainer.save_model(args.output_dir)
+    tokenizer.save_pretrained(args.output_dir)
+
+    texts = tokenizer.batch_decode(tokenized['validation'][:50]['input_ids'], skip_special_tokens=True)
+    teacher_ms = cpu_latency_ms(teacher, tokenizer, texts, args.max_length)
+    student_ms = cpu_latency_ms(trainer.model, tokenizer, texts, args.max_length)
+    print(f"{'':>8} {'layers':>6} {'accuracy':>9} {'f1':>7} {'cpu ms':>8}")
+    print(f"{'teacher':>8} {teacher.config.num_hidden_layers:>6} {teacher_metrics['eval_accuracy']:>9.4f} {teacher_metrics['eval_f1']:>7.4f} {teacher_ms:>8.1f}")
+    print(f"{'student':>8} {trainer.model.config.num_hidden_layers:>6} {student_metrics['eval_accuracy']:>9.4f} {student_metrics['eval_f1']:>7.4f} {student_ms:>8.1f}")
+    print(f'CPU speedup: {teacher_ms / student_ms:.2f}x')
+    print(f'Student model saved to {args.output_dir}; serve it with MODEL_DIR={args.output_dir}')
+
+
+def exit_head(hidden_size, num_labels):
+    # Must match backend/utils/early_exit.py, which loads these heads for serving
+    return torch.nn.Sequential(
+        torch.nn.Linear(hidden_size, hidden_size),
+        torch.nn.Tanh(),
+        torch.nn.Linear(hidden_size, num_labels),
+    )
+
+
+def exit_head_logits(model, heads, layers, inputs):
+    # Logits of every exit head and of the model's own classifier, from one frozen pass
+    with torch.no_grad():
+        outputs = model(**inputs, output_hidden_states=True)
+    logits = [heads[str(layer)](outputs.hidden_states[layer][:, 0]) for layer in layers]
+    return logits, outputs.logits
+
+
+def train_exit_heads(args):
+    # DeeBERT-style: each head starts as a copy of the pooler + classifier and
+    # learns to classify from the [CLS] state of its layer. The fine-tuned
+    # model is not changed, so texts that never exit get the same verdict as before.
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    tokenizer = AutoTokenizer.from_pretrained(args.output_dir)
+    model = AutoModelForSequenceClassification.from_pretrained(args.output_dir).to(device).eval()
+    for param in model.parameters():
+        param.requires_grad = False
+    n_layers = model.config.num_hidden_layers
+    layers = sorted({int(l) for l in args.exit_layers.split(',') if l})
+    if not layers or layers[0] < 1 or layers[-1] >= n_layers:
+        raise ValueError(f'--exit_layers must be between 1 and {n_layers - 1}')
+
+    heads = torch.nn.ModuleDict()
+    for layer in layers:
+        head = exit_head(model.config.hidden_size, model.config.num_labels)
+        head[0].load_state_dict(model.base_model.pooler.dense.state_dict())
+        head[2].load_state_dict(model.classifier.state_dict())
+        heads[str(layer)] = head
+    heads.to(device)
+
+    tokenized = load_tokenized_dataset(args, tokenizer)
+    tokenized = DatasetDict({split: ds.remove_columns([c for c in ds.column_names if c == 'length'])
+                             for split, ds in tokenized.items()})
+    collator = DataCollatorWithPadding(tokenizer, pad_to_multiple_of=args.pad_to_multiple_of)
+    train_loader = DataLoader(tokenized['train'], batch_size=args.per_device_train_batch_size, shuffle=True,
+                              collate_fn=collator)
+    optimizer = torch.optim.AdamW(heads.parameters(), lr=args.exit_learning_rate)
+
+    for epoch in range(args.num_train_epochs):
+        heads.train()
+        total = steps = 0
+        for batch in train_loader:
+            batch = {k: v.to(device) for k, v in batch.items()}
+            labels = batch.pop('labels')
+            logits, _ = exit_head_logits(model, heads, layers, batch)
+            loss = sum(F.cross_entropy(l, labels) for l in logits) / len(logits)
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            total += loss.item()
+            steps += 1
+        print(f'Epoch {epoch + 1}: mean exit-head loss {total / max(steps, 1):.4f}')
+
+    # Validation: accuracy of each head alone, then of the whole cascade per threshold
+    heads.eval()
+    probs, final, labels = [], [], []
+    with torch.no_grad():
+        for batch in DataLoader(tokenized['validation'], batch_size=64, collate_fn=collator):
+            batch = {k: v.to(device) for k, v in batch.items()}
+            labels.append(batch.pop('labels').cpu())
+            logits, final_logits = exit_head_logits(model, heads, layers, batch)
+            probs.append(torch.stack([F.softmax(l, dim=-1) for l in logits], dim=1).cpu())
+            final.append(final_logits.argmax(dim=-1).cpu())
+    probs, final, labels = torch.cat(probs), torch.cat(final), torch.cat(labels)
+    for i, layer in enumerate(layers):
+        print(f'layer {layer:>2} head: accuracy {(probs[:, i].argmax(dim=-1) == labels).float().mean():.4f}')
+    print(f'layer {n_layers:>2} (model): accuracy {(final == labels).float().mean():.4f}')
+    print(f"{'threshold':>9} {'accuracy':>9} {'avg layers':>10} {'exited':>7}")
+    for threshold in [float(t) for t in args.exit_thresholds.split(',') if t]:
+        preds, used = final.clone(), torch.full_like(final, n_layers)
+        pending = torch.ones_like(final, dtype=torch.bool)
+        for i, layer in enumerate(layers):
+            confident, pred = probs[:, i].max(dim=-1)
+            take = pending & (confident >= threshold)
+            preds[take], used[take] = pred[take], layer
+            pending &= ~take
+        print(f'{threshold:>9.2f} {(preds == labels).float().mean():>9.4f} {used.float().mean():>10.2f} '
+              f'{1 - pending.float().mean():>7.1%}')
+
+    save_file({f'{layer}.{k}': v.detach().cpu().contiguous() for layer, head in heads.items()
+               for k, v in head.state_dict().items()}, os.path.join(args.output_dir, 'early_exit.safetensors'))
+    with open(os.path.join(args.output_dir, 'early_exit.json'), 'w') as f:
+        json.dump({'layers': layers, 'hidden_size': model.config.hidden_size,
+                   'num_labels': model.config.num_labels, 'num_hidden_layers': n_layers}, f, indent=2)
+    print(f'Exit heads saved to {args.output_dir}; serve them with EARLY_EXIT_THRESHOLD=<threshold>')
+
+
+def main():
+    args = parse_args()
+    if args.early_exit:
+        torch.manual_seed(args.seed)
+        return train_exit_heads(args)
+    if args.distill:
+        torch.manual_seed(args.seed)
+        return distill(args)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    # Set seed and device
+    torch.manual_seed(args.seed)
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+
+    # Load tokenizer and model
+    tokenizer = AutoTokenizer.from_pretrained(args.model_name)
+    model = AutoModelForSequenceClassification.from_pretrained(args.model_name, num_labels=args.num_labels)
+    model.to(device)
+
+    # Set label mapping
+    model.config.id2label = {0: 'Fake', 1: 'Real'}
+    model.config.label2id = {'Fake': 0, 'Real': 1}
+
+    tokenized = load_tokenized_dataset(args, tokenizer)
+    if args.padding == 'max_length':
+        data_collator = default_data_collator
+    else:
+        data_collator = DataCollatorWithPadding(tokenizer, pad_to_multiple_of=args.pad_to_multiple_of)
+
+    # Training args
+    training_args = make_training_args(args)
 
     trainer = Trainer(
         model=model,
@@ -147,12 +475,18 @@ def main():
         train_dataset=tokenized['train'],
         eval_dataset=tokenized['validation'],
         tokenizer=tokenizer,
-        data_collator=default_data_collator,
+        data_collator=data_collator,
         compute_metrics=compute_metrics
     )
 
     # Train
-    trainer.train()
+    real_tokens, padded_tokens = padding_stats(trainer.get_train_dataloader())
+    train_result = trainer.train()
+    runtime = train_result.metrics.get('train_runtime') or 0
+    if runtime:
+        epochs = args.num_train_epochs
+        print(f'Padding ratio: {1 - real_tokens / padded_tokens:.1%} of {padded_tokens} tokens per epoch')
+        print(f'Throughput: {real_tokens * epochs / runtime:.0f} real tokens/s, {padded_tokens * epochs / runtime:.0f} padded tokens/s')
 
     # Evaluate
     metrics = trainer.evaluate()
@@ -14,8 +14,8 @@ export default function Dashboard() {
 
   const fetchRecent = async () => {
     try {
-      const res = await axios.get('/history')
-      setRecent(res.data.history.slice(0,5))
+      const res = await axios.get('/history', { params: { limit: 5 } })
+      setRecent(res.data.history)
     } catch (err) {
       console.error(err)
     }
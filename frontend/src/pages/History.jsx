@@ -5,14 +5,16 @@ import Loader from '../components/Loader'
 export default function History() {
   const [history, setHistory] = useState([])
   const [loading, setLoading] = useState(true)
+  const [nextCursor, setNextCursor] = useState(null)
 
   useEffect(() => { fetchHistory() }, [])
 
-  const fetchHistory = async () => {
+  const fetchHistory = async (cursor) => {
     setLoading(true)
     try {
-      const res = await axios.get('/history')
-      setHistory(res.data.history)
+      const res = await axios.get('/history', { params: cursor ? { cursor } : {} })
+      setHistory(prev => cursor ? [...prev, ...res.data.history] : res.data.history)
+      setNextCursor(res.data.nextCursor)
     } catch (err) {
       console.error(err)
     } finally { setLoading(false) }
@@ -38,6 +40,9 @@ export default function History() {
           </div>
         ))}
       </div>
+      {nextCursor && !loading && (
+        <button onClick={() => fetchHistory(nextCursor)} className="mt-4 px-4 py-2 rounded bg-gray-200 dark:bg-gray-700">Load more</button>
+      )}
     </div>
   )
 }
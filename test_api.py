@@ -1,5 +1,6 @@
 import requests
 import json
+import uuid
 
 BASE_URL = 'http://localhost:5000'
 
@@ -32,6 +33,25 @@ def test_analyze_text(token):
     print(response.json())
     return response
 
+ARTICLE = ('The city council voted on Tuesday to approve a new budget that increases funding for public '
+           'transport, road repairs and local schools, while officials said property taxes would stay the same '
+           'for the next two years despite rising costs across the region.')
+
+def test_near_duplicate(token):
+    # A lightly edited resubmission reuses the first verdict and links to it.
+    # A run token after every second word puts it in every word 3-gram, so
+    # entries indexed by earlier runs never match this run's article.
+    headers = {'Authorization': f'Bearer {token}'}
+    run = uuid.uuid4().hex[:8]
+    article = ' '.join(f'{word} {run}' if i % 2 else word for i, word in enumerate(ARTICLE.split()))
+    first = requests.post(f'{BASE_URL}/analyzeText', json={'text': article}, headers=headers).json()
+    edited = article.replace('Tuesday', 'Wednesday')
+    second = requests.post(f'{BASE_URL}/analyzeText', json={'text': edited}, headers=headers).json()
+    print(f"Near duplicate: {second.get('duplicateOf')} (similarity {second.get('similarity')})")
+    assert second.get('duplicateOf') == first['historyId'], second
+    assert second['prediction'] == first['prediction']
+    return second
+
 if __name__ == '__main__':
     print("Testing API endpoints...")
 
@@ -46,5 +66,6 @@ if __name__ == '__main__':
 
         # Test analysis
         test_analyze_text(token)
+        test_near_duplicate(token)
     else:
         print("Login failed")
\ No newline at end of file